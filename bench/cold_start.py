@@ -0,0 +1,173 @@
+"""
+Cold start of the inference Lambdas: init duration and first requests per init
+configuration, each run in a fresh interpreter against a local TLS SageMaker
+stand-in. With --log-group it reports the Init Duration of deployed functions
+instead, to compare WebStack configurations (arm64, lambda_in_vpc,
+provisioned_concurrency) in AWS.
+
+Usage:
+    python bench/cold_start.py [--runs 5] [--latency-ms 20]
+    python bench/cold_start.py --log-group /aws/lambda/<function name> [--hours 24]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCH_DIR, "..", "src")
+sys.path.insert(0, BENCH_DIR)
+
+from fake_api import (  # noqa: E402
+    FakeRuntimeHandler,
+    self_signed_certificate,
+    start_server,
+)
+
+HANDLERS = {
+    # the smallest image the handler accepts, the measurement is about init
+    "txt2img": {
+        "prompt": "cat",
+        "endpoint_name": "bench",
+        "parameters": {"width": 256, "height": 256},
+    },
+    "txt2nlu": {"prompt": "summarize", "endpoint_name": "bench"},
+}
+
+# environment Lambda sets for each initialization type
+INIT_TYPES = {
+    "on-demand": {"AWS_LAMBDA_INITIALIZATION_TYPE": "on-demand"},
+    "provisioned": {"AWS_LAMBDA_INITIALIZATION_TYPE": "provisioned-concurrency"},
+}
+
+# runs in the fresh interpreter, like the Lambda runtime importing the handler
+CHILD = """
+import contextlib, io, json, sys, time
+module, body = sys.argv[1], sys.argv[2]
+started = time.perf_counter()
+handler = __import__(module).lambda_handler
+imported = time.perf_counter()
+durations = []
+with contextlib.redirect_stdout(io.StringIO()):
+    for _ in range(2):
+        start = time.perf_counter()
+        response = handler({"body": body}, None)
+        durations.append((time.perf_counter() - start) * 1000)
+        if _ == 0:
+            timing = response["headers"]["Server-Timing"]
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "init_ms": float(timing.split("init;dur=")[1].split(",")[0]),
+    "first_ms": durations[0],
+    "second_ms": durations[1],
+}))
+"""
+
+INSIGHTS_QUERY = """
+filter @type = "REPORT"
+| stats count(*) as invocations, count(@initDuration) as cold_starts,
+    pct(@initDuration, 50) as init_p50, pct(@initDuration, 95) as init_p95,
+    pct(@duration, 50) as duration_p50, pct(@duration, 95) as duration_p95
+"""
+
+
+def run_child(module: str, environment: dict) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD, module, json.dumps(HANDLERS[module])],
+        env=environment,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def local(args) -> None:
+    FakeRuntimeHandler.latency = args.latency_ms / 1000
+    tls = self_signed_certificate()
+    server, url = start_server(FakeRuntimeHandler, tls)
+
+    environment = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join(
+            os.path.join(SRC_DIR, path)
+            for path in ("layer_common/python", "lambda_txt2img", "lambda_txt2nlu")
+        ),
+        "SAGEMAKER_RUNTIME_ENDPOINT_URL": url,
+        "AWS_ACCESS_KEY_ID": "bench",
+        "AWS_SECRET_ACCESS_KEY": "bench",
+        "AWS_DEFAULT_REGION": "us-east-1",
+    }
+    if tls:
+        environment["AWS_CA_BUNDLE"] = tls[0]
+
+    print(
+        f"fake endpoint {url} latency {args.latency_ms} ms, "
+        f"median of {args.runs} fresh processes"
+    )
+    print(
+        f"{'handler':<9}{'init type':<13}{'import ms':>10}{'init ms':>9}"
+        f"{'1st ms':>8}{'2nd ms':>8}{'cold path ms':>14}"
+    )
+    for module in HANDLERS:
+        for init_type, variables in INIT_TYPES.items():
+            runs = [
+                run_child(module, {**environment, **variables})
+                for _ in range(args.runs)
+            ]
+            median = {key: statistics.median(r[key] for r in runs) for key in runs[0]}
+            # a provisioned environment is initialized before it is invoked
+            cold_path = median["first_ms"]
+            if init_type == "on-demand":
+                cold_path += median["init_ms"]
+            print(
+                f"{module:<9}{init_type:<13}{median['import_ms']:>10.1f}"
+                f"{median['init_ms']:>9.1f}{median['first_ms']:>8.1f}"
+                f"{median['second_ms']:>8.1f}{cold_path:>14.1f}"
+            )
+
+    server.shutdown()
+
+
+def deployed(args) -> None:
+    import boto3
+
+    logs = boto3.client("logs")
+    end = int(time.time())
+    for log_group in args.log_group:
+        query_id = logs.start_query(
+            logGroupName=log_group,
+            startTime=end - args.hours * 3600,
+            endTime=end,
+            queryString=INSIGHTS_QUERY,
+        )["queryId"]
+        while True:
+            response = logs.get_query_results(queryId=query_id)
+            if response["status"] not in ("Scheduled", "Running"):
+                break
+            time.sleep(1)
+
+        print(log_group)
+        for row in response["results"]:
+            print("  " + ", ".join(f"{f['field']}={f['value']}" for f in row))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--log-group", nargs="+", help="Lambda log groups to query")
+    parser.add_argument("--hours", type=int, default=24)
+    args = parser.parse_args()
+
+    if args.log_group:
+        deployed(args)
+    else:
+        local(args)
+
+
+if __name__ == "__main__":
+    main()
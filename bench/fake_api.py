@@ -0,0 +1,226 @@
+"""
+Local stand-ins for the deployed services, used by the benchmarks.
+"""
+import base64
+import json
+import os
+import random
+import shutil
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from image_payload import synthetic_image
+
+
+def self_signed_certificate() -> tuple:
+    """
+    Creates a throwaway certificate for 127.0.0.1 with openssl.
+
+    Return:
+        tuple: Paths of the certificate and the key, or None if openssl is missing.
+    """
+
+    if shutil.which("openssl") is None:
+        return None
+
+    directory = tempfile.mkdtemp(prefix="bench-tls-")
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+            "-keyout", key, "-out", cert, "-days", "1", "-subj", "/CN=localhost",
+            "-addext", "subjectAltName=IP:127.0.0.1,DNS:localhost",
+        ],
+        check=True,
+        capture_output=True,
+    )  # fmt: skip
+    return cert, key
+
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # a burst of simulated users connects at once
+    request_queue_size = 256
+
+    def handle_error(self, request, client_address):
+        # clients dropping kept-alive connections at exit
+        pass
+
+
+class FakeRuntimeHandler(BaseHTTPRequestHandler):
+    """
+    Answers InvokeEndpoint requests (POST /endpoints/<name>/invocations) like the
+    JumpStart containers: Stable Diffusion for "application/x-text" bodies and JSON
+    bodies with a "prompt", FLAN-T5 for JSON bodies with "text_inputs". Configure
+    the class attributes before serving.
+
+    Attributes:
+        latency (float): Seconds of simulated model time per call with the
+            default parameters, scaled by the requested steps and image area, or
+            by the maximum length and beams.
+        image_size (int): Width and height of the plain prompt images.
+        text_words (int): Words per generated text.
+        error_rate (float): Share of calls failing with a ModelError.
+    """
+
+    protocol_version = "HTTP/1.1"
+    # headers and body are written separately
+    disable_nagle_algorithm = True
+    latency = 0.0
+    image_size = 512
+    text_words = 32
+    error_rate = 0.0
+
+    # the image bodies are large, so they are built once per size
+    _image_bodies = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def image_body(cls, size: int, key: str = "generated_image") -> bytes:
+        with cls._lock:
+            if (size, key) not in cls._image_bodies:
+                image = synthetic_image(size)
+                # JSON requests get a list of images
+                image = {key: image if key == "generated_image" else [image]}
+                image["prompt"] = "bench"
+                cls._image_bodies[size, key] = json.dumps(image).encode()
+            return cls._image_bodies[size, key]
+
+    def model_latency(self, request: dict) -> float:
+        # relative to the container defaults, see IMAGE_PRESETS and TEXT_PRESETS
+        if "prompt" in request:
+            area = request.get("width", 512) * request.get("height", 512)
+            steps = request.get("num_inference_steps", 50)
+            return self.latency * steps / 50 * area / (512 * 512)
+        if "text_inputs" in request:
+            length = request.get("max_length", 256)
+            return self.latency * length / 256 * request.get("num_beams", 1)
+        return self.latency
+
+    def do_POST(self):
+        request = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        if self.path.startswith("/endpoints/connection-warmup/"):
+            # see warm_connection, the real API rejects the unknown endpoint at once
+            body = json.dumps({"message": "Endpoint not found"}).encode()
+            self.send_response(400)
+            self.send_header("x-amzn-ErrorType", "ValidationError")
+        else:
+            is_json = self.headers.get("Content-Type") == "application/json"
+            time.sleep(self.model_latency(json.loads(request) if is_json else {}))
+            body = self.model_response(request)
+
+        self.send_header("Content-Type", "application/json")
+        self.send_header("X-Amzn-Invoked-Production-Variant", "AllTraffic")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def model_response(self, request: bytes) -> bytes:
+        if random.random() < self.error_rate:
+            self.send_response(424)
+            self.send_header("x-amzn-ErrorType", "ModelError")
+            return json.dumps({"message": "Simulated model error"}).encode()
+
+        self.send_response(200)
+        if self.headers.get("Content-Type") == "application/x-text":
+            return self.image_body(self.image_size)
+
+        request = json.loads(request or b"{}")
+        if "prompt" in request:
+            # the fake images are square
+            return self.image_body(request.get("width", 512), "generated_images")
+
+        inputs = request.get("text_inputs", "")
+        inputs = inputs if isinstance(inputs, list) else [inputs]
+        text = " ".join(["word"] * self.text_words)
+        return json.dumps({"generated_texts": [[text] for _ in inputs]}).encode()
+
+    def log_message(self, *args):
+        pass
+
+
+def lambda_proxy_handler(lambda_handler) -> type:
+    """
+    Builds a request handler that serves a Lambda handler like an API Gateway
+    proxy integration with the binary media type "*/*" of WebStack.
+    """
+
+    class LambdaProxyHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            event = {
+                "headers": dict(self.headers),
+                "body": base64.b64encode(body).decode(),
+                "isBase64Encoded": True,
+            }
+            response = lambda_handler(event, None)
+            if response.get("isBase64Encoded"):
+                body = base64.b64decode(response["body"])
+            else:
+                body = response["body"].encode()
+            self.send_response(response["statusCode"])
+            for name, value in response.get("headers", {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return LambdaProxyHandler
+
+
+class FakeApiHandler(BaseHTTPRequestHandler):
+    """Answers every POST like the API Gateway endpoint of txt2nlu."""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    latency = 0.0
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(self.latency)
+        body = json.dumps(
+            {"prompt": request.get("prompt", ""), "generated_text": "fake answer"}
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(handler, tls: tuple = None) -> tuple:
+    """
+    Serves the handler on a free local port in a background thread.
+
+    Args:
+        handler (type): The BaseHTTPRequestHandler subclass to serve.
+        tls (tuple): Certificate and key paths to serve HTTPS, see
+            self_signed_certificate.
+
+    Return:
+        tuple: The server and its base URL.
+    """
+
+    server = QuietServer(("127.0.0.1", 0), handler)
+    scheme = "http"
+    if tls is not None:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(*tls)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        scheme = "https"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"{scheme}://127.0.0.1:{server.server_port}/"
@@ -0,0 +1,78 @@
+"""
+Memory profile of the txt2img response handling: the Python heap peak of turning
+an endpoint response into the base64 PNG payload, whole-body json.loads versus
+the streaming read_pixels path, relative to the packed image size.
+
+Usage:
+    python bench/image_memory.py [--size 512 768]
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(__file__), "..", "src", "lambda_txt2img")
+)
+
+from image_codec import encode_png, read_pixels  # noqa: E402
+from image_payload import synthetic_image  # noqa: E402
+
+
+def whole_body(stream) -> str:
+    generated_image = json.loads(stream.read().decode())["generated_image"]
+    image = base64.b64encode(encode_png(generated_image)).decode()
+    return json.dumps({"prompt": "bench", "image_format": "png", "image": image})
+
+
+def streaming(stream) -> str:
+    image = base64.b64encode(encode_png(read_pixels(stream))).decode()
+    return json.dumps({"prompt": "bench", "image_format": "png", "image": image})
+
+
+def profile(render, body: bytes) -> tuple:
+    start = time.perf_counter()
+    message = render(io.BytesIO(body))
+    elapsed = time.perf_counter() - start
+
+    # tracing slows the run down, so it is timed separately; the stream is created
+    # before tracing, like a socket buffer outside the heap
+    stream = io.BytesIO(body)
+    tracemalloc.start()
+    render(stream)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return message, peak, elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, nargs="+", default=[512, 768])
+    args = parser.parse_args()
+
+    print(
+        f"{'size':>6}{'path':>12}{'body MiB':>10}{'image MiB':>11}"
+        f"{'peak MiB':>10}{'x image':>9}{'ms':>9}"
+    )
+    for size in args.size:
+        body = json.dumps({"generated_image": synthetic_image(size)}).encode()
+        image_bytes = size * size * 3
+
+        messages = []
+        for name, render in (("whole-body", whole_body), ("streaming", streaming)):
+            message, peak, elapsed = profile(render, body)
+            messages.append(message)
+            print(
+                f"{size:>6}{name:>12}{len(body) / 2**20:>10.1f}"
+                f"{image_bytes / 2**20:>11.2f}{peak / 2**20:>10.1f}"
+                f"{peak / image_bytes:>9.1f}{elapsed * 1000:>9.0f}"
+            )
+        assert messages[0] == messages[1], "the paths disagree"
+
+
+if __name__ == "__main__":
+    main()
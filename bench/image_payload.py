@@ -0,0 +1,102 @@
+"""
+Compares the legacy nested-list JSON image payload of the txt2img Lambda with
+the base64 PNG payload: response size and encode/decode time.
+
+Usage:
+    python bench/image_payload.py [--size 512] [--repeat 5]
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(__file__), "..", "src", "lambda_txt2img")
+)
+
+from image_codec import encode_png  # noqa: E402
+
+
+def synthetic_image(size: int, seed: int = 0) -> list:
+    """Builds a size x size RGB image with gradients and noise, as nested lists."""
+    rng = random.Random(seed)
+    return [
+        [
+            [
+                (x + rng.randint(0, 16)) % 256,
+                (y + rng.randint(0, 16)) % 256,
+                ((x + y) // 2 + rng.randint(0, 16)) % 256,
+            ]
+            for x in range(size)
+        ]
+        for y in range(size)
+    ]
+
+
+def timed(func, repeat: int) -> tuple:
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        durations.append(time.perf_counter() - start)
+    return result, statistics.median(durations) * 1000
+
+
+def encode_json(pixels) -> str:
+    return json.dumps({"prompt": "bench", "image": pixels, "image_format": "json"})
+
+
+def encode_compact(pixels) -> str:
+    image = base64.b64encode(encode_png(pixels)).decode()
+    return json.dumps({"prompt": "bench", "image": image, "image_format": "png"})
+
+
+def decode_json(payload: str):
+    import numpy as np
+
+    return np.array(json.loads(payload)["image"], dtype=np.uint8)
+
+
+def decode_compact(payload: str):
+    import numpy as np
+    from PIL import Image
+
+    png = base64.b64decode(json.loads(payload)["image"])
+    return np.asarray(Image.open(io.BytesIO(png)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=512)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    pixels = synthetic_image(args.size)
+
+    print(f"image: {args.size}x{args.size} RGB, median of {args.repeat} runs")
+    print(f"{'format':<8}{'bytes':>14}{'encode ms':>12}{'decode ms':>12}")
+
+    decoded = {}
+    for name, encode, decode in (
+        ("json", encode_json, decode_json),
+        ("png", encode_compact, decode_compact),
+    ):
+        payload, encode_ms = timed(lambda: encode(pixels), args.repeat)
+        try:
+            decoded[name], decode_ms = timed(lambda: decode(payload), args.repeat)
+            decode_col = f"{decode_ms:>12.1f}"
+        except ImportError:
+            decode_col = f"{'n/a':>12}"
+        print(f"{name:<8}{len(payload.encode()):>14,}{encode_ms:>12.1f}{decode_col}")
+
+    if len(decoded) == 2:
+        assert (decoded["json"] == decoded["png"]).all(), "decoded images differ"
+
+
+if __name__ == "__main__":
+    main()
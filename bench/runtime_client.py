@@ -0,0 +1,73 @@
+"""
+Measures per-call overhead of the SageMaker runtime client against a local stub
+endpoint: botocore defaults versus the tuned client of the common layer.
+
+Usage:
+    python bench/runtime_client.py [--calls 200] [--latency-ms 0]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(__file__), "..", "src", "layer_common", "python")
+)
+sys.path.insert(0, os.path.dirname(__file__))
+
+import boto3  # noqa: E402
+from fake_api import FakeRuntimeHandler, start_server  # noqa: E402
+from sagemaker_runtime import (  # noqa: E402
+    RetryingRuntimeClient,
+    runtime_config,
+    warm_connection,
+)
+
+
+def measure(client, calls: int) -> tuple:
+    def invoke():
+        start = time.perf_counter()
+        client.invoke_endpoint(
+            EndpointName="stub", ContentType="application/json", Body=b"{}"
+        )
+        return (time.perf_counter() - start) * 1000
+
+    first = invoke()
+    rest = sorted(invoke() for _ in range(calls))
+    return first, statistics.median(rest), rest[int(len(rest) * 0.95) - 1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+    FakeRuntimeHandler.latency = args.latency_ms / 1000
+    FakeRuntimeHandler.text_words = 1
+    server, endpoint_url = start_server(FakeRuntimeHandler)
+
+    default = boto3.client("sagemaker-runtime", endpoint_url=endpoint_url)
+    tuned = RetryingRuntimeClient(
+        boto3.client(
+            "sagemaker-runtime", endpoint_url=endpoint_url, config=runtime_config()
+        )
+    )
+    warm_connection(tuned)
+
+    print(f"stub latency {args.latency_ms} ms, {args.calls} calls")
+    print(f"{'client':<10}{'first ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, client in (("default", default), ("tuned", tuned)):
+        first, p50, p95 = measure(client, args.calls)
+        print(f"{name:<10}{first:>10.2f}{p50:>10.2f}{p95:>10.2f}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
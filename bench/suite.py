@@ -0,0 +1,367 @@
+"""
+Benchmark suite of the request hot paths against a local SageMaker stand-in: both
+Lambda handlers invoked directly, and both Streamlit request paths through a fake
+API Gateway. Reports throughput, latency percentiles, Lambda memory high-water
+mark and payload sizes, decoded and as transferred.
+
+Usage:
+    python bench/suite.py [--requests 20] [--users 8] [--latency-ms 20]
+                          [--error-rate 0] [--only txt2nlu] [--json baseline.json]
+                          [--accept-encoding "gzip, deflate"]
+"""
+import argparse
+import base64
+import contextlib
+import gzip
+import io
+import json
+import os
+import resource
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCH_DIR, "..", "src")
+sys.path[:0] = [
+    BENCH_DIR,
+    os.path.join(SRC_DIR, "layer_common", "python"),
+    os.path.join(SRC_DIR, "lambda_txt2img"),
+    os.path.join(SRC_DIR, "lambda_txt2nlu"),
+    os.path.join(BENCH_DIR, "..", "web-app"),
+]
+
+from fake_api import (  # noqa: E402
+    FakeRuntimeHandler,
+    lambda_proxy_handler,
+    start_server,
+)
+from generation_params import IMAGE_PRESETS, PRESETS  # noqa: E402
+
+# calls measured with tracemalloc, which slows the handler down
+MEMORY_CALLS = 5
+
+# name, handler, fake endpoint settings and the request body sent for call i
+SCENARIOS = [
+    (
+        "lambda txt2img 512 png",
+        "txt2img",
+        {},
+        lambda i: {"prompt": f"cat {i}", "endpoint_name": "bench"},
+    ),
+    (
+        "lambda txt2img 768 png",
+        "txt2img",
+        {},
+        lambda i: {
+            "prompt": f"cat {i}",
+            "endpoint_name": "bench",
+            "parameters": {"width": 768, "height": 768},
+        },
+    ),
+    (
+        "lambda txt2img 512 json",
+        "txt2img",
+        {},
+        lambda i: {
+            "prompt": f"cat {i}",
+            "endpoint_name": "bench",
+            "image_format": "json",
+        },
+    ),
+    (
+        "lambda txt2img 512 x4",
+        "txt2img",
+        {},
+        lambda i: {"prompt": f"cat {i}", "endpoint_name": "bench", "num_images": 4},
+    ),
+    (
+        "lambda txt2nlu short",
+        "txt2nlu",
+        {"text_words": 32},
+        lambda i: {"prompt": f"summarize {i}", "endpoint_name": "bench"},
+    ),
+    (
+        "lambda txt2nlu long",
+        "txt2nlu",
+        {"text_words": 1024},
+        lambda i: {"prompt": f"summarize {i}", "endpoint_name": "bench"},
+    ),
+    (
+        "lambda txt2nlu batch 16",
+        "txt2nlu",
+        {"text_words": 128},
+        lambda i: {
+            "context": f"conversation {i}",
+            "questions": [f"question {q}" for q in range(16)],
+            "endpoint_name": "bench",
+        },
+    ),
+    (
+        "web txt2img 512",
+        "txt2img",
+        {},
+        lambda i: {
+            "prompt": f"cat {i}",
+            "endpoint_name": "bench",
+            "image_format": "png",
+            "num_images": 1,
+            "cache": True,
+        },
+    ),
+    (
+        "web txt2nlu short",
+        "txt2nlu",
+        {"text_words": 32},
+        lambda i: {"prompt": f"summarize {i}", "endpoint_name": "bench", "cache": True},
+    ),
+]
+
+# latency per generation preset, the fake endpoint scales its model time with the
+# steps and image area, or the maximum length and beams of the preset
+for preset in PRESETS:
+    SCENARIOS += [
+        (
+            f"lambda txt2img {preset}",
+            "txt2img",
+            {},
+            lambda i, preset=preset: {
+                "prompt": f"cat {i}",
+                "endpoint_name": "bench",
+                "preset": preset,
+            },
+        ),
+        (
+            f"lambda txt2nlu {preset}",
+            "txt2nlu",
+            {"text_words": 128},
+            lambda i, preset=preset: {
+                "prompt": f"summarize {i}",
+                "endpoint_name": "bench",
+                "preset": preset,
+            },
+        ),
+    ]
+
+
+def percentile(samples: list, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[max(int(round(fraction * len(ordered))) - 1, 0)]
+
+
+def summarize(name: str, latencies: list, errors: int, elapsed: float, **extra) -> dict:
+    return {
+        "scenario": name,
+        "calls": len(latencies),
+        "errors": errors,
+        "req_per_s": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        **extra,
+    }
+
+
+def payload_sizes(response: dict) -> tuple:
+    """Decoded and transferred size of a Lambda proxy response body."""
+
+    if not response.get("isBase64Encoded"):
+        return len(response["body"]), len(response["body"])
+    body = base64.b64decode(response["body"])
+    if response["headers"].get("Content-Encoding") == "gzip":
+        return len(gzip.decompress(body)), len(body)
+    # br is only offered with brotli installed
+    if response["headers"].get("Content-Encoding") == "br":
+        import brotli
+
+        return len(brotli.decompress(body)), len(body)
+    return len(body), len(body)
+
+
+def run_lambda(
+    name: str, handler, make_body, requests: int, accept_encoding: str
+) -> dict:
+    """Invokes the handler one request at a time, like a single Lambda container."""
+
+    events = [
+        {
+            "headers": {"Accept-Encoding": accept_encoding},
+            "body": json.dumps(make_body(i)),
+        }
+        for i in range(requests)
+    ]
+    latencies, errors, response_bytes, wire_bytes = [], 0, 0, 0
+
+    start = time.perf_counter()
+    for event in events:
+        call_start = time.perf_counter()
+        response = handler(event, None)
+        latencies.append((time.perf_counter() - call_start) * 1000)
+        errors += response["statusCode"] != 200
+        decoded, wire = payload_sizes(response)
+        response_bytes = max(response_bytes, decoded)
+        wire_bytes = max(wire_bytes, wire)
+    elapsed = time.perf_counter() - start
+
+    # the Python heap high-water mark of a single invocation
+    peak = 0
+    tracemalloc.start()
+    for event in events[:MEMORY_CALLS]:
+        tracemalloc.reset_peak()
+        handler(event, None)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+    tracemalloc.stop()
+
+    return summarize(
+        name,
+        latencies,
+        errors,
+        elapsed,
+        peak_mib=peak / 2**20,
+        request_bytes=len(events[0]["body"]),
+        response_bytes=response_bytes,
+        wire_bytes=wire_bytes,
+    )
+
+
+def run_web(
+    name: str, handler, make_body, requests: int, users: int, accept_encoding: str
+) -> dict:
+    """Sends the page requests through the shared ApiClient and a fake API Gateway."""
+
+    from api_client import ApiClient
+
+    server, url = start_server(lambda_proxy_handler(handler))
+    api = ApiClient()
+    api.session.headers["Accept-Encoding"] = accept_encoding
+    latencies, errors, response_bytes, wire_bytes = [], 0, 0, 0
+    lock = threading.Lock()
+
+    def user(first: int):
+        nonlocal errors, response_bytes, wire_bytes
+        for i in range(first, requests, users):
+            call_start = time.perf_counter()
+            r = api.post(url, json=make_body(i), timeout=180).result()
+            with lock:
+                latencies.append((time.perf_counter() - call_start) * 1000)
+                errors += r.status_code != 200
+                response_bytes = max(response_bytes, len(r.content))
+                wire_bytes = max(wire_bytes, int(r.headers["Content-Length"]))
+
+    threads = [threading.Thread(target=user, args=(u,)) for u in range(users)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    return summarize(
+        name,
+        latencies,
+        errors,
+        elapsed,
+        peak_mib=None,
+        request_bytes=len(json.dumps(make_body(0))),
+        response_bytes=response_bytes,
+        wire_bytes=wire_bytes,
+    )
+
+
+def print_table(results: list) -> None:
+    print(
+        f"{'scenario':<26}{'calls':>6}{'errors':>7}{'req/s':>8}{'p50 ms':>9}"
+        f"{'p95 ms':>9}{'p99 ms':>9}{'peak MiB':>9}{'req B':>8}{'resp B':>11}"
+        f"{'wire B':>11}"
+    )
+    for r in results:
+        peak = "n/a" if r["peak_mib"] is None else f"{r['peak_mib']:.1f}"
+        print(
+            f"{r['scenario']:<26}{r['calls']:>6}{r['errors']:>7}"
+            f"{r['req_per_s']:>8.1f}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}"
+            f"{r['p99_ms']:>9.1f}{peak:>9}{r['request_bytes']:>8,}"
+            f"{r['response_bytes']:>11,}{r['wire_bytes']:>11,}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--only", default="", help="run scenarios containing this")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--accept-encoding", default="gzip, deflate")
+    args = parser.parse_args()
+
+    FakeRuntimeHandler.latency = args.latency_ms / 1000
+    FakeRuntimeHandler.error_rate = args.error_rate
+    runtime_server, runtime_url = start_server(FakeRuntimeHandler)
+
+    # read by the common layer when the handler modules are imported
+    os.environ.update(
+        SAGEMAKER_RUNTIME_ENDPOINT_URL=runtime_url,
+        SAGEMAKER_RUNTIME_WARM_CONNECTION="0",
+    )
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+    import txt2img
+    import txt2nlu
+
+    handlers = {"txt2img": txt2img.lambda_handler, "txt2nlu": txt2nlu.lambda_handler}
+
+    print(
+        f"fake endpoint latency {args.latency_ms} ms, error rate {args.error_rate}, "
+        f"{args.requests} requests per scenario, {args.users} web users"
+    )
+    # pre-builds the fake image bodies outside of the measurement
+    for size in {768} | {preset["width"] for preset in IMAGE_PRESETS.values()}:
+        FakeRuntimeHandler.image_body(size, "generated_images")
+
+    results = []
+    for name, handler_name, settings, make_body in SCENARIOS:
+        if args.only not in name:
+            continue
+        for attribute, value in settings.items():
+            setattr(FakeRuntimeHandler, attribute, value)
+
+        handler = handlers[handler_name]
+        # the handlers print one metrics record per call
+        with contextlib.redirect_stdout(io.StringIO()):
+            if name.startswith("web"):
+                result = run_web(
+                    name,
+                    handler,
+                    make_body,
+                    args.requests,
+                    args.users,
+                    args.accept_encoding,
+                )
+            else:
+                result = run_lambda(
+                    name, handler, make_body, args.requests, args.accept_encoding
+                )
+        results.append(result)
+
+    print_table(results)
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"process max RSS {max_rss:.0f} MiB")
+    runtime_server.shutdown()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {"settings": vars(args), "results": results, "max_rss_mib": max_rss},
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
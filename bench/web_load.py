@@ -0,0 +1,96 @@
+"""
+Load test of the Streamlit request path against a local fake API: concurrent
+simulated users per task, one requests.post per call (before) versus the shared
+keep-alive ApiClient (after).
+
+Usage:
+    python bench/web_load.py [--users 20] [--requests 10] [--latency-ms 50]
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "web-app"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from api_client import ApiClient  # noqa: E402
+from fake_api import (  # noqa: E402
+    FakeApiHandler,
+    self_signed_certificate,
+    start_server,
+)
+
+
+def run_users(post, users: int, requests_per_user: int) -> tuple:
+    """
+    Runs the simulated users, each on its own thread like a Streamlit session.
+
+    Return:
+        tuple: Wall clock seconds and the latency of every request in ms.
+    """
+
+    latencies = []
+    lock = threading.Lock()
+
+    def user():
+        for _ in range(requests_per_user):
+            start = time.perf_counter()
+            post({"prompt": "bench", "endpoint_name": "fake"}).raise_for_status()
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+
+    threads = [threading.Thread(target=user) for _ in range(users)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, sorted(latencies)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--no-tls", action="store_true")
+    args = parser.parse_args()
+
+    tls = None if args.no_tls else self_signed_certificate()
+    verify = tls[0] if tls else True
+    FakeApiHandler.latency = args.latency_ms / 1000
+    server, url = start_server(FakeApiHandler, tls)
+
+    api = ApiClient()
+    clients = {
+        "before": lambda payload: requests.post(
+            url, json=payload, timeout=180, verify=verify
+        ),
+        "after": lambda payload: api.post(
+            url, json=payload, timeout=180, verify=verify
+        ).result(),
+    }
+
+    print(
+        f"{url} latency {args.latency_ms} ms, {args.users} users x "
+        f"{args.requests} requests"
+    )
+    print(f"{'client':<8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, post in clients.items():
+        elapsed, latencies = run_users(post, args.users, args.requests)
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        print(
+            f"{name:<8}{len(latencies) / elapsed:>10.1f}"
+            f"{statistics.median(latencies):>10.1f}{p95:>10.1f}"
+        )
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,28 @@
-from aws_cdk import CfnOutput
+import json
+
+from aws_cdk import CfnOutput, CfnResource, Duration
+from aws_cdk import aws_applicationautoscaling as appscaling
+from aws_cdk import aws_cloudwatch as cloudwatch
+from aws_cdk import aws_events as events
+from aws_cdk import aws_events_targets as targets
+from aws_cdk import aws_iam as iam
+from aws_cdk import aws_lambda as _lambda
 from aws_cdk import aws_sagemaker as sagemaker
 from constructs import Construct
 
+HOSTING_MODES = ("instance", "serverless", "inference_component")
+
+# per hosting mode, the metric to compare cold starts with. Dedicated instances
+# have no per-request cold start, their model latency is the baseline
+COLD_START_METRICS = {
+    "instance": "ModelLatency",
+    "serverless": "ModelSetupTime",
+    "inference_component": "ModelLoadingWaitTime",
+}
+
+# namespace of the TimeToInService metric, reported by the endpoint events Lambda
+ENDPOINT_METRICS_NAMESPACE = "ProtoFoundationAI/Endpoints"
+
 
 class SageMakerEndpointConstruct(Construct):
     """
@@ -25,15 +46,53 @@ class SageMakerEndpointConstruct(Construct):
         instance_type (str): The EC2 instance type for the deployed model instances.
         environment (dict): Environment variables to set for the SageMaker model.
         deploy_enable (bool): A flag indicating whether to deploy the SageMaker endpoint.
+        async_inference (dict): Optional asynchronous inference settings. When set,
+            the endpoint queues requests and writes results to S3 instead of
+            answering invoke_endpoint. Keys: "output_path" (S3 URI, required),
+            "failure_path" (S3 URI) and "max_concurrent_invocations_per_instance".
+        autoscaling (dict): Optional Application Auto Scaling settings for the
+            variant, see add_autoscaling.
+        extra_variants (list): Optional production variants served next to the
+            primary one, e.g. a cheaper instance type or a quantized model. Each
+            dict needs "variant_name" and may override "variant_weight",
+            "instance_count", "instance_type", "model_bucket_name",
+            "model_bucket_key", "model_docker_image", "environment" and
+            "autoscaling" and "startup". Traffic is split by the variant weights.
+        hosting (dict): Optional hosting mode settings. "mode" is "instance"
+            (default, dedicated instances), "serverless" ("memory_size_in_mb",
+            "max_concurrency", "provisioned_concurrency") or "inference_component"
+            ("accelerators", "min_memory_mb", "copy_count"). An inference component
+            joins the endpoint given as "endpoint_name" instead of creating one, so
+            several models can share an instance fleet.
+        startup (dict): Optional settings for how fast an instance starts serving:
+            "uncompressed_model" (bool, model_bucket_key is then an S3 prefix of
+            the unpacked artifact, loaded without downloading and extracting a
+            tarball), "model_data_download_timeout" and "container_startup_timeout"
+            (seconds) and "volume_size_in_gb". Extra variants may override it.
+            Only the model data settings apply to serverless endpoints.
+        warm_up (dict): Optional endpoint warm-up, see add_warm_up. Requires a
+            real-time endpoint.
 
     Attributes:
         deploy_enable (bool): A flag indicating whether the SageMaker endpoint is set to deploy.
+        variants (list): The settings of all production variants, primary first.
+        hosting_mode (str): The hosting mode of the endpoint.
+        inference_component (CfnResource): The inference component, created in the
+            inference_component hosting mode.
         endpoint (sagemaker.CfnEndpoint): The SageMaker endpoint resource, created when
             deploy_enable is True.
+        in_service_rule (events.Rule): The EventBridge rule matching the endpoint
+            reaching InService, created with the endpoint.
 
     Properties:
         endpoint_name (str): The name of the deployed SageMaker endpoint. Returns
             "not_yet_deployed" if deploy_enable is False.
+        cold_start_metric (cloudwatch.Metric): The cold start metric of the hosting
+            mode.
+        time_to_in_service_metric (cloudwatch.Metric): Seconds the endpoint took to
+            reach InService after an update or scale-out.
+        inference_component_name (str): The name of the inference component, None
+            outside the inference_component hosting mode.
     """
 
     def __init__(
@@ -52,6 +111,12 @@ class SageMakerEndpointConstruct(Construct):
         instance_type: str,
         environment: dict,
         deploy_enable: bool,
+        async_inference: dict = None,
+        autoscaling: dict = None,
+        extra_variants: list = None,
+        hosting: dict = None,
+        startup: dict = None,
+        warm_up: dict = None,
     ) -> None:
         """
         Initializes a new instance of the SageMakerEndpointConstruct.
@@ -73,6 +138,35 @@ class SageMakerEndpointConstruct(Construct):
             instance_type (str): The EC2 instance type for the deployed model instances.
             environment (dict): Environment variables to set for the SageMaker model.
             deploy_enable (bool): A flag indicating whether to deploy the SageMaker endpoint.
+            async_inference (dict): Optional asynchronous inference settings. When
+                set, the endpoint queues requests and writes results to S3 instead of
+                answering invoke_endpoint. Keys: "output_path" (S3 URI, required),
+                "failure_path" (S3 URI) and "max_concurrent_invocations_per_instance".
+            autoscaling (dict): Optional Application Auto Scaling settings for the
+                variant, see add_autoscaling.
+            extra_variants (list): Optional production variants served next to the
+                primary one, e.g. a cheaper instance type or a quantized model. Each
+                dict needs "variant_name" and may override "variant_weight",
+                "instance_count", "instance_type", "model_bucket_name",
+                "model_bucket_key", "model_docker_image", "environment" and
+                "autoscaling" and "startup". Traffic is split by the variant
+                weights.
+            hosting (dict): Optional hosting mode settings. "mode" is "instance"
+                (default, dedicated instances), "serverless" ("memory_size_in_mb",
+                "max_concurrency", "provisioned_concurrency") or
+                "inference_component" ("accelerators", "min_memory_mb",
+                "copy_count"). An inference component joins the endpoint given as
+                "endpoint_name" instead of creating one, so several models can share
+                an instance fleet.
+            startup (dict): Optional settings for how fast an instance starts
+                serving: "uncompressed_model" (bool, model_bucket_key is then an S3
+                prefix of the unpacked artifact, loaded without downloading and
+                extracting a tarball), "model_data_download_timeout" and
+                "container_startup_timeout" (seconds) and "volume_size_in_gb". Extra
+                variants may override it. Only the model data settings apply to
+                serverless endpoints.
+            warm_up (dict): Optional endpoint warm-up, see add_warm_up. Requires a
+                real-time endpoint.
 
         Return:
             None
@@ -80,43 +174,166 @@ class SageMakerEndpointConstruct(Construct):
 
         super().__init__(scope, construct_id)
 
-        model = sagemaker.CfnModel(
-            self,
-            f"{model_name}-Model",
-            execution_role_arn=role_arn,
-            containers=[
-                sagemaker.CfnModel.ContainerDefinitionProperty(
-                    image=model_docker_image,
-                    model_data_url=f"s3://{model_bucket_name}/{model_bucket_key}",
-                    environment=environment,
+        primary_variant = {
+            "variant_name": variant_name,
+            "variant_weight": variant_weight,
+            "instance_count": instance_count,
+            "instance_type": instance_type,
+            "model_bucket_name": model_bucket_name,
+            "model_bucket_key": model_bucket_key,
+            "model_docker_image": model_docker_image,
+            "environment": environment,
+            "autoscaling": autoscaling,
+            "startup": startup or {},
+        }
+        self.variants = [primary_variant] + [
+            {**primary_variant, "autoscaling": None, **variant}
+            for variant in extra_variants or []
+        ]
+
+        self.hosting_mode = (hosting or {}).get("mode", "instance")
+        if self.hosting_mode not in HOSTING_MODES:
+            raise ValueError(f"Unsupported hosting mode: {self.hosting_mode}")
+        if self.hosting_mode != "instance" and (
+            async_inference or any(variant["autoscaling"] for variant in self.variants)
+        ):
+            raise ValueError(
+                "Async inference and autoscaling require the instance hosting mode"
+            )
+        if self.hosting_mode == "inference_component" and extra_variants:
+            raise ValueError("Inference components are hosted on a single variant")
+        if self.hosting_mode == "serverless" and any(
+            set(variant["startup"]) - {"uncompressed_model"}
+            for variant in self.variants
+        ):
+            raise ValueError(
+                "Startup timeouts and volume size require instances, not serverless"
+            )
+        if warm_up and async_inference:
+            raise ValueError("Asynchronous endpoints cannot be warmed up")
+
+        models = []
+        production_variants = []
+        for variant in self.variants:
+            # the primary variant keeps the model identifiers of a single variant
+            # endpoint
+            model_id = (
+                model_name
+                if variant is primary_variant
+                else f"{model_name}-{variant['variant_name']}"
+            )
+            model_data_uri = (
+                f"s3://{variant['model_bucket_name']}/{variant['model_bucket_key']}"
+            )
+            uncompressed = variant["startup"].get("uncompressed_model", False)
+            model = sagemaker.CfnModel(
+                self,
+                f"{model_id}-Model",
+                execution_role_arn=role_arn,
+                containers=[
+                    sagemaker.CfnModel.ContainerDefinitionProperty(
+                        image=variant["model_docker_image"],
+                        model_data_url=None if uncompressed else model_data_uri,
+                        environment=variant["environment"],
+                    )
+                ],
+                model_name=f"{project_prefix}-{model_id}-Model",
+            )
+            if uncompressed:
+                # CDK 2.103 has no model_data_source in the container definition.
+                # SageMaker copies the objects under the prefix to /opt/ml/model as
+                # they are, a prefix has to end with a slash
+                model.add_property_override(
+                    "Containers.0.ModelDataSource",
+                    {
+                        "S3DataSource": {
+                            "S3Uri": model_data_uri.rstrip("/") + "/",
+                            "S3DataType": "S3Prefix",
+                            "CompressionType": "None",
+                        }
+                    },
                 )
-            ],
-            model_name=f"{project_prefix}-{model_name}-Model",
-        )
+            models.append(model)
 
-        config = sagemaker.CfnEndpointConfig(
-            self,
-            f"{model_name}-Config",
-            endpoint_config_name=f"{project_prefix}-{model_name}-Config",
-            production_variants=[
-                sagemaker.CfnEndpointConfig.ProductionVariantProperty(
-                    model_name=model.attr_model_name,
-                    variant_name=variant_name,
-                    initial_variant_weight=variant_weight,
-                    initial_instance_count=instance_count,
-                    instance_type=instance_type,
+            if self.hosting_mode == "serverless":
+                endpoint_config = sagemaker.CfnEndpointConfig
+                serverless_config = endpoint_config.ServerlessConfigProperty(
+                    memory_size_in_mb=hosting.get("memory_size_in_mb", 6144),
+                    max_concurrency=hosting.get("max_concurrency", 5),
+                    provisioned_concurrency=hosting.get("provisioned_concurrency"),
                 )
-            ],
-        )
+                production_variants.append(
+                    endpoint_config.ProductionVariantProperty(
+                        model_name=model.attr_model_name,
+                        variant_name=variant["variant_name"],
+                        initial_variant_weight=variant["variant_weight"],
+                        serverless_config=serverless_config,
+                    )
+                )
+            else:
+                production_variants.append(
+                    sagemaker.CfnEndpointConfig.ProductionVariantProperty(
+                        model_name=model.attr_model_name,
+                        variant_name=variant["variant_name"],
+                        initial_variant_weight=variant["variant_weight"],
+                        initial_instance_count=variant["instance_count"],
+                        instance_type=variant["instance_type"],
+                        model_data_download_timeout_in_seconds=variant["startup"].get(
+                            "model_data_download_timeout"
+                        ),
+                        container_startup_health_check_timeout_in_seconds=variant[
+                            "startup"
+                        ].get("container_startup_timeout"),
+                        volume_size_in_gb=variant["startup"].get("volume_size_in_gb"),
+                    )
+                )
+
+        async_inference_config = None
+        if async_inference:
+            endpoint_config = sagemaker.CfnEndpointConfig
+            async_inference_config = endpoint_config.AsyncInferenceConfigProperty(
+                output_config=endpoint_config.AsyncInferenceOutputConfigProperty(
+                    s3_output_path=async_inference["output_path"],
+                    s3_failure_path=async_inference.get("failure_path"),
+                ),
+                client_config=endpoint_config.AsyncInferenceClientConfigProperty(
+                    max_concurrent_invocations_per_instance=async_inference.get(
+                        "max_concurrent_invocations_per_instance"
+                    ),
+                ),
+            )
 
         self.deploy_enable = deploy_enable
-        if deploy_enable:
+        self.is_async = bool(async_inference)
+        self.inference_component = None
+        self.in_service_rule = None
+
+        # an inference component can join the instance fleet of an endpoint
+        # created by another stack
+        shared_endpoint_name = (hosting or {}).get("endpoint_name")
+        if shared_endpoint_name:
+            self._endpoint_name = shared_endpoint_name
+        else:
+            config = sagemaker.CfnEndpointConfig(
+                self,
+                f"{model_name}-Config",
+                endpoint_config_name=f"{project_prefix}-{model_name}-Config",
+                production_variants=production_variants,
+                async_inference_config=async_inference_config,
+            )
+            if self.hosting_mode == "inference_component":
+                # models are attached by inference components, not by the variant
+                config.add_property_deletion_override("ProductionVariants.0.ModelName")
+                config.add_property_override("ExecutionRoleArn", role_arn)
+
+        if deploy_enable and not shared_endpoint_name:
             self.endpoint = sagemaker.CfnEndpoint(
                 self,
                 f"{model_name}-Endpoint",
                 endpoint_name=f"{project_prefix}-{model_name}-Endpoint",
                 endpoint_config_name=config.attr_endpoint_config_name,
             )
+            self._endpoint_name = self.endpoint.attr_endpoint_name
 
             CfnOutput(
                 scope=self,
@@ -124,6 +341,386 @@ class SageMakerEndpointConstruct(Construct):
                 value=self.endpoint.endpoint_name,
             )
 
+            for variant in self.variants:
+                if variant["autoscaling"]:
+                    self.add_autoscaling(
+                        variant["variant_name"], variant["autoscaling"]
+                    )
+
+            self.add_time_to_in_service_metric(model_name)
+
+        if deploy_enable and self.hosting_mode == "inference_component":
+            # CDK 2.103 has no L1 class for inference components yet
+            self.inference_component = CfnResource(
+                self,
+                f"{model_name}-InferenceComponent",
+                type="AWS::SageMaker::InferenceComponent",
+                properties={
+                    "InferenceComponentName": f"{project_prefix}-{model_name}-IC",
+                    "EndpointName": self._endpoint_name,
+                    "VariantName": variant_name,
+                    "Specification": {
+                        "ModelName": models[0].attr_model_name,
+                        "ComputeResourceRequirements": {
+                            "NumberOfAcceleratorDevicesRequired": hosting.get(
+                                "accelerators", 1
+                            ),
+                            "MinMemoryRequiredInMb": hosting.get("min_memory_mb", 1024),
+                        },
+                    },
+                    "RuntimeConfig": {"CopyCount": hosting.get("copy_count", 1)},
+                },
+            )
+            if not shared_endpoint_name:
+                self.inference_component.add_dependency(self.endpoint)
+
+            CfnOutput(
+                scope=self,
+                id=f"{model_name}InferenceComponentName",
+                value=self.inference_component_name,
+            )
+
+        if deploy_enable and warm_up:
+            self.add_warm_up(model_name, warm_up)
+
+        if deploy_enable:
+            CfnOutput(
+                scope=self,
+                id=f"{model_name}HostingMode",
+                value=self.hosting_mode,
+            )
+            CfnOutput(
+                scope=self,
+                id=f"{model_name}ColdStartMetric",
+                value=f"{COLD_START_METRICS[self.hosting_mode]} (AWS/SageMaker)",
+            )
+
+    def add_autoscaling(
+        self, variant_name: str, autoscaling: dict
+    ) -> appscaling.ScalableTarget:
+        """
+        Registers the variant with Application Auto Scaling and adds a target
+        tracking policy for every target given in the settings.
+
+        Args:
+            variant_name (str): The name of the production variant to scale.
+            autoscaling (dict): The scaling settings:
+                "min_capacity" (int): Minimum instance count, default 1. Zero is
+                    only supported for asynchronous endpoints, which then scale out
+                    from zero when requests are waiting.
+                "max_capacity" (int): Maximum instance count.
+                "invocations_per_instance" (float): Target of the predefined
+                    SageMakerVariantInvocationsPerInstance metric (per minute).
+                "gpu_utilization" (float): Target average GPU utilization in percent.
+                "model_latency_ms" (float): Target average ModelLatency in ms.
+                "backlog_per_instance" (float): Target ApproximateBacklogSizePerInstance
+                    of an asynchronous endpoint.
+                "scale_in_cooldown" (int): Seconds, default 300.
+                "scale_out_cooldown" (int): Seconds, default 60.
+                "schedules" (list): Scheduled changes of the capacity range, e.g.
+                    to scale out ahead of business hours. Each dict has a "name",
+                    a "schedule" expression ("cron(0 7 ? * MON-FRI *)"), the new
+                    "min_capacity" and/or "max_capacity" and may set a "time_zone"
+                    (IANA name, default UTC).
+
+        Return:
+            appscaling.ScalableTarget: The scalable target of the variant.
+        """
+
+        min_capacity = autoscaling.get("min_capacity", 1)
+        schedules = autoscaling.get("schedules", [])
+        scheduled_min = [schedule.get("min_capacity") for schedule in schedules]
+        if 0 in [min_capacity] + scheduled_min and not self.is_async:
+            raise ValueError(
+                "Scaling to zero instances requires an asynchronous inference endpoint"
+            )
+
+        target = appscaling.ScalableTarget(
+            self,
+            f"{variant_name}-ScalableTarget",
+            service_namespace=appscaling.ServiceNamespace.SAGEMAKER,
+            resource_id=f"endpoint/{self.endpoint.attr_endpoint_name}"
+            f"/variant/{variant_name}",
+            scalable_dimension="sagemaker:variant:DesiredInstanceCount",
+            min_capacity=min_capacity,
+            max_capacity=autoscaling["max_capacity"],
+        )
+        target.node.add_dependency(self.endpoint)
+
+        cooldowns = {
+            "scale_in_cooldown": Duration.seconds(
+                autoscaling.get("scale_in_cooldown", 300)
+            ),
+            "scale_out_cooldown": Duration.seconds(
+                autoscaling.get("scale_out_cooldown", 60)
+            ),
+        }
+        dimensions = {
+            "EndpointName": self.endpoint.attr_endpoint_name,
+            "VariantName": variant_name,
+        }
+
+        if "invocations_per_instance" in autoscaling:
+            predefined = appscaling.PredefinedMetric
+            target.scale_to_track_metric(
+                "InvocationsScaling",
+                target_value=autoscaling["invocations_per_instance"],
+                predefined_metric=predefined.SAGEMAKER_VARIANT_INVOCATIONS_PER_INSTANCE,
+                **cooldowns,
+            )
+
+        if "gpu_utilization" in autoscaling:
+            target.scale_to_track_metric(
+                "GpuUtilizationScaling",
+                target_value=autoscaling["gpu_utilization"],
+                custom_metric=cloudwatch.Metric(
+                    namespace="/aws/sagemaker/Endpoints",
+                    metric_name="GPUUtilization",
+                    dimensions_map=dimensions,
+                    statistic="Average",
+                ),
+                **cooldowns,
+            )
+
+        if "model_latency_ms" in autoscaling:
+            # ModelLatency is reported in microseconds
+            target.scale_to_track_metric(
+                "ModelLatencyScaling",
+                target_value=autoscaling["model_latency_ms"] * 1000,
+                custom_metric=cloudwatch.Metric(
+                    namespace="AWS/SageMaker",
+                    metric_name="ModelLatency",
+                    dimensions_map=dimensions,
+                    statistic="Average",
+                ),
+                **cooldowns,
+            )
+
+        if "backlog_per_instance" in autoscaling:
+            target.scale_to_track_metric(
+                "BacklogScaling",
+                target_value=autoscaling["backlog_per_instance"],
+                custom_metric=cloudwatch.Metric(
+                    namespace="AWS/SageMaker",
+                    metric_name="ApproximateBacklogSizePerInstance",
+                    dimensions_map={"EndpointName": self.endpoint.attr_endpoint_name},
+                    statistic="Average",
+                ),
+                **cooldowns,
+            )
+
+        if min_capacity == 0:
+            # target tracking cannot leave zero instances, step in when requests wait
+            target.scale_on_metric(
+                "ScaleFromZero",
+                metric=cloudwatch.Metric(
+                    namespace="AWS/SageMaker",
+                    metric_name="HasBacklogWithoutCapacity",
+                    dimensions_map={"EndpointName": self.endpoint.attr_endpoint_name},
+                    statistic="Average",
+                    period=Duration.minutes(1),
+                ),
+                scaling_steps=[
+                    appscaling.ScalingInterval(upper=0.5, change=0),
+                    appscaling.ScalingInterval(lower=0.5, change=1),
+                ],
+                adjustment_type=appscaling.AdjustmentType.CHANGE_IN_CAPACITY,
+                cooldown=cooldowns["scale_out_cooldown"],
+            )
+
+        for index, schedule in enumerate(schedules):
+            target.scale_on_schedule(
+                schedule["name"],
+                schedule=appscaling.Schedule.expression(schedule["schedule"]),
+                min_capacity=schedule.get("min_capacity"),
+                max_capacity=schedule.get("max_capacity"),
+            )
+            if "time_zone" in schedule:
+                # CDK 2.103 has no time zone for scheduled actions
+                target.node.default_child.add_property_override(
+                    f"ScheduledActions.{index}.Timezone", schedule["time_zone"]
+                )
+
+        return target
+
+    def add_time_to_in_service_metric(self, model_name: str) -> _lambda.Function:
+        """
+        Reports how long the endpoint took to reach InService after it was created
+        or updated, scale-outs by autoscaling included. An EventBridge rule sends
+        the state changes of the endpoint to a Lambda function that logs the
+        TimeToInService metric in Embedded Metric Format.
+
+        Args:
+            model_name (str): The model name the construct ids are derived from.
+
+        Return:
+            _lambda.Function: The function recording the metric.
+        """
+
+        function = _lambda.Function(
+            self,
+            f"{model_name}-EndpointEvents",
+            runtime=_lambda.Runtime.PYTHON_3_9,
+            code=_lambda.Code.from_asset("src/lambda_endpoint_events"),
+            handler="endpoint_events.lambda_handler",
+            timeout=Duration.seconds(10),
+            environment={"METRICS_NAMESPACE": ENDPOINT_METRICS_NAMESPACE},
+        )
+
+        self.in_service_rule = events.Rule(
+            self,
+            f"{model_name}-InServiceRule",
+            event_pattern=events.EventPattern(
+                source=["aws.sagemaker"],
+                detail_type=["SageMaker Endpoint State Change"],
+                detail={
+                    "EndpointName": [self.endpoint.attr_endpoint_name],
+                    "EndpointStatus": ["IN_SERVICE"],
+                },
+            ),
+            targets=[targets.LambdaFunction(function)],
+        )
+
+        CfnOutput(
+            scope=self,
+            id=f"{model_name}TimeToInServiceMetric",
+            value=f"TimeToInService ({ENDPOINT_METRICS_NAMESPACE})",
+        )
+        return function
+
+    def add_warm_up(self, model_name: str, warm_up: dict) -> _lambda.Function:
+        """
+        Adds a Lambda function that sends representative requests to the endpoint
+        in rounds until the median latency of a round settles, so the first user
+        requests after a deployment or scale-out do not pay for loading the model
+        on the GPU and compiling kernels. It runs when the endpoint reaches
+        InService and on the optional schedule, and logs the WarmUpDuration
+        metric.
+
+        Args:
+            model_name (str): The model name the construct ids are derived from.
+            warm_up (dict): The warm-up settings:
+                "payloads" (list): Request bodies as the model container takes
+                    them, sent as application/json in every round.
+                "schedule" (str): Optional EventBridge schedule expression, e.g.
+                    after a scheduled scale-out ahead of the morning peak.
+                "max_rounds" (int): Rounds sent at most, default 10.
+                "tolerance" (float): Relative change of the median latency
+                    between two rounds that counts as settled, default 0.2.
+
+        Return:
+            _lambda.Function: The warm-up function.
+        """
+
+        function = _lambda.Function(
+            self,
+            f"{model_name}-WarmUp",
+            runtime=_lambda.Runtime.PYTHON_3_9,
+            code=_lambda.Code.from_asset("src/lambda_endpoint_warmup"),
+            handler="endpoint_warmup.lambda_handler",
+            timeout=Duration.minutes(10),
+            environment={
+                "ENDPOINT_NAME": self._endpoint_name,
+                "INFERENCE_COMPONENT_NAME": self.inference_component_name or "",
+                "WARM_UP_PAYLOADS": json.dumps(warm_up["payloads"]),
+                "WARM_UP_MAX_ROUNDS": str(warm_up.get("max_rounds", 10)),
+                "WARM_UP_TOLERANCE": str(warm_up.get("tolerance", 0.2)),
+                "METRICS_NAMESPACE": ENDPOINT_METRICS_NAMESPACE,
+            },
+        )
+        function.add_to_role_policy(
+            iam.PolicyStatement(
+                effect=iam.Effect.ALLOW,
+                actions=["sagemaker:InvokeEndpoint", "sagemaker:DescribeEndpoint"],
+                resources=["*"],
+            )
+        )
+
+        # an inference component on a shared endpoint is warmed on schedule only
+        if self.in_service_rule is not None:
+            self.in_service_rule.add_target(targets.LambdaFunction(function))
+        if "schedule" in warm_up:
+            events.Rule(
+                self,
+                f"{model_name}-WarmUpSchedule",
+                schedule=events.Schedule.expression(warm_up["schedule"]),
+                targets=[
+                    targets.LambdaFunction(
+                        function,
+                        event=events.RuleTargetInput.from_object(
+                            {"trigger": "Schedule"}
+                        ),
+                    )
+                ],
+            )
+
+        CfnOutput(
+            scope=self,
+            id=f"{model_name}WarmUpMetric",
+            value=f"WarmUpDuration ({ENDPOINT_METRICS_NAMESPACE})",
+        )
+        return function
+
+    @property
+    def time_to_in_service_metric(self) -> cloudwatch.Metric:
+        """
+        Gets the CloudWatch metric of the seconds from the start of an endpoint
+        creation or update to InService. The Operation dimension is "Create" for
+        the first deployment and "Update" for later ones, scale-outs included.
+
+        Return:
+            cloudwatch.Metric: The maximum time to InService of the endpoint.
+        """
+
+        return cloudwatch.Metric(
+            namespace=ENDPOINT_METRICS_NAMESPACE,
+            metric_name="TimeToInService",
+            dimensions_map={"EndpointName": self.endpoint_name, "Operation": "Update"},
+            statistic="Maximum",
+        )
+
+    @property
+    def cold_start_metric(self) -> cloudwatch.Metric:
+        """
+        Gets the CloudWatch metric that shows the cold start cost of the hosting
+        mode: the container setup time of serverless endpoints, the model loading
+        wait time of inference components and the model latency of dedicated
+        instances as the baseline.
+
+        Return:
+            cloudwatch.Metric: The cold start metric of the endpoint.
+        """
+
+        if self.hosting_mode == "inference_component":
+            dimensions = {"InferenceComponentName": self.inference_component_name}
+        else:
+            dimensions = {
+                "EndpointName": self.endpoint_name,
+                "VariantName": self.variants[0]["variant_name"],
+            }
+
+        return cloudwatch.Metric(
+            namespace="AWS/SageMaker",
+            metric_name=COLD_START_METRICS[self.hosting_mode],
+            dimensions_map=dimensions,
+            statistic="Average",
+        )
+
+    @property
+    def inference_component_name(self) -> str:
+        """
+        Gets the name of the inference component to pass as InferenceComponentName
+        when invoking the endpoint.
+
+        Return:
+            str: The inference component name, None outside the inference_component
+            hosting mode.
+        """
+
+        if self.inference_component is None:
+            return None
+        return self.inference_component.get_att("InferenceComponentName").to_string()
+
     @property
     def endpoint_name(self) -> str:
         """
@@ -134,8 +731,4 @@ class SageMakerEndpointConstruct(Construct):
             if deploy_enable is False.
         """
 
-        return (
-            self.endpoint.attr_endpoint_name
-            if self.deploy_enable
-            else "not_yet_deployed"
-        )
+        return self._endpoint_name if self.deploy_enable else "not_yet_deployed"
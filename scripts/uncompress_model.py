@@ -0,0 +1,81 @@
+"""
+Converts a model.tar.gz artifact in S3 to the uncompressed layout that
+SageMakerEndpointConstruct loads with startup={"uncompressed_model": True}: every
+file of the tarball as its own object under an S3 prefix. New instances then copy
+the files to /opt/ml/model without downloading and extracting the tarball.
+
+The tarball is streamed, nothing is written to the local disk.
+
+Usage:
+    python scripts/uncompress_model.py s3://bucket/model.tar.gz s3://bucket/model/
+"""
+import argparse
+import tarfile
+from urllib.parse import urlparse
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+
+
+def _split_s3_uri(uri: str) -> tuple:
+    parsed = urlparse(uri)
+    if parsed.scheme != "s3" or not parsed.netloc:
+        raise ValueError(f"Not an S3 URI: {uri}")
+    return parsed.netloc, parsed.path.lstrip("/")
+
+
+def uncompress(source_uri: str, target_uri: str, dry_run: bool = False) -> int:
+    """
+    Copies the files of a tarball in S3 to objects under an S3 prefix.
+
+    Args:
+        source_uri (str): The S3 URI of the tar.gz artifact.
+        target_uri (str): The S3 prefix to write the files to.
+        dry_run (bool): Lists the objects without writing them.
+
+    Return:
+        int: The number of objects written.
+    """
+
+    source_bucket, source_key = _split_s3_uri(source_uri)
+    target_bucket, target_prefix = _split_s3_uri(target_uri)
+    target_prefix = target_prefix.rstrip("/") + "/" if target_prefix else ""
+
+    s3 = boto3.client("s3")
+    body = s3.get_object(Bucket=source_bucket, Key=source_key)["Body"]
+    # large weight files are uploaded in parts of 64 MiB
+    transfer_config = TransferConfig(multipart_chunksize=64 * 1024**2)
+
+    written = 0
+    with tarfile.open(fileobj=body, mode="r|*") as archive:
+        for member in archive:
+            if not member.isfile():
+                continue
+            key = target_prefix + member.name.removeprefix("./")
+            print(f"{member.size:>14,} s3://{target_bucket}/{key}")
+            if not dry_run:
+                s3.upload_fileobj(
+                    archive.extractfile(member),
+                    target_bucket,
+                    key,
+                    Config=transfer_config,
+                )
+            written += 1
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("source", help="S3 URI of the model.tar.gz artifact")
+    parser.add_argument("target", help="S3 prefix of the uncompressed artifact")
+    parser.add_argument(
+        "--dry-run", action="store_true", help="list the files, do not upload them"
+    )
+    args = parser.parse_args()
+
+    written = uncompress(args.source, args.target, args.dry_run)
+    print(f"{written} files {'found' if args.dry_run else 'written'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import json
+import os
+from datetime import datetime
+
+# CloudWatch namespace of the endpoint metrics, set by SageMakerEndpointConstruct
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "ProtoFoundationAI/Endpoints")
+
+
+def _timestamp(value) -> float:
+    """Seconds since the epoch of an event time, sent as epoch ms or ISO 8601."""
+
+    if isinstance(value, (int, float)):
+        return value / 1000
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def lambda_handler(event, context):
+    """
+    Logs the time an endpoint took to reach InService as a CloudWatch Embedded
+    Metric Format record. The state change event carries the time the creation
+    or update started, an update includes the instances added by autoscaling.
+    """
+
+    detail = event["detail"]
+    started = _timestamp(detail["LastModifiedTime"])
+    in_service = _timestamp(event["time"])
+    operation = (
+        "Create"
+        if detail.get("CreationTime") == detail["LastModifiedTime"]
+        else "Update"
+    )
+
+    dimensions = {"EndpointName": detail["EndpointName"], "Operation": operation}
+    record = {
+        "_aws": {
+            "Timestamp": int(in_service * 1000),
+            "CloudWatchMetrics": [
+                {
+                    "Namespace": METRICS_NAMESPACE,
+                    "Dimensions": [list(dimensions)],
+                    "Metrics": [{"Name": "TimeToInService", "Unit": "Seconds"}],
+                }
+            ],
+        },
+        **dimensions,
+        "TimeToInService": round(in_service - started, 1),
+        "EndpointConfigName": detail.get("EndpointConfigName"),
+    }
+    print(json.dumps(record))
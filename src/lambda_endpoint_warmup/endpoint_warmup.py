@@ -0,0 +1,138 @@
+import json
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+
+# set by SageMakerEndpointConstruct
+ENDPOINT_NAME = os.environ.get("ENDPOINT_NAME", "")
+INFERENCE_COMPONENT_NAME = os.environ.get("INFERENCE_COMPONENT_NAME", "")
+# JSON list of request bodies the model serves, sent as application/json
+WARM_UP_PAYLOADS = json.loads(os.environ.get("WARM_UP_PAYLOADS", "[]"))
+# rounds sent at most, and the relative change of the median latency between two
+# rounds below which the endpoint counts as warm
+WARM_UP_MAX_ROUNDS = int(os.environ.get("WARM_UP_MAX_ROUNDS", "10"))
+WARM_UP_TOLERANCE = float(os.environ.get("WARM_UP_TOLERANCE", "0.2"))
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "ProtoFoundationAI/Endpoints")
+
+runtime = boto3.client("sagemaker-runtime")
+sagemaker = boto3.client("sagemaker")
+
+
+def _instance_count() -> int:
+    """Instances serving the endpoint, 1 for serverless variants."""
+
+    endpoint = sagemaker.describe_endpoint(EndpointName=ENDPOINT_NAME)
+    return max(
+        sum(
+            variant.get("CurrentInstanceCount", 1)
+            for variant in endpoint.get("ProductionVariants", [])
+        ),
+        1,
+    )
+
+
+def _invoke(payload: dict) -> float:
+    """Seconds until the response of one request was read."""
+
+    routing = {}
+    if INFERENCE_COMPONENT_NAME:
+        routing["InferenceComponentName"] = INFERENCE_COMPONENT_NAME
+    start = time.perf_counter()
+    response = runtime.invoke_endpoint(
+        EndpointName=ENDPOINT_NAME,
+        ContentType="application/json",
+        Accept="application/json",
+        Body=json.dumps(payload).encode("utf-8"),
+        **routing,
+    )
+    response["Body"].read()
+    return time.perf_counter() - start
+
+
+def _round(concurrency: int) -> list:
+    """
+    Sends every payload concurrency times at once. The endpoint routes requests
+    to instances at random, so with as many requests as instances most of them,
+    new ones included, get a share of each round.
+
+    Return:
+        list: The latency of each request that succeeded, in seconds.
+    """
+
+    requests = [payload for payload in WARM_UP_PAYLOADS for _ in range(concurrency)]
+    latencies = []
+    with ThreadPoolExecutor(max_workers=len(requests)) as executor:
+        for future in [executor.submit(_invoke, payload) for payload in requests]:
+            try:
+                latencies.append(future.result())
+            except Exception as e:
+                print(f"Warm-up request failed: {e!r}")
+    return latencies
+
+
+def lambda_handler(event, context):
+    """
+    Sends the representative payloads in rounds until the median latency of a
+    round is within WARM_UP_TOLERANCE of the round before, and logs the warm-up
+    duration as a CloudWatch Embedded Metric Format record.
+
+    Runs on a schedule ahead of the traffic peak, and after the endpoint reached
+    InService on a deployment or scale-out.
+    """
+
+    if event.get("source") == "aws.sagemaker":
+        trigger = "InService"
+    else:
+        trigger = event.get("trigger", "Schedule")
+
+    concurrency = _instance_count()
+    start = time.time()
+    medians = []
+    requests = 0
+    stable = False
+    for _ in range(WARM_UP_MAX_ROUNDS):
+        round_start = time.time()
+        latencies = _round(concurrency)
+        requests += len(WARM_UP_PAYLOADS) * concurrency
+        if not latencies:
+            break
+        medians.append(statistics.median(latencies))
+        if len(medians) > 1:
+            change = abs(medians[-1] - medians[-2]) / medians[-2]
+            if change <= WARM_UP_TOLERANCE:
+                stable = True
+                break
+        # another round has to finish within the Lambda timeout
+        round_ms = (time.time() - round_start) * 1000
+        if context.get_remaining_time_in_millis() < 2 * round_ms:
+            break
+    duration = time.time() - start
+
+    dimensions = {"EndpointName": ENDPOINT_NAME, "Trigger": trigger}
+    record = {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [
+                {
+                    "Namespace": METRICS_NAMESPACE,
+                    "Dimensions": [list(dimensions)],
+                    "Metrics": [
+                        {"Name": "WarmUpDuration", "Unit": "Seconds"},
+                        {"Name": "WarmUpRequests", "Unit": "Count"},
+                    ],
+                }
+            ],
+        },
+        **dimensions,
+        "WarmUpDuration": round(duration, 1),
+        "WarmUpRequests": requests,
+        "Instances": concurrency,
+        "Stable": stable,
+        "MedianLatencies": [round(median, 3) for median in medians],
+    }
+    print(json.dumps(record))
+
+    return {"stable": stable, "duration": duration, "medians": medians}
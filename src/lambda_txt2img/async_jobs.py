@@ -0,0 +1,104 @@
+import json
+import os
+import time
+import uuid
+from urllib.parse import urlparse
+
+# bucket for async inference inputs and job records, set by WebStack
+ASYNC_BUCKET_NAME = os.environ.get("ASYNC_BUCKET_NAME", "")
+POLL_INTERVAL_SECONDS = 1
+MISSING_OBJECT_ERROR_CODES = ("NoSuchKey", "404", "AccessDenied", "403")
+
+_s3 = None
+
+
+def enabled():
+    return bool(ASYNC_BUCKET_NAME)
+
+
+def _s3_client():
+    # created on the first async request, synchronous requests don't need it
+    global _s3
+    if _s3 is None:
+        import boto3
+
+        _s3 = boto3.client("s3")
+    return _s3
+
+
+def _read_s3_uri(uri):
+    s3 = _s3_client()
+    location = urlparse(uri)
+    try:
+        response = s3.get_object(Bucket=location.netloc, Key=location.path.lstrip("/"))
+    except s3.exceptions.ClientError as e:
+        # a result not written yet, reported as 403 when listing is not allowed
+        if e.response["Error"]["Code"] in MISSING_OBJECT_ERROR_CODES:
+            return None
+        raise
+    return response["Body"].read()
+
+
+def submit_job(runtime, endpoint_name, prompt, image_format):
+    """
+    Uploads the prompt and queues it on an asynchronous inference endpoint.
+
+    Return:
+        str: The job id to poll with get_job.
+    """
+    s3 = _s3_client()
+    job_id = str(uuid.uuid4())
+    input_key = f"inputs/{job_id}.txt"
+    s3.put_object(Bucket=ASYNC_BUCKET_NAME, Key=input_key, Body=prompt.encode())
+
+    response = runtime.invoke_endpoint_async(
+        EndpointName=endpoint_name,
+        InputLocation=f"s3://{ASYNC_BUCKET_NAME}/{input_key}",
+        ContentType="application/x-text",
+        InferenceId=job_id,
+    )
+
+    record = {
+        "prompt": prompt,
+        "image_format": image_format,
+        "output_location": response["OutputLocation"],
+        "failure_location": response.get("FailureLocation"),
+        "submitted_at": time.time(),
+    }
+    s3.put_object(
+        Bucket=ASYNC_BUCKET_NAME, Key=f"jobs/{job_id}.json", Body=json.dumps(record)
+    )
+
+    return job_id
+
+
+def get_job(job_id, wait_seconds=0):
+    """
+    Looks up a job, waiting up to wait_seconds for it to finish (long-poll).
+
+    Return:
+        tuple: The job record, or None for an unknown job id, the status
+        ("pending", "completed" or "failed") and the endpoint output bytes or
+        failure message.
+    """
+    s3 = _s3_client()
+    try:
+        response = s3.get_object(Bucket=ASYNC_BUCKET_NAME, Key=f"jobs/{job_id}.json")
+    except s3.exceptions.NoSuchKey:
+        return None, None, None
+    record = json.loads(response["Body"].read())
+
+    deadline = time.time() + wait_seconds
+    while True:
+        output = _read_s3_uri(record["output_location"])
+        if output is not None:
+            return record, "completed", output
+
+        if record["failure_location"]:
+            failure = _read_s3_uri(record["failure_location"])
+            if failure is not None:
+                return record, "failed", failure.decode("utf-8", errors="replace")
+
+        if time.time() + POLL_INTERVAL_SECONDS > deadline:
+            return record, "pending", None
+        time.sleep(POLL_INTERVAL_SECONDS)
@@ -0,0 +1,165 @@
+import io
+import re
+import struct
+import zlib
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# bytes read from the endpoint response at a time
+READ_CHUNK_SIZE = 64 * 1024
+# the pixel array ends with the closing brackets of the last pixel, row and image
+ARRAY_END = re.compile(rb"\]\s*\]\s*\]")
+ROW_END = re.compile(rb"\]\s*\]")
+# turns the array syntax into whitespace, leaving only the numbers
+SEPARATORS = bytes.maketrans(b"[],", b"   ")
+
+
+class Pixels:
+    """
+    An 8-bit RGB(A) image packed row by row into a single buffer, a fraction of
+    the size of the nested lists returned by json.loads.
+
+    Attributes:
+        width (int): Pixels per row.
+        height (int): Number of rows.
+        channels (int): 3 for RGB, 4 for RGBA.
+        data (bytearray): width * height * channels values, row after row.
+    """
+
+    def __init__(self, width: int, height: int, channels: int, data: bytearray):
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.data = data
+
+    @classmethod
+    def from_list(cls, pixels: list) -> "Pixels":
+        data = bytearray(value for row in pixels for pixel in row for value in pixel)
+        return cls(len(pixels[0]), len(pixels), len(pixels[0][0]), data)
+
+    def tolist(self) -> list:
+        """The nested [row][column][channel] list of the legacy JSON response."""
+
+        row_size = self.width * self.channels
+        return [
+            [
+                list(self.data[start : start + self.channels])
+                for start in range(row, row + row_size, self.channels)
+            ]
+            for row in range(0, len(self.data), row_size)
+        ]
+
+
+def _png_chunk(chunk_type: bytes, parts: list) -> list:
+    # the parts are joined once with the whole file instead of per chunk
+    crc = zlib.crc32(chunk_type)
+    for part in parts:
+        crc = zlib.crc32(part, crc)
+    length = sum(len(part) for part in parts)
+    return [struct.pack(">I", length), chunk_type, *parts, struct.pack(">I", crc)]
+
+
+def read_pixels(
+    stream, key: str = "generated_image", chunk_size: int = READ_CHUNK_SIZE
+) -> Pixels:
+    """
+    Reads the nested pixel list of a Stable Diffusion response incrementally, so
+    neither the whole response body nor the parsed lists are held in memory.
+
+    Args:
+        stream: A file-like object such as the botocore StreamingBody of the
+            endpoint response, or the response bytes.
+        key (str): The JSON key holding the pixel array.
+        chunk_size (int): Bytes read at a time.
+
+    Return:
+        Pixels: The packed image.
+    """
+
+    if isinstance(stream, (bytes, bytearray)):
+        stream = io.BytesIO(stream)
+
+    def read_more(buffer):
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            raise ValueError(f"Truncated response, no complete {key} array")
+        return buffer + chunk
+
+    # the key is matched with its quotes, an escaped key inside a string is not
+    key_pattern = re.compile(rb'"' + re.escape(key.encode()) + rb'"\s*:\s*\[')
+    buffer = b""
+    while True:
+        buffer = read_more(buffer)
+        match = key_pattern.search(buffer)
+        if match:
+            buffer = buffer[match.end() :]
+            break
+        # keeps enough of the tail for a key split across chunks
+        buffer = buffer[-256:]
+
+    while not ROW_END.search(buffer):
+        buffer = read_more(buffer)
+    first_row = buffer[: ROW_END.search(buffer).end()]
+    channels = len(first_row[: first_row.index(b"]")].translate(SEPARATORS).split())
+    width = len(first_row.translate(SEPARATORS).split()) // channels
+
+    data = bytearray()
+    while True:
+        end = ARRAY_END.search(buffer)
+        if end:
+            data.extend(map(int, buffer[: end.start()].translate(SEPARATORS).split()))
+            break
+        # numbers before the last comma are complete
+        cut = buffer.rfind(b",")
+        if cut > 0:
+            data.extend(map(int, buffer[:cut].translate(SEPARATORS).split()))
+            buffer = buffer[cut:]
+        buffer = read_more(buffer)
+
+    row_size = width * channels
+    if len(data) % row_size:
+        raise ValueError(f"Rows of {key} differ in length")
+    return Pixels(width, len(data) // row_size, channels, data)
+
+
+def encode_png(pixels, compress_level: int = 6) -> bytes:
+    """
+    Packs an image, as returned by the Stable Diffusion container, into a PNG
+    file using only the standard library.
+
+    Args:
+        pixels (Pixels | list): The packed image, or the image rows, each a list of
+            [r, g, b] or [r, g, b, a] ints.
+        compress_level (int): zlib compression level, 0-9.
+
+    Return:
+        bytes: The encoded PNG image.
+    """
+
+    if not isinstance(pixels, Pixels):
+        pixels = Pixels.from_list(pixels)
+    color_type = {3: 2, 4: 6}[pixels.channels]
+
+    # rows are compressed one at a time, without a filtered copy of the image
+    compressor = zlib.compressobj(compress_level)
+    view = memoryview(pixels.data)
+    row_size = pixels.width * pixels.channels
+    idat = []
+    for start in range(0, len(view), row_size):
+        # filter type 0 (None) for every scanline
+        idat.append(compressor.compress(b"\x00"))
+        idat.append(compressor.compress(view[start : start + row_size]))
+    idat.append(compressor.flush())
+
+    header = struct.pack(
+        ">IIBBBBB", pixels.width, pixels.height, 8, color_type, 0, 0, 0
+    )
+
+    return b"".join(
+        [
+            PNG_SIGNATURE,
+            *_png_chunk(b"IHDR", [header]),
+            *_png_chunk(b"IDAT", idat),
+            *_png_chunk(b"IEND", []),
+        ]
+    )
@@ -1,26 +1,338 @@
+import base64
 import json
+import math
+from functools import partial
 
-import boto3
+import async_jobs
+from admission import PRIORITIES, Overloaded, admission
+from concurrent_invoke import invoke_all, remaining_seconds
+from generation_params import (
+    DEFAULT_PRESET,
+    IMAGE_PARAMETERS,
+    IMAGE_PRESETS,
+    MAX_SEED,
+    ParameterError,
+    resolve_parameters,
+)
+from http_encoding import compressed_response, read_body, request_header
+from image_codec import encode_png, read_pixels
+from inference_cache import cache_key, is_cacheable, result_cache
+from sagemaker_runtime import create_runtime_client, routing_kwargs
+from single_flight import single_flight
+from stage_timing import timed_handler
 
-runtime = boto3.client("runtime.sagemaker")
+runtime = create_runtime_client()
 
+# "png" returns a base64 encoded PNG, "json" keeps the legacy nested pixel list
+IMAGE_FORMATS = ("png", "json")
+DEFAULT_IMAGE_FORMAT = "png"
+
+# the Stable Diffusion latents are an eighth of the image size
+IMAGE_SIZE_MULTIPLE = 8
+# long-poll limit for async jobs, below the 29 s API Gateway integration timeout
+MAX_WAIT_SECONDS = 20
+# identical requests wait this long at most for the request generating the
+# result, then generate their own
+MAX_COALESCE_WAIT_SECONDS = 60
+
+
+def _error(status_code, message):
+    return {
+        "statusCode": status_code,
+        "body": json.dumps({"error": message}),
+        "headers": {"Content-Type": "application/json"},
+    }
+
+
+def _overloaded(error):
+    response = _error(429, str(error))
+    response["headers"]["Retry-After"] = str(error.retry_after)
+    return response
+
+
+def _render_image(response_body, image_format, timer, key="generated_image"):
+    # the response is read as it is parsed, only the packed pixels are kept
+    with timer.stage("decode"):
+        pixels = read_pixels(response_body, key)
+
+    if image_format == "png":
+        with timer.stage("encode"):
+            return base64.b64encode(encode_png(pixels)).decode()
+
+    return pixels.tolist()
+
+
+def _generate_image(endpoint_name, prompt, params, image_format, routing, timer):
+    # one image per call, the images of a prompt are requested concurrently
+    payload = {"prompt": prompt, **params, "num_images_per_prompt": 1}
+    with timer.stage("invoke"):
+        response = runtime.invoke_endpoint(
+            EndpointName=endpoint_name,
+            Body=json.dumps(payload).encode("utf-8"),
+            ContentType="application/json",
+            Accept="application/json",
+            **routing,
+        )
+
+    image = _render_image(response["Body"], image_format, timer, "generated_images")
+    return image, response.get("InvokedProductionVariant")
+
+
+def _generate_images(
+    endpoint_name, prompt, params, num_images, image_format, routing, timer, timeout
+):
+    calls = []
+    for i in range(num_images):
+        image_params = dict(params)
+        # a pinned seed gives every image of the prompt its own seed
+        if "seed" in params:
+            image_params["seed"] = (params["seed"] + i) % (MAX_SEED + 1)
+        calls.append(
+            partial(
+                _generate_image,
+                endpoint_name,
+                prompt,
+                image_params,
+                image_format,
+                routing,
+                timer,
+            )
+        )
+    results = invoke_all(calls, timeout=timeout)
+    images = [result.value[0] for result in results if result.ok]
+    variants = {result.value[1] for result in results if result.ok} - {None}
+    errors = [repr(result.error) for result in results if not result.ok]
+    return images, variants, errors
+
+
+def _coalesce_seconds(context):
+    remaining = remaining_seconds(context)
+    if remaining is None:
+        return MAX_COALESCE_WAIT_SECONDS
+    # half of the time left is kept to generate the image after a timeout
+    return min(MAX_COALESCE_WAIT_SECONDS, remaining / 2)
+
+
+def _png_response(image, headers):
+    # API Gateway decodes the body to the PNG file, see binary_media_types
+    return {
+        "statusCode": 200,
+        "body": image,
+        "isBase64Encoded": True,
+        "headers": {**headers, "Content-Type": "image/png"},
+    }
+
+
+def _image_message(prompt, image_format, images, errors, multiple):
+    message = {"prompt": prompt, "image_format": image_format}
+    # several images are returned as a list, like with num_images before
+    if multiple:
+        message["images"] = images
+        message["errors"] = errors
+    else:
+        message["image"] = images[0]
+    return json.dumps(message)
+
+
+def _cached_images(cached):
+    """
+    Cached results are stored as {"prompt", "image_format", "images"} whatever
+    the response shape of the request that generated them.
+
+    Return:
+        list: The images of the cached result, None for an entry of another shape.
+    """
+    try:
+        entry = json.loads(cached)
+    except ValueError:
+        return None
+    images = entry.get("images") if isinstance(entry, dict) else None
+    if not isinstance(images, list) or not images:
+        return None
+    return images
+
+
+def _job_status(job_id, wait_seconds, timer):
+    with timer.stage("poll"):
+        record, status, output = async_jobs.get_job(job_id, wait_seconds)
+    if record is None:
+        return _error(404, f"Unknown job_id: {job_id}")
+
+    message = {"job_id": job_id, "status": status, "prompt": record["prompt"]}
+    if status == "completed":
+        message["image_format"] = record["image_format"]
+        message["image"] = _render_image(output, record["image_format"], timer)
+    elif status == "failed":
+        message["error"] = output
+
+    return {
+        "statusCode": 200,
+        "body": json.dumps(message),
+        "headers": {"Content-Type": "application/json"},
+    }
+
+
+@timed_handler
+@compressed_response
+def lambda_handler(event, context, timer):
+    with timer.stage("parse"):
+        body = json.loads(read_body(event))
+
+    if "job_id" in body:
+        if not async_jobs.enabled():
+            return _error(400, "Async jobs are not enabled")
+        try:
+            wait_seconds = float(body.get("wait_seconds", 0))
+        except (TypeError, ValueError):
+            return _error(400, "wait_seconds must be a number")
+        if not math.isfinite(wait_seconds):
+            return _error(400, "wait_seconds must be a number")
+        wait_seconds = min(max(wait_seconds, 0), MAX_WAIT_SECONDS)
+        return _job_status(body["job_id"], wait_seconds, timer)
 
-def lambda_handler(event, context):
-    body = json.loads(event["body"])
     prompt = body["prompt"]
     endpoint_name = body["endpoint_name"]
+    timer.dimensions["EndpointName"] = endpoint_name
+    image_format = body.get("image_format", DEFAULT_IMAGE_FORMAT)
+    routing = routing_kwargs(
+        body.get("target_variant"), body.get("inference_component")
+    )
+
+    if image_format not in IMAGE_FORMATS:
+        return _error(400, f"Unsupported image_format: {image_format}")
+    priority = body.get("priority", "interactive")
+    if priority not in PRIORITIES:
+        return _error(400, f"priority must be one of {', '.join(PRIORITIES)}")
 
-    response = runtime.invoke_endpoint(
-        EndpointName=endpoint_name, Body=prompt, ContentType="application/x-text"
+    overrides = body.get("parameters") or {}
+    # num_images and seed are accepted at the top level as before
+    if "num_images" in body:
+        overrides = {"num_images_per_prompt": body["num_images"], **overrides}
+    if body.get("seed") is not None:
+        overrides = {"seed": body["seed"], **overrides}
+    try:
+        params = resolve_parameters(
+            body.get("preset"), overrides, IMAGE_PARAMETERS, IMAGE_PRESETS
+        )
+    except ParameterError as e:
+        return _error(400, str(e))
+    for name in ("width", "height"):
+        if params[name] % IMAGE_SIZE_MULTIPLE:
+            return _error(400, f"{name} must be a multiple of {IMAGE_SIZE_MULTIPLE}")
+    num_images = params.pop("num_images_per_prompt", 1)
+    timer.dimensions["Preset"] = body.get("preset") or DEFAULT_PRESET
+
+    multiple = "num_images_per_prompt" in overrides
+    # a single PNG can be returned as the image itself instead of JSON
+    binary = (
+        request_header(event, "Accept").startswith("image/png")
+        and image_format == "png"
+        and not multiple
     )
 
-    response_body = json.loads(response["Body"].read().decode())
-    generated_image = response_body["generated_image"]
+    if body.get("async", False):
+        # the endpoint must be deployed with an asynchronous inference config, the
+        # job input is the plain prompt, so the container defaults apply
+        if not async_jobs.enabled():
+            return _error(400, "Async jobs are not enabled")
+        if num_images != 1:
+            return _error(400, "Async jobs generate a single image")
+        if body.get("preset") or body.get("parameters"):
+            return _error(400, "Async jobs use the default generation parameters")
+        try:
+            job_id = async_jobs.submit_job(runtime, endpoint_name, prompt, image_format)
+        except runtime.exceptions.ValidationError as e:
+            # e.g. an endpoint without an asynchronous inference config
+            return _error(400, f"Endpoint rejected the async job: {e}")
+        return {
+            "statusCode": 202,
+            "body": json.dumps({"job_id": job_id, "status": "pending"}),
+            "headers": {"Content-Type": "application/json"},
+        }
+
+    # Stable Diffusion samples random latents, so results are only reused when the
+    # caller opts in
+    key_params = {
+        **params,
+        "image_format": image_format,
+        "num_images": num_images,
+        **routing,
+        "do_sample": True,
+    }
+    key = cache_key(endpoint_name, prompt, key_params)
+    cacheable = is_cacheable(key_params, body.get("cache", False))
+    # lease of the request generating the result for identical concurrent ones
+    owner = None
+    if cacheable:
+        with timer.stage("cache"):
+            cached, tier = result_cache.get(key)
+            cached_images = _cached_images(cached) if cached is not None else None
+        status = "HIT"
+        if cached_images is None and single_flight.enabled:
+            with timer.stage("coalesce"):
+                cached, tier, owner = single_flight.lead_or_wait(
+                    key, result_cache, _coalesce_seconds(context)
+                )
+                cached_images = _cached_images(cached) if cached is not None else None
+            status = "COALESCED"
+        if cached_images is not None:
+            headers = {
+                "Content-Type": "application/json",
+                **result_cache.headers(status, tier),
+            }
+            if binary:
+                return _png_response(cached_images[0], headers)
+            with timer.stage("serialize"):
+                message = _image_message(
+                    prompt, image_format, cached_images, [], multiple
+                )
+            return {"statusCode": 200, "body": message, "headers": headers}
 
-    message = {"prompt": prompt, "image": generated_image}
+    try:
+        # waits for a turn on the endpoint, one per image
+        if admission.enabled:
+            with timer.stage("admission"):
+                admission.admit(
+                    endpoint_name, priority, cost=num_images, elapsed=timer.elapsed()
+                )
+        images, variants, errors = _generate_images(
+            endpoint_name,
+            prompt,
+            params,
+            num_images,
+            image_format,
+            routing,
+            timer,
+            timeout=remaining_seconds(context),
+        )
+        if not images:
+            return _error(502, errors[0])
+
+        with timer.stage("serialize"):
+            message = _image_message(prompt, image_format, images, errors, multiple)
+
+        if cacheable and not errors:
+            entry = {"prompt": prompt, "image_format": image_format, "images": images}
+            result_cache.put(key, json.dumps(entry))
+    except Overloaded as e:
+        return _overloaded(e)
+    finally:
+        # the waiting requests read the result from the cache, or one of them
+        # takes over when there is none
+        if owner is not None:
+            single_flight.release(key, owner)
+
+    headers = {
+        "Content-Type": "application/json",
+        **result_cache.headers("MISS" if cacheable else "BYPASS"),
+    }
+    if variants:
+        headers["X-Invoked-Variant"] = ",".join(sorted(variants))
+    if binary:
+        return _png_response(images[0], headers)
 
     return {
         "statusCode": 200,
-        "body": json.dumps(message),
-        "headers": {"Content-Type": "application/json"},
+        "body": message,
+        "headers": headers,
     }
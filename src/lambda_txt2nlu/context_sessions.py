@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+
+from generation_params import CHARS_PER_TOKEN, approx_tokens
+from inference_cache import ResultCache
+
+# input window of FLAN-T5, prompts are context plus question
+MODEL_MAX_TOKENS = int(os.environ.get("MODEL_MAX_TOKENS", "512"))
+# tokens kept free for the question in every prompt
+QUESTION_TOKENS = 64
+MAX_CONTEXT_BYTES = 256 * 1024
+
+# "full" forwards the context as it is, "truncate" keeps what fits the model
+# window and "chunks" asks every window-sized chunk and combines the answers
+CONTEXT_MODES = ("full", "truncate", "chunks")
+
+# stored contexts share the TTL and the optional S3 tier of the result cache, so
+# with a cache bucket a handle works across Lambda containers
+context_store = ResultCache.from_environment()
+
+
+def split_context(context: str, max_tokens: int = None) -> list:
+    """
+    Splits a context into chunks that fit the model window next to a question.
+    Chunks end at line breaks where possible, so conversation turns stay whole.
+
+    Return:
+        list: The chunks in order, a single one for contexts that fit.
+    """
+
+    max_chars = (max_tokens or MODEL_MAX_TOKENS - QUESTION_TOKENS) * CHARS_PER_TOKEN
+    chunks, current = [], ""
+    for line in context.splitlines(keepends=True):
+        # a single line longer than the window is cut at whitespace
+        while len(line) > max_chars:
+            cut = line.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(line[:cut])
+            line = line[cut:].lstrip(" ")
+        if len(current) + len(line) > max_chars:
+            chunks.append(current)
+            current = ""
+        current += line
+    if current or not chunks:
+        chunks.append(current)
+    return [chunk.rstrip("\n") for chunk in chunks]
+
+
+def context_windows(context: str, chunks: list, mode: str) -> list:
+    """The context text of each prompt of a question for a CONTEXT_MODES mode."""
+
+    if mode == "full":
+        return [context]
+    if mode == "truncate":
+        return chunks[:1]
+    return chunks
+
+
+def store_context(context: str) -> dict:
+    """
+    Stores a context and its chunks under a content-addressed handle, so the same
+    context always gets the same context_id.
+
+    Return:
+        dict: The context_id, the number of chunks and the estimated tokens.
+    """
+
+    context_id = hashlib.sha256(context.encode("utf-8")).hexdigest()
+    chunks = split_context(context)
+    stored = {"context": context, "chunks": chunks}
+    context_store.put(f"context-{context_id}", json.dumps(stored))
+    return {
+        "context_id": context_id,
+        "chunks": len(chunks),
+        "approx_tokens": approx_tokens(context),
+    }
+
+
+def load_context(context_id: str) -> tuple:
+    """
+    Return:
+        tuple: The context and its chunks, or (None, None) when the context_id is
+        unknown or expired and the client has to store the context again.
+    """
+
+    stored, _ = context_store.get(f"context-{context_id}")
+    if stored is None:
+        return None, None
+    stored = json.loads(stored)
+    return stored["context"], stored["chunks"]
@@ -1,43 +1,386 @@
 import json
+from functools import partial
 
-import boto3
+from admission import PRIORITIES, Overloaded, admission
+from concurrent_invoke import invoke_all, remaining_seconds
+from context_sessions import (
+    CONTEXT_MODES,
+    MAX_CONTEXT_BYTES,
+    context_windows,
+    load_context,
+    split_context,
+    store_context,
+)
+from generation_params import (
+    DEFAULT_PRESET,
+    MAX_INPUT_TOKENS,
+    TEXT_FIXED,
+    TEXT_PARAMETERS,
+    TEXT_PRESETS,
+    ParameterError,
+    approx_tokens,
+    resolve_parameters,
+)
+from http_encoding import compressed_response, read_body
+from inference_cache import cache_key, is_cacheable, result_cache
+from sagemaker_runtime import create_runtime_client, routing_kwargs
+from stage_timing import timed_handler
 
-runtime = boto3.client("runtime.sagemaker")
+runtime = create_runtime_client()
 
-MAX_LENGTH = 256
-NUM_RETURN_SEQUENCES = 1
-TOP_K = 0
-TOP_P = 0.7
-DO_SAMPLE = True
+# prompts sent to the endpoint in one text_inputs list, larger batches are split
+MAX_BATCH_SIZE = 8
+# prompts accepted in a single request
+MAX_PROMPTS = 32
 
 
-def lambda_handler(event, context):
-    body = json.loads(event["body"])
-    prompt = body["prompt"]
-    endpoint_name = body["endpoint_name"]
-
-    payload = {
-        "text_inputs": prompt,
-        "max_length": MAX_LENGTH,
-        "num_return_sequences": NUM_RETURN_SEQUENCES,
-        "top_k": TOP_K,
-        "top_p": TOP_P,
-        "do_sample": DO_SAMPLE,
+def _error(status_code, message):
+    return {
+        "statusCode": status_code,
+        "body": json.dumps({"error": message}),
+        "headers": {"Content-Type": "application/json"},
     }
 
-    payload = json.dumps(payload).encode("utf-8")
 
-    response = runtime.invoke_endpoint(
-        EndpointName=endpoint_name, ContentType="application/json", Body=payload
+def _overloaded(error):
+    response = _error(429, str(error))
+    response["headers"]["Retry-After"] = str(error.retry_after)
+    return response
+
+
+def _strings_from_body(body, key):
+    """
+    The list of strings under key, with a single "prompt" as a list of one.
+
+    Raises:
+        ValueError: When the value is not a string, or a list of strings.
+    """
+    if "prompt" in body:
+        if not isinstance(body["prompt"], str):
+            raise ValueError("prompt must be a string")
+        return [body["prompt"]]
+    values = body.get(key, [])
+    if not isinstance(values, list) or not all(
+        isinstance(value, str) for value in values
+    ):
+        raise ValueError(f"{key} must be a list of strings")
+    return values
+
+
+def _questions_from_body(body, shared_context, chunks, mode):
+    """
+    Accepts a single "prompt", a list of "prompts", or a shared context with a list
+    of "questions". With a stored context a single "prompt" is a question too.
+
+    Return:
+        list: A (label, question, prompts) tuple per answer in the response, where
+        the prompts hold one prompt per context window of the mode.
+
+    Raises:
+        ValueError: When the prompts or questions are not strings.
+    """
+    if shared_context is None:
+        prompts = _strings_from_body(body, "prompts")
+        return [(prompt, prompt, [prompt]) for prompt in prompts]
+
+    questions = _strings_from_body(body, "questions")
+    windows = context_windows(shared_context, chunks, mode)
+    questions_with_prompts = []
+    for question in questions:
+        # a stored context is not echoed back in every answer
+        if "context_id" in body:
+            label = question
+        else:
+            label = f"{shared_context}\n{question}"
+        prompts = [f"{window}\n{question}" for window in windows]
+        questions_with_prompts.append((label, question, prompts))
+    return questions_with_prompts
+
+
+def _invoke_batch(endpoint_name, batch, params, routing, timer):
+    payload = {"text_inputs": batch if len(batch) > 1 else batch[0], **params}
+
+    with timer.stage("serialize"):
+        payload = json.dumps(payload).encode("utf-8")
+
+    with timer.stage("invoke"):
+        response = runtime.invoke_endpoint(
+            EndpointName=endpoint_name,
+            ContentType="application/json",
+            Body=payload,
+            **routing,
+        )
+
+    with timer.stage("read"):
+        response_body = response["Body"].read()
+    with timer.stage("decode"):
+        model_predictions = json.loads(response_body)
+    # batched inputs may return a list of sequences per prompt
+    generated_texts = [
+        generated[0] if isinstance(generated, list) else generated
+        for generated in model_predictions["generated_texts"][: len(batch)]
+    ]
+    return generated_texts, response.get("InvokedProductionVariant")
+
+
+def _generate(endpoint_name, prompts, params, routing, timer, timeout):
+    """
+    Sends the prompts in batches of MAX_BATCH_SIZE concurrently.
+
+    Return:
+        tuple: A (generated_text, error) tuple per prompt, in prompt order, and
+        the set of production variants that served the batches.
+    """
+    batches = [
+        prompts[start : start + MAX_BATCH_SIZE]
+        for start in range(0, len(prompts), MAX_BATCH_SIZE)
+    ]
+    results = invoke_all(
+        [
+            partial(_invoke_batch, endpoint_name, batch, params, routing, timer)
+            for batch in batches
+        ],
+        timeout=timeout,
+    )
+
+    generated = []
+    variants = set()
+    for batch, result in zip(batches, results):
+        if result.ok:
+            generated_texts, variant = result.value
+            generated.extend((text, None) for text in generated_texts)
+            variants.add(variant)
+        else:
+            generated.extend((None, repr(result.error)) for _ in batch)
+    return generated, variants
+
+
+def _complete(
+    endpoint_name, prompts, params, routing, cacheable, priority, timer, timeout
+):
+    """
+    Answers the prompts from the result cache where possible and generates the
+    rest with _generate, once admitted to the endpoint.
+
+    Return:
+        tuple: A (generated_text, error) tuple per prompt, in prompt order, the
+        number of prompts answered from the cache, the cache tiers of those, and
+        the set of production variants that served the generated ones.
+
+    Raises:
+        Overloaded: When the endpoint has no capacity for the prompts.
+    """
+    key_params = {**params, **routing}
+    keys = [cache_key(endpoint_name, prompt, key_params) for prompt in prompts]
+
+    # cached values are the JSON message {"prompt", "generated_text"} of a prompt
+    completions = [None] * len(prompts)
+    tiers = set()
+    if cacheable:
+        with timer.stage("cache"):
+            for i, key in enumerate(keys):
+                cached, tier = result_cache.get(key)
+                if cached is not None:
+                    completions[i] = (json.loads(cached)["generated_text"], None)
+                    tiers.add(tier)
+
+    missing = [i for i, completion in enumerate(completions) if completion is None]
+    if missing and admission.enabled:
+        # one turn on the endpoint per batch
+        with timer.stage("admission"):
+            admission.admit(
+                endpoint_name,
+                priority,
+                cost=-(-len(missing) // MAX_BATCH_SIZE),
+                elapsed=timer.elapsed(),
+            )
+    generated, variants = _generate(
+        endpoint_name,
+        [prompts[i] for i in missing],
+        params,
+        routing,
+        timer,
+        timeout=timeout,
+    )
+    for i, (generated_text, error) in zip(missing, generated):
+        completions[i] = (generated_text, error)
+        if cacheable and error is None:
+            message = {"prompt": prompts[i], "generated_text": generated_text}
+            result_cache.put(keys[i], json.dumps(message))
+
+    return completions, len(prompts) - len(missing), tiers, variants
+
+
+@timed_handler
+@compressed_response
+def lambda_handler(event, context, timer):
+    with timer.stage("parse"):
+        body = json.loads(read_body(event))
+
+    # uploads a long context once, later requests ask against its context_id
+    if body.get("store_context"):
+        shared_context = body.get("context", "")
+        if not shared_context:
+            return _error(400, "No context provided")
+        if len(shared_context.encode("utf-8")) > MAX_CONTEXT_BYTES:
+            return _error(400, f"Contexts are limited to {MAX_CONTEXT_BYTES} bytes")
+        with timer.stage("context"):
+            stored = store_context(shared_context)
+        return {
+            "statusCode": 200,
+            "body": json.dumps(stored),
+            "headers": {"Content-Type": "application/json"},
+        }
+
+    endpoint_name = body["endpoint_name"]
+    timer.dimensions["EndpointName"] = endpoint_name
+    routing = routing_kwargs(
+        body.get("target_variant"), body.get("inference_component")
     )
 
-    model_predictions = json.loads(response["Body"].read())
-    generated_text = model_predictions["generated_texts"][0]
+    mode = body.get("context_mode", "full")
+    if mode not in CONTEXT_MODES:
+        return _error(400, f"context_mode must be one of {', '.join(CONTEXT_MODES)}")
+
+    shared_context, chunks = None, None
+    if body.get("context_id"):
+        with timer.stage("context"):
+            shared_context, chunks = load_context(body["context_id"])
+        if shared_context is None:
+            return _error(404, "Unknown or expired context_id")
+    elif "questions" in body:
+        shared_context = body.get("context", "")
+        if not isinstance(shared_context, str):
+            return _error(400, "context must be a string")
+        if mode != "full":
+            with timer.stage("context"):
+                chunks = split_context(shared_context)
 
-    message = {"prompt": prompt, "generated_text": generated_text}
+    try:
+        questions = _questions_from_body(body, shared_context, chunks, mode)
+    except ValueError as e:
+        return _error(400, str(e))
+    prompts = [
+        prompt for _, _, question_prompts in questions for prompt in question_prompts
+    ]
+
+    if not prompts:
+        return _error(400, "No prompt provided")
+    if len(prompts) > MAX_PROMPTS:
+        return _error(400, f"At most {MAX_PROMPTS} prompts per request")
+    # rejected before they wait for the endpoint, which would fail or crawl
+    longest = max(approx_tokens(prompt) for prompt in prompts)
+    if longest > MAX_INPUT_TOKENS:
+        return _error(
+            413,
+            f"Prompt of about {longest} tokens exceeds the limit of "
+            f"{MAX_INPUT_TOKENS}, use context_mode truncate or chunks",
+        )
+    priority = body.get("priority", "interactive")
+    if priority not in PRIORITIES:
+        return _error(400, f"priority must be one of {', '.join(PRIORITIES)}")
+
+    overrides = body.get("parameters") or {}
+    if body.get("seed") is not None:
+        overrides = {"seed": body["seed"], **overrides}
+    try:
+        params = resolve_parameters(
+            body.get("preset"), overrides, TEXT_PARAMETERS, TEXT_PRESETS
+        )
+    except ParameterError as e:
+        return _error(400, str(e))
+    params.update(TEXT_FIXED)
+    timer.dimensions["Preset"] = body.get("preset") or DEFAULT_PRESET
+    cacheable = is_cacheable(params, body.get("cache", False))
+
+    try:
+        completions, hits, tiers, variants = _complete(
+            endpoint_name,
+            prompts,
+            params,
+            routing,
+            cacheable,
+            priority,
+            timer,
+            timeout=remaining_seconds(context),
+        )
+    except Overloaded as e:
+        return _overloaded(e)
+    total = len(prompts)
+
+    # one (generated_text, error) per question, the answers of a question asked
+    # against several chunks are combined in a second round
+    answers = []
+    reduce_prompts, reduce_answers = [], []
+    start = 0
+    for _, question, question_prompts in questions:
+        partial_answers = completions[start : start + len(question_prompts)]
+        start += len(question_prompts)
+        if len(partial_answers) == 1:
+            answers.append(partial_answers[0])
+            continue
+
+        texts = [text for text, error in partial_answers if error is None]
+        if not texts:
+            answers.append(partial_answers[0])
+            continue
+        reduce_answers.append(len(answers))
+        reduce_prompts.append("\n".join(texts + [question]))
+        answers.append(None)
+
+    if reduce_prompts:
+        try:
+            reduced, reduce_hits, reduce_tiers, reduce_variants = _complete(
+                endpoint_name,
+                reduce_prompts,
+                params,
+                routing,
+                cacheable,
+                priority,
+                timer,
+                timeout=remaining_seconds(context),
+            )
+        except Overloaded as e:
+            return _overloaded(e)
+        for i, answer in zip(reduce_answers, reduced):
+            answers[i] = answer
+        total += len(reduce_prompts)
+        hits += reduce_hits
+        tiers |= reduce_tiers
+        variants |= reduce_variants
+
+    messages = []
+    for (label, _, _), (generated_text, error) in zip(questions, answers):
+        if error is not None:
+            messages.append({"prompt": label, "error": error})
+        else:
+            messages.append({"prompt": label, "generated_text": generated_text})
+
+    if all("error" in message for message in messages):
+        return _error(502, messages[0]["error"])
+
+    if not cacheable:
+        cache_headers = result_cache.headers("BYPASS")
+    elif hits == total:
+        tier = tiers.pop() if len(tiers) == 1 else "mixed"
+        cache_headers = result_cache.headers("HIT", tier)
+    elif hits == 0:
+        cache_headers = result_cache.headers("MISS")
+    else:
+        cache_headers = result_cache.headers("PARTIAL")
+
+    with timer.stage("serialize"):
+        if "prompt" in body:
+            message = json.dumps(messages[0])
+        else:
+            message = json.dumps({"results": messages})
+
+    headers = {"Content-Type": "application/json", **cache_headers}
+    if variants - {None}:
+        headers["X-Invoked-Variant"] = ",".join(sorted(variants - {None}))
 
     return {
         "statusCode": 200,
-        "body": json.dumps(message),
-        "headers": {"Content-Type": "application/json"},
+        "body": message,
+        "headers": headers,
     }
@@ -0,0 +1,188 @@
+import logging
+import math
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# DynamoDB table holding one bucket per endpoint, set by WebStack
+ADMISSION_TABLE_NAME = os.environ.get("ADMISSION_TABLE_NAME", "")
+# endpoint calls per second the instances behind the endpoint sustain, and the
+# calls admitted at once after an idle period
+ADMISSION_RATE = float(os.environ.get("ADMISSION_RATE", "0"))
+ADMISSION_BURST = float(os.environ.get("ADMISSION_BURST", "1"))
+# expected seconds of the endpoint call that follows the wait
+ADMISSION_SERVICE_SECONDS = float(os.environ.get("ADMISSION_SERVICE_SECONDS", "0"))
+
+# API Gateway ends a request after 29 s. A request that waits longer than that
+# minus the service time gets a 504 and still uses its turn on the endpoint
+API_TIMEOUT_SECONDS = 29.0
+# longest wait for a turn per priority class, capped by the API timeout budget.
+# Above it a request is rejected
+QUEUE_SECONDS = {"interactive": 20.0, "batch": 5.0}
+PRIORITIES = tuple(QUEUE_SECONDS)
+DEFAULT_PRIORITY = "interactive"
+
+# conditional writes lost to concurrent requests before giving up
+MAX_ATTEMPTS = 5
+
+
+class Overloaded(Exception):
+    """The endpoint has no capacity for the request within its queue limit."""
+
+    def __init__(self, retry_after: int) -> None:
+        super().__init__(f"Endpoint at capacity, retry after {retry_after} s")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Token bucket per endpoint, shared by all Lambda containers through a
+    DynamoDB item. It is kept as the theoretical arrival time of the next call
+    (GCRA), so an interactive request reserves its turn with one conditional
+    write and then waits for it. The reservations form a wait queue bounded in
+    time, which nothing has to clean up after a Lambda that timed out.
+
+    Batch requests never reserve a turn ahead. They wait until no turn is
+    reserved and then take the next one, so they only use capacity the
+    interactive requests leave idle and an interactive request never queues
+    behind them.
+    """
+
+    def __init__(
+        self, table_name: str, rate: float, burst: float, service_seconds: float = 0
+    ) -> None:
+        self.table_name = table_name
+        self.rate = rate
+        self.burst = burst
+        self.service_seconds = service_seconds
+        self._client = None
+
+    @classmethod
+    def from_environment(cls) -> "AdmissionController":
+        return cls(
+            ADMISSION_TABLE_NAME,
+            ADMISSION_RATE,
+            ADMISSION_BURST,
+            ADMISSION_SERVICE_SECONDS,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.table_name) and self.rate > 0
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+
+            self._client = boto3.client("dynamodb")
+        return self._client
+
+    def wait_limit(self, priority: str, elapsed: float = 0.0) -> float:
+        """
+        Seconds a request may wait for its turn: the limit of its priority, at
+        most what is left of the API timeout after the time the request has
+        spent and the endpoint call.
+        """
+
+        budget = API_TIMEOUT_SECONDS - elapsed - self.service_seconds
+        return min(QUEUE_SECONDS[priority], max(budget, 0.0))
+
+    def _reserve(
+        self, endpoint_name: str, priority: str, cost: float, max_delay: float
+    ) -> float:
+        key = {"pk": {"S": f"admission#{endpoint_name}"}}
+        deadline = time.time() + max_delay
+        attempts = 0
+        while attempts < MAX_ATTEMPTS:
+            now = time.time()
+            item = self.client.get_item(
+                TableName=self.table_name, Key=key, ConsistentRead=True
+            ).get("Item")
+            tat = float(item["tat"]["N"]) if item else now
+
+            if priority == "batch" and tat > now:
+                # turns are reserved until tat, a batch request waits for them
+                # without reserving its own
+                if tat > deadline:
+                    raise Overloaded(max(math.ceil(tat - deadline), 1))
+                time.sleep(tat - now)
+                continue
+
+            new_tat = max(tat, now) + cost / self.rate
+            # the burst is admitted without waiting
+            delay = new_tat - now - self.burst / self.rate
+            if now + delay > deadline:
+                raise Overloaded(max(math.ceil(now + delay - deadline), 1))
+
+            if item:
+                condition = {
+                    "ConditionExpression": "tat = :tat",
+                    "ExpressionAttributeValues": {":tat": item["tat"]},
+                }
+            else:
+                condition = {"ConditionExpression": "attribute_not_exists(pk)"}
+            try:
+                self.client.put_item(
+                    TableName=self.table_name,
+                    Item={
+                        **key,
+                        "tat": {"N": repr(new_tat)},
+                        "expires_at": {"N": str(int(new_tat) + 3600)},
+                    },
+                    **condition,
+                )
+            except self.client.exceptions.ConditionalCheckFailedException:
+                attempts += 1
+                continue
+            return max(delay, 0.0)
+
+        # requests arrive faster than they can reserve
+        raise Overloaded(1)
+
+    def admit(
+        self,
+        endpoint_name: str,
+        priority: str = DEFAULT_PRIORITY,
+        cost: float = 1,
+        elapsed: float = 0.0,
+    ) -> float:
+        """
+        Waits for the turn of a request to call the endpoint.
+
+        Args:
+            endpoint_name (str): The SageMaker endpoint.
+            priority (str): One of PRIORITIES. Sets how long the request may wait,
+                and whether it reserves a turn ahead (interactive) or only takes
+                idle capacity (batch).
+            cost (float): Endpoint calls the request makes.
+            elapsed (float): Seconds the request has spent before, see
+                wait_limit.
+
+        Return:
+            float: Seconds waited.
+
+        Raises:
+            Overloaded: When the wait would exceed the limit of the request.
+        """
+
+        if not self.enabled:
+            return 0.0
+        start = time.time()
+        max_delay = self.wait_limit(priority, elapsed)
+        try:
+            delay = self._reserve(endpoint_name, priority, cost, max_delay)
+        except Overloaded:
+            raise
+        except Exception:
+            # without the table requests are admitted as before
+            logger.exception("Admission bucket update failed")
+            return time.time() - start
+
+        if delay:
+            time.sleep(delay)
+        return time.time() - start
+
+
+admission = AdmissionController.from_environment()
@@ -0,0 +1,75 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# size of the shared thread pool, the SageMaker runtime client connection pool
+# should be at least as large
+MAX_WORKERS = int(os.environ.get("INVOKE_MAX_WORKERS", "8"))
+
+# created once per container and reused by warm invocations
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+
+
+class InvocationResult:
+    """
+    Outcome of one call of a fan-out.
+
+    Attributes:
+        index (int): Position of the call in the submitted list.
+        value (Any): The return value of the call, None if it failed.
+        error (Exception): The exception raised by the call, None on success.
+    """
+
+    def __init__(self, index: int, value=None, error: Exception = None) -> None:
+        self.index = index
+        self.value = value
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def remaining_seconds(context, margin: float = 1.0) -> float:
+    """Time left before the Lambda times out, minus a margin to build the response."""
+
+    if context is None:
+        return None
+    return max(context.get_remaining_time_in_millis() / 1000 - margin, 0)
+
+
+def invoke_all(calls: list, timeout: float = None) -> list:
+    """
+    Runs the calls concurrently on the shared thread pool and merges the
+    results in submission order. A failing call does not affect the others.
+
+    Args:
+        calls (list): Zero-argument callables, e.g. functools.partial wrapping
+            runtime.invoke_endpoint.
+        timeout (float): Seconds to wait for the calls. Calls still running
+            afterwards are reported with a TimeoutError. A single call runs
+            inline and is bounded by the client timeouts only.
+
+    Return:
+        list: One InvocationResult per call, in the order of calls.
+    """
+
+    if len(calls) == 1:
+        # no need to hand a single call over to another thread
+        try:
+            return [InvocationResult(0, value=calls[0]())]
+        except Exception as e:
+            return [InvocationResult(0, error=e)]
+
+    futures = [_executor.submit(call) for call in calls]
+    wait(futures, timeout=timeout)
+
+    results = []
+    for index, future in enumerate(futures):
+        if not future.done():
+            future.cancel()
+            results.append(InvocationResult(index, error=TimeoutError()))
+        elif future.exception() is not None:
+            results.append(InvocationResult(index, error=future.exception()))
+        else:
+            results.append(InvocationResult(index, value=future.result()))
+    return results
@@ -0,0 +1,140 @@
+import math
+import os
+
+# presets trade output quality for latency, a request picks one by name and may
+# override single parameters within the limits below
+PRESETS = ("fast", "balanced", "quality")
+DEFAULT_PRESET = "balanced"
+
+MAX_SEED = 2**32 - 1
+
+# name: (type, minimum, maximum) of the parameters a request may set, the limits
+# are enforced on every request whatever the preset
+TEXT_PARAMETERS = {
+    "max_length": (int, 1, 512),
+    "do_sample": (bool, None, None),
+    "top_k": (int, 0, 100),
+    "top_p": (float, 0.0, 1.0),
+    "temperature": (float, 0.01, 2.0),
+    "num_beams": (int, 1, 4),
+    "early_stopping": (bool, None, None),
+    "no_repeat_ngram_size": (int, 0, 10),
+    "seed": (int, 0, MAX_SEED),
+}
+
+# FLAN-T5: greedy and short, the previous sampling defaults, beam search
+TEXT_PRESETS = {
+    "fast": {"max_length": 64, "do_sample": False, "num_beams": 1},
+    "balanced": {"max_length": 256, "do_sample": True, "top_k": 0, "top_p": 0.7},
+    "quality": {
+        "max_length": 512,
+        "do_sample": False,
+        "num_beams": 4,
+        "early_stopping": True,
+    },
+}
+
+# sent with every text request, the handler reads a single sequence per prompt
+TEXT_FIXED = {"num_return_sequences": 1}
+
+# longest prompt forwarded to the text endpoint. T5 uses relative position
+# buckets and accepts more than the 512 tokens it was trained on, but encoder
+# time and memory grow with the square of the length
+MAX_INPUT_TOKENS = int(os.environ.get("MAX_INPUT_TOKENS", "2048"))
+# SentencePiece averages about 4 characters per token on English text, the
+# tokenizer itself is not available to the callers
+CHARS_PER_TOKEN = 4
+
+IMAGE_PARAMETERS = {
+    "width": (int, 256, 768),
+    "height": (int, 256, 768),
+    "num_inference_steps": (int, 1, 75),
+    "guidance_scale": (float, 0.0, 20.0),
+    "num_images_per_prompt": (int, 1, 4),
+    "seed": (int, 0, MAX_SEED),
+}
+
+# Stable Diffusion: fewer denoising steps, the container defaults, a larger image
+IMAGE_PRESETS = {
+    "fast": {"width": 512, "height": 512, "num_inference_steps": 20},
+    "balanced": {
+        "width": 512,
+        "height": 512,
+        "num_inference_steps": 50,
+        "guidance_scale": 7.5,
+    },
+    "quality": {
+        "width": 768,
+        "height": 768,
+        "num_inference_steps": 60,
+        "guidance_scale": 7.5,
+    },
+}
+
+
+class ParameterError(ValueError):
+    """A generation parameter or preset the handlers do not accept."""
+
+
+def approx_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def _validate(name: str, value, schema: dict):
+    if name not in schema:
+        raise ParameterError(f"Unknown parameter: {name}")
+    kind, minimum, maximum = schema[name]
+
+    # JSON true and false are bools, and bools are ints in Python
+    if kind is bool:
+        if not isinstance(value, bool):
+            raise ParameterError(f"{name} must be true or false")
+        return value
+    # JSON Infinity and NaN parse to floats without an int value
+    if (
+        isinstance(value, bool)
+        or not isinstance(value, (int, float))
+        or not math.isfinite(value)
+    ):
+        raise ParameterError(f"{name} must be a number")
+    if kind is int:
+        if value != int(value):
+            raise ParameterError(f"{name} must be a whole number")
+        value = int(value)
+    else:
+        value = float(value)
+
+    if not minimum <= value <= maximum:
+        raise ParameterError(f"{name} must be between {minimum} and {maximum}")
+    return value
+
+
+def resolve_parameters(
+    preset: str, overrides: dict, schema: dict, presets: dict
+) -> dict:
+    """
+    Builds the generation parameters of a request from a preset and the
+    parameters the request sets.
+
+    Args:
+        preset (str): One of PRESETS, None for DEFAULT_PRESET.
+        overrides (dict): Parameters replacing the values of the preset.
+        schema (dict): TEXT_PARAMETERS or IMAGE_PARAMETERS.
+        presets (dict): TEXT_PRESETS or IMAGE_PRESETS.
+
+    Return:
+        dict: The validated parameters.
+
+    Raises:
+        ParameterError: For an unknown preset or parameter, or a value of the
+            wrong type or outside its limits.
+    """
+
+    preset = preset or DEFAULT_PRESET
+    if preset not in presets:
+        raise ParameterError(f"preset must be one of {', '.join(PRESETS)}")
+    if not isinstance(overrides, dict):
+        raise ParameterError("parameters must be an object")
+
+    params = {**presets[preset], **overrides}
+    return {name: _validate(name, value, schema) for name, value in params.items()}
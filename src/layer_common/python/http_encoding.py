@@ -0,0 +1,115 @@
+import base64
+import gzip
+from functools import wraps
+
+try:
+    # not in the Lambda runtime, add a layer with the package to offer br
+    import brotli
+except ImportError:
+    brotli = None
+
+# bodies smaller than this are returned as they are
+MIN_COMPRESSION_BYTES = 1024
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 5
+# compressed bodies are only used when they are at least this much smaller
+MAX_COMPRESSION_RATIO = 0.9
+
+
+def request_header(event, name: str, default: str = "") -> str:
+    """Case-insensitive lookup of a request header of an API Gateway event."""
+
+    name = name.lower()
+    for key, value in (event.get("headers") or {}).items():
+        if key.lower() == name:
+            return value
+    return default
+
+
+def read_body(event) -> str:
+    """
+    The request body of an API Gateway event. With binary media types configured
+    on the API, API Gateway passes the body base64 encoded.
+    """
+
+    body = event.get("body") or ""
+    if event.get("isBase64Encoded"):
+        return base64.b64decode(body).decode("utf-8")
+    return body
+
+
+def accepted_encoding(accept_encoding: str) -> str:
+    """
+    Picks the response encoding from an Accept-Encoding header, br over gzip.
+
+    Return:
+        str: "br", "gzip", or None to send the body as it is.
+    """
+
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        weights[coding.strip().lower()] = quality
+
+    offered = ["br", "gzip"] if brotli is not None else ["gzip"]
+    for coding in offered:
+        if weights.get(coding, weights.get("*", 0.0)) > 0:
+            return coding
+    return None
+
+
+def encode_response(event, response: dict) -> dict:
+    """
+    Compresses the body of a Lambda proxy response when the client accepts it.
+    The compressed body is returned base64 encoded, API Gateway decodes it for the
+    client when binary media types are configured.
+    """
+
+    body = response.get("body")
+    if not body or response.get("isBase64Encoded") or len(body) < MIN_COMPRESSION_BYTES:
+        return response
+
+    coding = accepted_encoding(request_header(event, "Accept-Encoding"))
+    if coding is None:
+        return response
+
+    data = body.encode("utf-8")
+    if coding == "br":
+        compressed = brotli.compress(data, quality=BROTLI_QUALITY)
+    else:
+        compressed = gzip.compress(data, GZIP_LEVEL, mtime=0)
+    if len(compressed) > len(data) * MAX_COMPRESSION_RATIO:
+        return response
+
+    headers = {
+        **response.get("headers", {}),
+        "Content-Encoding": coding,
+        "Vary": "Accept-Encoding",
+    }
+    return {
+        **response,
+        "body": base64.b64encode(compressed).decode("ascii"),
+        "isBase64Encoded": True,
+        "headers": headers,
+    }
+
+
+def compressed_response(handler):
+    """
+    Decorates a handler that takes a StageTimer, see timed_handler, to compress
+    its responses with encode_response.
+    """
+
+    @wraps(handler)
+    def wrapper(event, context, timer):
+        response = handler(event, context, timer)
+        with timer.stage("compress"):
+            return encode_response(event, response)
+
+    return wrapper
@@ -0,0 +1,195 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+CACHE_TTL_SECONDS = int(os.environ.get("CACHE_TTL_SECONDS", "3600"))
+CACHE_MAX_BYTES = int(os.environ.get("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_BUCKET_NAME = os.environ.get("CACHE_BUCKET_NAME", "")
+CACHE_PREFIX = "inference-cache/"
+
+
+def cache_key(endpoint_name: str, prompt: str, params: dict) -> str:
+    """
+    Builds a content-addressed cache key for an inference request.
+
+    Args:
+        endpoint_name (str): The SageMaker endpoint the request is sent to.
+        prompt (str): The prompt sent to the model.
+        params (dict): Generation parameters that influence the result.
+
+    Return:
+        str: The hex encoded SHA-256 of the request.
+    """
+
+    request = {"endpoint_name": endpoint_name, "prompt": prompt, "params": params}
+    encoded = json.dumps(request, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def is_cacheable(params: dict, opt_in: bool) -> bool:
+    """
+    Sampled generations differ between calls, so they are only cached when the
+    seed is pinned or the caller explicitly accepts a previous result.
+    """
+
+    if not params.get("do_sample", False):
+        return True
+    return params.get("seed") is not None or bool(opt_in)
+
+
+class LruCache:
+    """
+    In-process LRU cache with a TTL and a size budget in bytes. Lives at module
+    level, so it survives across invocations of a warm Lambda container.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: int) -> None:
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.size_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.time() + self.ttl_seconds, value)
+            self.size_bytes += len(value)
+            while self.size_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str) -> None:
+        _, value = self._entries.pop(key)
+        self.size_bytes -= len(value)
+
+
+class S3Cache:
+    """
+    Shared cache tier in S3. Expiry is checked against the object metadata, the
+    bucket lifecycle rule removes stale objects.
+    """
+
+    def __init__(self, bucket_name: str, ttl_seconds: int) -> None:
+        self.bucket_name = bucket_name
+        self.ttl_seconds = ttl_seconds
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+
+            self._client = boto3.client("s3")
+        return self._client
+
+    def get(self, key: str):
+        try:
+            response = self.client.get_object(
+                Bucket=self.bucket_name, Key=CACHE_PREFIX + key
+            )
+        except self.client.exceptions.NoSuchKey:
+            return None
+        except Exception:
+            logger.exception("Shared cache read failed")
+            return None
+
+        if float(response["Metadata"].get("expires-at", "0")) < time.time():
+            return None
+        return response["Body"].read()
+
+    def put(self, key: str, value: bytes) -> None:
+        try:
+            self.client.put_object(
+                Bucket=self.bucket_name,
+                Key=CACHE_PREFIX + key,
+                Body=value,
+                Metadata={"expires-at": str(time.time() + self.ttl_seconds)},
+            )
+        except Exception:
+            logger.exception("Shared cache write failed")
+
+
+class ResultCache:
+    """
+    Two tier result cache: a warm in-process LRU in front of an optional shared
+    S3 tier. Keeps hit/miss counters for the lifetime of the container.
+    """
+
+    def __init__(self, memory: LruCache, shared: S3Cache = None) -> None:
+        self.memory = memory
+        self.shared = shared
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_environment(cls) -> "ResultCache":
+        shared = (
+            S3Cache(CACHE_BUCKET_NAME, CACHE_TTL_SECONDS) if CACHE_BUCKET_NAME else None
+        )
+        return cls(LruCache(CACHE_MAX_BYTES, CACHE_TTL_SECONDS), shared)
+
+    def get(self, key: str):
+        """
+        Looks up a cached result.
+
+        Return:
+            tuple: The cached value as str and the tier it came from ("memory" or
+            "s3"), or (None, None) on a miss.
+        """
+
+        value = self.memory.get(key)
+        if value is not None:
+            self.hits += 1
+            return value.decode("utf-8"), "memory"
+
+        if self.shared is not None:
+            value = self.shared.get(key)
+            if value is not None:
+                self.hits += 1
+                self.memory.put(key, value)
+                return value.decode("utf-8"), "s3"
+
+        self.misses += 1
+        return None, None
+
+    def put(self, key: str, value: str) -> None:
+        encoded = value.encode("utf-8")
+        self.memory.put(key, encoded)
+        if self.shared is not None:
+            self.shared.put(key, encoded)
+
+    def headers(self, status: str, tier: str = None) -> dict:
+        """Cache status and counters to return as response headers."""
+
+        headers = {
+            "X-Cache": status,
+            "X-Cache-Hits": str(self.hits),
+            "X-Cache-Misses": str(self.misses),
+        }
+        if tier is not None:
+            headers["X-Cache-Tier"] = tier
+        return headers
+
+
+result_cache = ResultCache.from_environment()
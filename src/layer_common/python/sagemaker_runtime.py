@@ -0,0 +1,166 @@
+import logging
+import os
+import random
+import time
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import (
+    ClientError,
+    ConnectTimeoutError,
+    EndpointConnectionError,
+)
+from concurrent_invoke import MAX_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# set by WebStack from the function timeout
+FUNCTION_TIMEOUT_SECONDS = int(os.environ.get("FUNCTION_TIMEOUT_SECONDS", "180"))
+CONNECT_TIMEOUT_SECONDS = 3
+# time kept back from the read timeout to build and return the response
+RESPONSE_MARGIN_SECONDS = 5
+# attempts including the first one, retries back off exponentially with jitter
+MAX_ATTEMPTS = 3
+BASE_BACKOFF_SECONDS = 0.1
+MAX_BACKOFF_SECONDS = 1.0
+# only requests that never reached the model are retried. invoke_endpoint is not
+# idempotent, after a read timeout or a 5xx the GPU may have done the work already
+RETRYABLE_ERROR_CODES = frozenset(
+    {"ThrottlingException", "Throttling", "TooManyRequestsException"}
+)
+
+# points the client at a local stand-in, e.g. for benchmarks
+ENDPOINT_URL = os.environ.get("SAGEMAKER_RUNTIME_ENDPOINT_URL") or None
+
+# set by Lambda, provisioned environments are initialized before they are invoked
+INITIALIZATION_TYPE = os.environ.get("AWS_LAMBDA_INITIALIZATION_TYPE", "on-demand")
+# warming only pays off when the init phase is off the request path, an on-demand
+# cold start would wait for the extra round trip
+WARM_CONNECTION = (
+    os.environ.get(
+        "SAGEMAKER_RUNTIME_WARM_CONNECTION",
+        "1" if INITIALIZATION_TYPE == "provisioned-concurrency" else "0",
+    )
+    == "1"
+)
+
+
+def runtime_config(function_timeout: int = FUNCTION_TIMEOUT_SECONDS) -> Config:
+    """
+    Builds the botocore configuration of the SageMaker runtime client.
+
+    Args:
+        function_timeout (int): Timeout of the Lambda function in seconds. The read
+            timeout is derived from it, so a slow endpoint fails with a proper
+            error before the function is killed. It is what is left after the
+            connect timeouts and back-offs of all attempts, since a read timeout
+            itself is not retried, see RetryingRuntimeClient.
+
+    Return:
+        Config: The client configuration.
+    """
+
+    retry_budget = (
+        MAX_ATTEMPTS * CONNECT_TIMEOUT_SECONDS
+        + (MAX_ATTEMPTS - 1) * MAX_BACKOFF_SECONDS
+    )
+    read_timeout = max(function_timeout - retry_budget - RESPONSE_MARGIN_SECONDS, 1)
+
+    return Config(
+        connect_timeout=CONNECT_TIMEOUT_SECONDS,
+        read_timeout=read_timeout,
+        max_pool_connections=MAX_WORKERS,
+        tcp_keepalive=True,
+        # botocore would retry read timeouts and 5xx responses too
+        retries={"mode": "standard", "total_max_attempts": 1},
+    )
+
+
+class RetryingRuntimeClient:
+    """
+    Wraps the SageMaker runtime client and retries the invocations that were
+    throttled or could not connect, neither reached the model. Everything else
+    is passed through to the client.
+    """
+
+    def __init__(self, client, max_attempts: int = MAX_ATTEMPTS) -> None:
+        self._client = client
+        self.max_attempts = max_attempts
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def _call(self, operation, **kwargs):
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return operation(**kwargs)
+            except (EndpointConnectionError, ConnectTimeoutError):
+                # the request was not sent
+                if attempt == self.max_attempts:
+                    raise
+            except ClientError as e:
+                code = e.response.get("Error", {}).get("Code")
+                if code not in RETRYABLE_ERROR_CODES or attempt == self.max_attempts:
+                    raise
+            backoff = min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * 2**attempt)
+            time.sleep(random.uniform(0, backoff))
+
+    def invoke_endpoint(self, **kwargs):
+        return self._call(self._client.invoke_endpoint, **kwargs)
+
+    def invoke_endpoint_async(self, **kwargs):
+        return self._call(self._client.invoke_endpoint_async, **kwargs)
+
+
+def warm_connection(client) -> None:
+    """
+    Opens a pooled TLS connection to the runtime API during the Lambda init
+    phase. The call targets a non-existent endpoint and fails fast with a
+    validation error, the kept-alive connection is reused by the first real
+    invocation.
+    """
+
+    try:
+        client.invoke_endpoint(EndpointName="connection-warmup", Body=b"{}")
+    except Exception:
+        pass
+
+
+def create_runtime_client(warm: bool = WARM_CONNECTION):
+    """
+    Creates the SageMaker runtime client shared by the handler and its thread
+    pool.
+
+    Args:
+        warm (bool): Open a connection right away, see warm_connection.
+
+    Return:
+        RetryingRuntimeClient: The SageMaker runtime client.
+    """
+
+    client = RetryingRuntimeClient(
+        boto3.client(
+            "sagemaker-runtime", config=runtime_config(), endpoint_url=ENDPOINT_URL
+        )
+    )
+    if warm:
+        warm_connection(client)
+    return client
+
+
+def routing_kwargs(target_variant: str = None, inference_component: str = None):
+    """
+    Builds the invoke_endpoint arguments that pin a request to a production
+    variant or address an inference component. Without them the endpoint splits
+    traffic by variant weight.
+
+    Return:
+        dict: Keyword arguments for invoke_endpoint.
+    """
+
+    routing = {}
+    if target_variant:
+        routing["TargetVariant"] = target_variant
+    if inference_component:
+        routing["InferenceComponentName"] = inference_component
+    return routing
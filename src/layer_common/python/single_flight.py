@@ -0,0 +1,144 @@
+import logging
+import os
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# DynamoDB table of the in-flight requests, set by WebStack
+COALESCE_TABLE_NAME = os.environ.get("COALESCE_TABLE_NAME", "")
+# a leader that has not finished after this long is presumed dead, above the
+# Lambda timeout so a live leader never loses its lease
+COALESCE_LEASE_SECONDS = int(os.environ.get("COALESCE_LEASE_SECONDS", "200"))
+POLL_INTERVAL_SECONDS = 0.25
+
+
+class SingleFlight:
+    """
+    Coalesces identical requests across Lambda containers. The first request for
+    a cache key writes a lease item with a conditional put and generates the
+    result, concurrent requests for the key wait until the item is gone and then
+    read the result from the shared result cache.
+
+    A leader that fails deletes its item, so one of the waiting requests takes
+    over. A leader that dies is replaced once its lease expires.
+    """
+
+    def __init__(self, table_name: str, lease_seconds: int) -> None:
+        self.table_name = table_name
+        self.lease_seconds = lease_seconds
+        self._client = None
+
+    @classmethod
+    def from_environment(cls) -> "SingleFlight":
+        return cls(COALESCE_TABLE_NAME, COALESCE_LEASE_SECONDS)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.table_name)
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+
+            self._client = boto3.client("dynamodb")
+        return self._client
+
+    def acquire(self, key: str):
+        """
+        Return:
+            str: The lease owner id to release the key with, or None when another
+            request holds the key.
+        """
+
+        owner = str(uuid.uuid4())
+        now = time.time()
+        try:
+            self.client.put_item(
+                TableName=self.table_name,
+                Item={
+                    "pk": {"S": key},
+                    "owner": {"S": owner},
+                    "expires_at": {"N": str(int(now + self.lease_seconds))},
+                },
+                ConditionExpression="attribute_not_exists(pk) OR expires_at < :now",
+                ExpressionAttributeValues={":now": {"N": str(int(now))}},
+            )
+        except self.client.exceptions.ConditionalCheckFailedException:
+            return None
+        except Exception:
+            # without the table every request generates its own result
+            logger.exception("Single-flight lease write failed")
+        return owner
+
+    def release(self, key: str, owner: str) -> None:
+        try:
+            self.client.delete_item(
+                TableName=self.table_name,
+                Key={"pk": {"S": key}},
+                ConditionExpression="#owner = :owner",
+                ExpressionAttributeNames={"#owner": "owner"},
+                ExpressionAttributeValues={":owner": {"S": owner}},
+            )
+        except self.client.exceptions.ConditionalCheckFailedException:
+            # the lease expired and another request took over
+            pass
+        except Exception:
+            logger.exception("Single-flight lease release failed")
+
+    def wait(self, key: str, timeout: float) -> bool:
+        """
+        Polls the lease of a key until it is released or has expired.
+
+        Return:
+            bool: False when the timeout passed first.
+        """
+
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                item = self.client.get_item(
+                    TableName=self.table_name,
+                    Key={"pk": {"S": key}},
+                    ConsistentRead=True,
+                ).get("Item")
+            except Exception:
+                logger.exception("Single-flight lease read failed")
+                return False
+            if item is None or float(item["expires_at"]["N"]) < time.time():
+                return True
+            time.sleep(POLL_INTERVAL_SECONDS)
+        return False
+
+    def lead_or_wait(self, key: str, cache, timeout: float) -> tuple:
+        """
+        Makes the request the leader for a key, or waits for the leader's result.
+
+        Args:
+            key (str): The cache key of the request.
+            cache (ResultCache): Where the leader stores its result.
+            timeout (float): Seconds to wait at most, the request then generates
+                its own result.
+
+        Return:
+            tuple: The cached result and its tier when another request produced
+            it, and the lease owner id when this request has to generate it.
+        """
+
+        deadline = time.time() + timeout
+        while True:
+            owner = self.acquire(key)
+            if owner is not None:
+                return None, None, owner
+
+            released = self.wait(key, deadline - time.time())
+            cached, tier = cache.get(key)
+            if cached is not None:
+                return cached, tier, None
+            if not released:
+                return None, None, None
+            # the leader failed without a result, the next one to acquire leads
+
+
+single_flight = SingleFlight.from_environment()
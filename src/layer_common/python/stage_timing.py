@@ -0,0 +1,125 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# CloudWatch namespace of the per-stage latency metrics
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "ProtoFoundationAI")
+
+
+class StageTimer:
+    """
+    Wall clock time per processing stage of one request, in milliseconds.
+
+    Stages timed on the worker threads of a fan-out add up, so with concurrent
+    endpoint calls they can exceed the "total" of the request.
+
+    Attributes:
+        stages (dict): Milliseconds per stage name, in the order first recorded.
+        dimensions (dict): CloudWatch dimensions of the metrics, e.g. EndpointName.
+    """
+
+    def __init__(self) -> None:
+        self.stages = {}
+        self.dimensions = {}
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+
+    def elapsed(self) -> float:
+        """Seconds since the timer was created at the start of the request."""
+
+        return time.perf_counter() - self._start
+
+    def add(self, name: str, milliseconds: float) -> None:
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + milliseconds
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - start) * 1000)
+
+    def server_timing(self) -> str:
+        """Value of the Server-Timing response header."""
+
+        return ", ".join(
+            f"{name};dur={duration:.1f}" for name, duration in self.stages.items()
+        )
+
+    def emit_metrics(self, function_name: str, status_code: int) -> None:
+        """
+        Prints the stages as a CloudWatch Embedded Metric Format record, Lambda
+        ships it to CloudWatch Logs and CloudWatch extracts the metrics.
+        """
+
+        dimensions = {"FunctionName": function_name, **self.dimensions}
+        record = {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": METRICS_NAMESPACE,
+                        "Dimensions": [list(dimensions)],
+                        "Metrics": [
+                            {"Name": name, "Unit": "Milliseconds"}
+                            for name in self.stages
+                        ],
+                    }
+                ],
+            },
+            **dimensions,
+            **self.stages,
+            "StatusCode": status_code,
+        }
+        print(json.dumps(record))
+
+
+def process_age_ms() -> float:
+    """
+    Milliseconds since the process started, None where /proc is not available.
+    Called at the end of the handler module import it is the init duration of the
+    Lambda environment, runtime bootstrap included.
+    """
+
+    try:
+        with open("/proc/self/stat") as f:
+            # starttime is the 22nd field, the 2nd (comm) may contain spaces
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        uptime = time.clock_gettime(time.CLOCK_BOOTTIME)
+    except (OSError, AttributeError, ValueError, IndexError):
+        return None
+    return (uptime - start_ticks / os.sysconf("SC_CLK_TCK")) * 1000
+
+
+def timed_handler(handler):
+    """
+    Decorates a Lambda handler that takes a StageTimer as its third argument. The
+    stages and the handler total are returned in a Server-Timing header and
+    emitted as CloudWatch metrics. The first request of an environment also
+    reports its "init" duration.
+    """
+
+    # decorators run while the module is imported, i.e. during the init phase
+    init_age = process_age_ms()
+    init_ms = [] if init_age is None else [init_age]
+
+    @wraps(handler)
+    def wrapper(event, context):
+        timer = StageTimer()
+        if init_ms:
+            timer.add("init", init_ms.pop())
+        start = time.perf_counter()
+        response = handler(event, context, timer)
+        timer.add("total", (time.perf_counter() - start) * 1000)
+
+        response.setdefault("headers", {})["Server-Timing"] = timer.server_timing()
+        function_name = getattr(context, "function_name", "local")
+        timer.emit_metrics(function_name, response["statusCode"])
+        return response
+
+    return wrapper
@@ -4,6 +4,25 @@ from aws_cdk import aws_ssm as ssm
 from construct.sagemaker_endpoint_construct import SageMakerEndpointConstruct
 from constructs import Construct
 
+# requests of the fast and balanced presets the warm-up sends to a new instance
+WARM_UP_PAYLOADS = [
+    {
+        "prompt": "A photo of a cat in a garden at sunset",
+        "width": 512,
+        "height": 512,
+        "num_inference_steps": 20,
+        "num_images_per_prompt": 1,
+    },
+    {
+        "prompt": "A photo of a cat in a garden at sunset",
+        "width": 512,
+        "height": 512,
+        "num_inference_steps": 50,
+        "guidance_scale": 7.5,
+        "num_images_per_prompt": 1,
+    },
+]
+
 
 class Txt2imgSagemakerStack(Stack):
     def __init__(
@@ -79,7 +98,7 @@ class Txt2imgSagemakerStack(Stack):
             model_docker_image=model_info["model_docker_image"],
             variant_name="AllTraffic",
             variant_weight=1,
-            instance_count=1,
+            instance_count=model_info.get("instance_count", 1),
             instance_type=model_info["instance_type"],
             environment={
                 "MMS_MAX_RESPONSE_SIZE": "20000000",
@@ -89,6 +108,14 @@ class Txt2imgSagemakerStack(Stack):
                 "SAGEMAKER_SUBMIT_DIRECTORY": "/opt/ml/model/code",
             },
             deploy_enable=True,
+            async_inference=model_info.get("async_inference"),
+            autoscaling=model_info.get("autoscaling"),
+            extra_variants=model_info.get("extra_variants"),
+            hosting=model_info.get("hosting"),
+            startup=model_info.get("startup"),
+            warm_up={"payloads": WARM_UP_PAYLOADS, **model_info["warm_up"]}
+            if "warm_up" in model_info
+            else None,
         )
 
         endpoint.node.add_dependency(sts_policy)
@@ -4,6 +4,25 @@ from aws_cdk import aws_ssm as ssm
 from construct.sagemaker_endpoint_construct import SageMakerEndpointConstruct
 from constructs import Construct
 
+# requests of the fast and balanced presets the warm-up sends to a new instance
+WARM_UP_PAYLOADS = [
+    {
+        "text_inputs": "Summarize: The quick brown fox jumps over the lazy dog.",
+        "max_length": 64,
+        "do_sample": False,
+        "num_beams": 1,
+        "num_return_sequences": 1,
+    },
+    {
+        "text_inputs": "Write a short product description for a travel mug.",
+        "max_length": 256,
+        "do_sample": True,
+        "top_k": 0,
+        "top_p": 0.7,
+        "num_return_sequences": 1,
+    },
+]
+
 
 class Txt2nluSagemakerStack(Stack):
     def __init__(
@@ -79,7 +98,7 @@ class Txt2nluSagemakerStack(Stack):
             model_docker_image=model_info["model_docker_image"],
             variant_name="AllTraffic",
             variant_weight=1,
-            instance_count=1,
+            instance_count=model_info.get("instance_count", 1),
             instance_type=model_info["instance_type"],
             environment={
                 "MODEL_CACHE_ROOT": "/opt/ml/model",
@@ -91,6 +110,13 @@ class Txt2nluSagemakerStack(Stack):
                 "TS_DEFAULT_WORKERS_PER_MODEL": "1",
             },
             deploy_enable=True,
+            autoscaling=model_info.get("autoscaling"),
+            extra_variants=model_info.get("extra_variants"),
+            hosting=model_info.get("hosting"),
+            startup=model_info.get("startup"),
+            warm_up={"payloads": WARM_UP_PAYLOADS, **model_info["warm_up"]}
+            if "warm_up" in model_info
+            else None,
         )
 
         endpoint.node.add_dependency(sts_policy)
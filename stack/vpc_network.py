@@ -2,15 +2,33 @@ from aws_cdk import Stack
 from aws_cdk import aws_ec2 as ec2
 from constructs import Construct
 
+# AWS APIs called from the private subnets: the inference Lambdas call the
+# SageMaker runtime, the Fargate tasks read SSM parameters, pull their image from
+# ECR and ship logs to CloudWatch
+INTERFACE_ENDPOINTS = {
+    "SageMakerRuntime": ec2.InterfaceVpcEndpointAwsService.SAGEMAKER_RUNTIME,
+    "Ssm": ec2.InterfaceVpcEndpointAwsService.SSM,
+    "EcrApi": ec2.InterfaceVpcEndpointAwsService.ECR,
+    "EcrDocker": ec2.InterfaceVpcEndpointAwsService.ECR_DOCKER,
+    "Logs": ec2.InterfaceVpcEndpointAwsService.CLOUDWATCH_LOGS,
+}
+
 
 class VpcNetworkStack(Stack):
     """
     Represents an AWS CloudFormation stack for deploying a VPC network for the project.
 
-    This stack includes a VPC with public and private subnets.
+    This stack includes a VPC with public and private subnets, and optionally VPC
+    endpoints for the AWS APIs used by the project.
     """
 
-    def __init__(self, scope: Construct, construct_id: str, **kwargs) -> None:
+    def __init__(
+        self,
+        scope: Construct,
+        construct_id: str,
+        vpc_endpoints: bool = False,
+        **kwargs,
+    ) -> None:
         """
         Initializes a new instance of the VpcNetworkStack.
 
@@ -18,6 +36,11 @@ class VpcNetworkStack(Stack):
             scope (Construct): The construct scope within which this stack is defined.
             construct_id (str): The identifier for this construct. Must be unique within
                 the scope of the parent construct.
+            vpc_endpoints (bool): Adds interface endpoints with private DNS for the
+                SageMaker runtime, SSM, ECR and CloudWatch Logs, and an S3 gateway
+                endpoint. Traffic to these APIs then bypasses the NAT gateway, and
+                the stacks in the VPC use them without any change, because the SDK
+                host names resolve to the endpoints.
             **kwargs (Any): Additional keyword arguments to pass to the base
                 class constructor.
 
@@ -48,6 +71,23 @@ class VpcNetworkStack(Stack):
             ],
         )
 
+        self.endpoints = {}
+        if vpc_endpoints:
+            # ECR image layers, the result cache and the async job buckets are in S3
+            self.endpoints["S3"] = self.output_vpc.add_gateway_endpoint(
+                "ProtoFoundationAIS3Endpoint",
+                service=ec2.GatewayVpcEndpointAwsService.S3,
+            )
+            for name, service in INTERFACE_ENDPOINTS.items():
+                self.endpoints[name] = self.output_vpc.add_interface_endpoint(
+                    f"ProtoFoundationAI{name}Endpoint",
+                    service=service,
+                    private_dns_enabled=True,
+                    subnets=ec2.SubnetSelection(
+                        subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS
+                    ),
+                )
+
     @property
     def vpc(self) -> ec2.Vpc:
         """
@@ -1,20 +1,111 @@
-from aws_cdk import Duration, Stack
+from urllib.parse import urlparse
+
+from aws_cdk import Duration, IgnoreMode, RemovalPolicy, Size, Stack
 from aws_cdk import aws_apigateway as apigw
+from aws_cdk import aws_applicationautoscaling as appscaling
+from aws_cdk import aws_autoscaling as autoscaling
+from aws_cdk import aws_cloudwatch as cloudwatch
+from aws_cdk import aws_dynamodb as dynamodb
 from aws_cdk import aws_ec2 as ec2
 from aws_cdk import aws_ecs as ecs
 from aws_cdk import aws_ecs_patterns as ecs_patterns
 from aws_cdk import aws_iam as iam
 from aws_cdk import aws_lambda as _lambda
+from aws_cdk import aws_s3 as s3
 from aws_cdk import aws_ssm as ssm
 from constructs import Construct
 
+# Capacity of the Streamlit tasks: "fargate", "fargate_spot" with one task on
+# regular Fargate, or "ec2_spot" with tasks packed onto a spot Auto Scaling group
+WEB_CAPACITY_TYPES = ("fargate", "fargate_spot", "ec2_spot")
+
+# Scaling targets of the Streamlit service, per task
+WEB_REQUESTS_PER_TASK = 300  # ALB requests per minute
+WEB_IN_FLIGHT_PER_TASK = 8  # concurrent API Gateway requests
+WEB_RESPONSE_TIME_SECONDS = 2  # ALB target response time that adds tasks
+
+# Expected seconds of one endpoint call per function, from admission to the
+# response: a balanced Stable Diffusion image and a FLAN-T5 batch on ml.g5
+ENDPOINT_SERVICE_SECONDS = {"txt2img": 10, "txt2nlu": 4}
+
+# Docker build context of the web app: the web-app folder and the modules of the
+# generation presets and limits and of admission control, shared with the
+# Lambdas. Excluded directories are not searched, so every parent of the modules
+# is included on its own
+WEB_IMAGE_EXCLUDE = [
+    "*",
+    "!web-app",
+    "!src",
+    "src/*",
+    "!src/layer_common",
+    "src/layer_common/*",
+    "!src/layer_common/python",
+    "src/layer_common/python/*",
+    "!src/layer_common/python/generation_params.py",
+    "!src/layer_common/python/admission.py",
+]
+
+# CloudWatch namespace and dimension of the metrics published by the web app
+WEB_METRICS_NAMESPACE = "ProtoFoundationAI/Web"
+WEB_SERVICE_NAME = "proto-foundation-ai-web"
+
+
+def _s3_objects_arn(partition: str, uri: str) -> str:
+    # the objects under an s3://bucket/prefix URI
+    location = urlparse(uri)
+    prefix = location.path.strip("/")
+    return f"arn:{partition}:s3:::{location.netloc}/{prefix + '/' if prefix else ''}*"
+
+
+def _s3_list_statement(partition: str, uri: str) -> iam.PolicyStatement:
+    # listing the prefix of an s3://bucket/prefix URI, without it S3 answers a
+    # GetObject of a missing key with 403 instead of 404
+    location = urlparse(uri)
+    prefix = location.path.strip("/")
+    return iam.PolicyStatement(
+        effect=iam.Effect.ALLOW,
+        actions=["s3:ListBucket"],
+        resources=[f"arn:{partition}:s3:::{location.netloc}"],
+        conditions={"StringLike": {"s3:prefix": f"{prefix}/*" if prefix else "*"}},
+    )
+
 
 class WebStack(Stack):
     def __init__(
-        self, scope: Construct, construct_id: str, vpc: ec2.IVpc, **kwargs
+        self,
+        scope: Construct,
+        construct_id: str,
+        vpc: ec2.IVpc,
+        shared_cache: bool = False,
+        async_jobs: bool = False,
+        async_output_paths: list = None,
+        provisioned_concurrency: int = 0,
+        arm64: bool = False,
+        lambda_in_vpc: bool = True,
+        web_capacity: str = "fargate",
+        coalesce_requests: bool = False,
+        endpoint_capacity: dict = None,
+        endpoint_service_seconds: dict = None,
+        api_throttling: dict = None,
+        reserved_concurrency: int = None,
+        **kwargs,
     ) -> None:
         super().__init__(scope, construct_id, **kwargs)
 
+        if web_capacity not in WEB_CAPACITY_TYPES:
+            raise ValueError(f"web_capacity must be one of {WEB_CAPACITY_TYPES}")
+        # Coalesced requests read the result of the first one from the S3 cache
+        if coalesce_requests and not shared_cache:
+            raise ValueError("coalesce_requests needs shared_cache")
+        # Async results are read from the output and failure paths (S3 URIs) of
+        # the txt2img endpoint config, nothing else in the account
+        if async_jobs and not async_output_paths:
+            raise ValueError("async_jobs needs the async_output_paths of the endpoint")
+        # Provisioned environments count against the reserved concurrency
+        if reserved_concurrency is not None:
+            if reserved_concurrency < provisioned_concurrency:
+                raise ValueError("reserved_concurrency is below the provisioned one")
+
         # Defines role for the AWS Lambda functions
         role = iam.Role(
             self,
@@ -27,11 +118,12 @@ class WebStack(Stack):
                 "service-role/AWSLambdaBasicExecutionRole"
             )
         )
-        role.add_managed_policy(
-            iam.ManagedPolicy.from_aws_managed_policy_name(
-                "service-role/AWSLambdaVPCAccessExecutionRole"
+        if lambda_in_vpc:
+            role.add_managed_policy(
+                iam.ManagedPolicy.from_aws_managed_policy_name(
+                    "service-role/AWSLambdaVPCAccessExecutionRole"
+                )
             )
-        )
         role.attach_inline_policy(
             iam.Policy(
                 self,
@@ -39,13 +131,159 @@ class WebStack(Stack):
                 statements=[
                     iam.PolicyStatement(
                         effect=iam.Effect.ALLOW,
-                        actions=["sagemaker:InvokeEndpoint"],
+                        actions=[
+                            "sagemaker:InvokeEndpoint",
+                            "sagemaker:InvokeEndpointAsync",
+                        ],
                         resources=["*"],
                     )
                 ],
             )
         )
 
+        # The layer and handlers are pure Python, so they run on Graviton as well
+        architecture = (
+            _lambda.Architecture.ARM_64 if arm64 else _lambda.Architecture.X86_64
+        )
+        # The Lambdas only call the SageMaker runtime and S3 APIs. Outside of the
+        # VPC their cold starts skip the network interface setup
+        vpc_options = {}
+        if lambda_in_vpc:
+            vpc_options = {
+                "vpc": vpc,
+                "vpc_subnets": ec2.SubnetSelection(
+                    subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS
+                ),
+            }
+
+        # Shared code for the inference Lambdas (runtime client, fan-out, cache)
+        common_layer = _lambda.LayerVersion(
+            self,
+            "ProtoFoundationAICommonLayer",
+            code=_lambda.Code.from_asset("src/layer_common"),
+            compatible_runtimes=[_lambda.Runtime.PYTHON_3_9],
+            compatible_architectures=[architecture],
+        )
+
+        # Timeout of the inference Lambdas, the SageMaker runtime client derives
+        # its read timeout from it
+        lambda_timeout = Duration.seconds(180)
+        lambda_environment = {
+            "FUNCTION_TIMEOUT_SECONDS": str(int(lambda_timeout.to_seconds()))
+        }
+
+        # API Gateway compresses responses above 1 KiB for clients that accept it.
+        # Lambda compresses large bodies itself and returns them base64 encoded,
+        # "*/*" lets API Gateway decode them, and PNG images, for any Accept header.
+        # Request bodies then reach the Lambdas base64 encoded as well
+        api_options = {
+            "min_compression_size": Size.kibibytes(1),
+            "binary_media_types": ["*/*"],
+        }
+        # Requests above the stage rate are rejected with 429 before they reach
+        # the Lambdas. The APIs have no API keys, so the limits apply to the
+        # stage rather than to per-client usage plans
+        if api_throttling:
+            api_options["deploy_options"] = apigw.StageOptions(
+                throttling_rate_limit=api_throttling["rate_limit"],
+                throttling_burst_limit=api_throttling["burst_limit"],
+            )
+
+        # Optional S3 tier of the result cache, shared by all Lambda containers
+        if shared_cache:
+            cache_bucket = s3.Bucket(
+                self,
+                "ProtoFoundationAIInferenceCache",
+                lifecycle_rules=[s3.LifecycleRule(expiration=Duration.days(1))],
+                removal_policy=RemovalPolicy.DESTROY,
+                auto_delete_objects=True,
+            )
+            cache_bucket.grant_read_write(role)
+            lambda_environment["CACHE_BUCKET_NAME"] = cache_bucket.bucket_name
+
+        # Inputs and job records of asynchronous image generation. Results are
+        # written by SageMaker to the output path of the endpoint config
+        txt2img_environment = dict(lambda_environment)
+        if async_jobs:
+            jobs_bucket = s3.Bucket(
+                self,
+                "ProtoFoundationAIAsyncJobs",
+                lifecycle_rules=[s3.LifecycleRule(expiration=Duration.days(1))],
+                removal_policy=RemovalPolicy.DESTROY,
+                auto_delete_objects=True,
+            )
+            jobs_bucket.grant_read_write(role)
+            role.add_to_policy(
+                iam.PolicyStatement(
+                    effect=iam.Effect.ALLOW,
+                    actions=["s3:GetObject"],
+                    resources=[
+                        _s3_objects_arn(self.partition, path)
+                        for path in async_output_paths
+                    ],
+                )
+            )
+            # Results that are not written yet are then reported as missing
+            for path in async_output_paths:
+                role.add_to_policy(_s3_list_statement(self.partition, path))
+            txt2img_environment["ASYNC_BUCKET_NAME"] = jobs_bucket.bucket_name
+
+        txt2nlu_environment = dict(lambda_environment)
+
+        # Admission control in front of the endpoints. endpoint_capacity maps
+        # "txt2img" and "txt2nlu" to the calls per second their endpoint
+        # sustains; requests wait for a turn in a bounded queue or get a 429.
+        # The wait is cut so the endpoint call still fits in the API timeout,
+        # endpoint_service_seconds overrides the expected call durations
+        service_seconds = {
+            **ENDPOINT_SERVICE_SECONDS,
+            **(endpoint_service_seconds or {}),
+        }
+        if endpoint_capacity:
+            admission_table = dynamodb.Table(
+                self,
+                "ProtoFoundationAIAdmission",
+                partition_key=dynamodb.Attribute(
+                    name="pk", type=dynamodb.AttributeType.STRING
+                ),
+                billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+                time_to_live_attribute="expires_at",
+                removal_policy=RemovalPolicy.DESTROY,
+            )
+            admission_table.grant_read_write_data(role)
+            for name, environment in (
+                ("txt2img", txt2img_environment),
+                ("txt2nlu", txt2nlu_environment),
+            ):
+                rate = endpoint_capacity.get(name)
+                if not rate:
+                    continue
+                environment["ADMISSION_TABLE_NAME"] = admission_table.table_name
+                environment["ADMISSION_RATE"] = str(rate)
+                # Up to two seconds of capacity are admitted at once
+                environment["ADMISSION_BURST"] = str(max(1, round(rate * 2)))
+                environment["ADMISSION_SERVICE_SECONDS"] = str(service_seconds[name])
+
+        # Leases of the image requests in flight. Identical concurrent requests
+        # wait for the first one instead of each running Stable Diffusion
+        if coalesce_requests:
+            coalesce_table = dynamodb.Table(
+                self,
+                "ProtoFoundationAIInFlightRequests",
+                partition_key=dynamodb.Attribute(
+                    name="pk", type=dynamodb.AttributeType.STRING
+                ),
+                billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+                time_to_live_attribute="expires_at",
+                removal_policy=RemovalPolicy.DESTROY,
+            )
+            coalesce_table.grant_read_write_data(role)
+            txt2img_environment["COALESCE_TABLE_NAME"] = coalesce_table.table_name
+            # A lease outlives the Lambda generating the result
+            txt2img_environment["COALESCE_LEASE_SECONDS"] = str(
+                int(lambda_timeout.to_seconds()) + 20
+            )
+
         # Defines an AWS Lambda function for Image Generation service
         lambda_txt2img = _lambda.Function(
             self,
@@ -55,17 +293,28 @@ class WebStack(Stack):
             code=_lambda.Code.from_asset("src/lambda_txt2img"),
             handler="txt2img.lambda_handler",
             role=role,
-            timeout=Duration.seconds(180),
+            layers=[common_layer],
+            environment=txt2img_environment,
+            timeout=lambda_timeout,
             memory_size=512,
-            vpc_subnets=ec2.SubnetSelection(
-                subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS
-            ),
-            vpc=vpc,
+            # Caps the requests waiting on the endpoint at once
+            reserved_concurrent_executions=reserved_concurrency,
+            architecture=architecture,
+            **vpc_options,
+        )
+        # API Gateway invokes the alias, which keeps provisioned environments
+        # initialized before the first request
+        txt2img_alias = lambda_txt2img.add_alias(
+            "live",
+            provisioned_concurrent_executions=provisioned_concurrency or None,
         )
 
         # Defines an Amazon API Gateway endpoint for Image Generation service
         txt2img_apigw_endpoint = apigw.LambdaRestApi(
-            self, "ProtoFoundationAITxt2ImgEndpoint", handler=lambda_txt2img
+            self,
+            "ProtoFoundationAITxt2ImgEndpoint",
+            handler=txt2img_alias,
+            **api_options,
         )
 
         # Defines an AWS Lambda function for NLU & Text Generation service
@@ -77,57 +326,135 @@ class WebStack(Stack):
             code=_lambda.Code.from_asset("src/lambda_txt2nlu"),
             handler="txt2nlu.lambda_handler",
             role=role,
-            timeout=Duration.seconds(180),
+            layers=[common_layer],
+            environment=txt2nlu_environment,
+            timeout=lambda_timeout,
             memory_size=512,
-            vpc_subnets=ec2.SubnetSelection(
-                subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS
-            ),
-            vpc=vpc,
+            reserved_concurrent_executions=reserved_concurrency,
+            architecture=architecture,
+            **vpc_options,
+        )
+        txt2nlu_alias = lambda_txt2nlu.add_alias(
+            "live",
+            provisioned_concurrent_executions=provisioned_concurrency or None,
         )
 
         # Defines an Amazon API Gateway endpoint for NLU & Text Generation service
         txt2nlu_apigw_endpoint = apigw.LambdaRestApi(
-            self, "ProtoFoundationAITxt2NluEndpoint", handler=lambda_txt2nlu
+            self,
+            "ProtoFoundationAITxt2NluEndpoint",
+            handler=txt2nlu_alias,
+            **api_options,
         )
 
-        # Create ECS cluster
-        cluster = ecs.Cluster(self, "ProtoFoundationAIWebCluster", vpc=vpc)
+        # Create ECS cluster, with Fargate and Fargate Spot capacity providers
+        cluster = ecs.Cluster(
+            self,
+            "ProtoFoundationAIWebCluster",
+            vpc=vpc,
+            enable_fargate_capacity_providers=True,
+        )
 
-        # Add an AutoScalingGroup with spot instances to the existing cluster
-        cluster.add_capacity(
-            "AsgSpot",
-            max_capacity=2,
-            min_capacity=1,
-            desired_capacity=2,
-            instance_type=ec2.InstanceType("c5.xlarge"),
-            spot_price="0.0735",
-            # Enable the Automated Spot Draining support for Amazon ECS
-            spot_instance_draining=True,
+        # Build Dockerfile from local folder and push to ECR. The context is the
+        # repository, so the image can share the generation presets and limits
+        # with the Lambdas
+        image = ecs.ContainerImage.from_asset(
+            ".",
+            file="web-app/Dockerfile",
+            ignore_mode=IgnoreMode.DOCKER,
+            exclude=WEB_IMAGE_EXCLUDE,
+        )
+        task_image_options = ecs_patterns.ApplicationLoadBalancedTaskImageOptions(
+            image=image,
+            container_port=8501,
+            # The tasks publish their in-flight API requests, see scaling below.
+            # Streamed text generation waits for a turn of the txt2nlu endpoint
+            # in the same admission bucket as the Lambda
+            environment={
+                "METRICS_NAMESPACE": WEB_METRICS_NAMESPACE,
+                "METRICS_SERVICE_NAME": WEB_SERVICE_NAME,
+                **{
+                    key: value
+                    for key, value in txt2nlu_environment.items()
+                    if key.startswith("ADMISSION_")
+                },
+            },
         )
 
-        # Build Dockerfile from local folder and push to ECR
-        image = ecs.ContainerImage.from_asset("web-app")
+        if web_capacity == "ec2_spot":
+            # Spot instances registered through a capacity provider, so the
+            # service places tasks on them and ECS scales the group with the tasks
+            asg = autoscaling.AutoScalingGroup(
+                self,
+                "AsgSpot",
+                vpc=vpc,
+                instance_type=ec2.InstanceType("c5.xlarge"),
+                machine_image=ecs.EcsOptimizedImage.amazon_linux2(),
+                min_capacity=1,
+                max_capacity=4,
+                spot_price="0.0735",
+            )
+            capacity_provider = ecs.AsgCapacityProvider(
+                self,
+                "ProtoFoundationAIWebSpotCapacity",
+                auto_scaling_group=asg,
+                # Enable the Automated Spot Draining support for Amazon ECS
+                spot_instance_draining=True,
+            )
+            cluster.add_asg_capacity_provider(capacity_provider)
+
+            # The tasks mostly wait on API Gateway, so smaller tasks are packed
+            # onto as few instances as memory allows, three per c5.xlarge
+            fargate_service = ecs_patterns.ApplicationLoadBalancedEc2Service(
+                self,
+                "ProtoFoundationAIWebWebApplication",
+                cluster=cluster,
+                cpu=1024,
+                desired_count=1,
+                task_image_options=task_image_options,
+                load_balancer_name="proto-foundation-ai-web-balancer",
+                memory_limit_mib=2048,
+                public_load_balancer=True,
+                capacity_provider_strategies=[
+                    ecs.CapacityProviderStrategy(
+                        capacity_provider=capacity_provider.capacity_provider_name,
+                        weight=1,
+                    )
+                ],
+                placement_strategies=[ecs.PlacementStrategy.packed_by_memory()],
+            )
+        else:
+            # With Fargate Spot one task stays on regular Fargate, the rest run
+            # on spare capacity at a discount
+            capacity_provider_strategies = None
+            if web_capacity == "fargate_spot":
+                capacity_provider_strategies = [
+                    ecs.CapacityProviderStrategy(
+                        capacity_provider="FARGATE", base=1, weight=0
+                    ),
+                    ecs.CapacityProviderStrategy(
+                        capacity_provider="FARGATE_SPOT", weight=1
+                    ),
+                ]
 
-        # Create Fargate service
-        fargate_service = ecs_patterns.ApplicationLoadBalancedFargateService(
-            self,
-            "ProtoFoundationAIWebWebApplication",
-            cluster=cluster,  # Required
-            cpu=2048,  # Default is 256 (512 is 0.5 vCPU, 2048 is 2 vCPU)
-            desired_count=1,  # Default is 1
-            task_image_options=ecs_patterns.ApplicationLoadBalancedTaskImageOptions(
-                image=image,
-                container_port=8501,
-            ),
-            load_balancer_name="proto-foundation-ai-web-balancer",
-            memory_limit_mib=4096,  # Default is 512
-            public_load_balancer=True,
-        )  # Default is True
+            # Create Fargate service
+            fargate_service = ecs_patterns.ApplicationLoadBalancedFargateService(
+                self,
+                "ProtoFoundationAIWebWebApplication",
+                cluster=cluster,  # Required
+                cpu=2048,  # Default is 256 (512 is 0.5 vCPU, 2048 is 2 vCPU)
+                desired_count=1,  # Default is 1
+                task_image_options=task_image_options,
+                load_balancer_name="proto-foundation-ai-web-balancer",
+                memory_limit_mib=4096,  # Default is 512
+                public_load_balancer=True,
+                capacity_provider_strategies=capacity_provider_strategies,
+            )  # Default is True
 
         fargate_service.task_definition.add_to_task_role_policy(
             iam.PolicyStatement(
                 effect=iam.Effect.ALLOW,
-                actions=["ssm:GetParameter"],
+                actions=["ssm:GetParameter", "ssm:GetParameters"],
                 resources=["arn:aws:ssm:*"],
             )
         )
@@ -140,7 +467,36 @@ class WebStack(Stack):
             )
         )
 
-        # Setup task auto-scaling
+        # Streaming text generation calls the SageMaker endpoint directly, because
+        # the managed Python Lambda runtime cannot stream responses back
+        fargate_service.task_definition.add_to_task_role_policy(
+            iam.PolicyStatement(
+                effect=iam.Effect.ALLOW,
+                actions=["sagemaker:InvokeEndpointWithResponseStream"],
+                resources=["*"],
+            )
+        )
+
+        if "ADMISSION_TABLE_NAME" in txt2nlu_environment:
+            admission_table.grant_read_write_data(
+                fargate_service.task_definition.task_role
+            )
+
+        fargate_service.task_definition.add_to_task_role_policy(
+            iam.PolicyStatement(
+                effect=iam.Effect.ALLOW,
+                actions=["cloudwatch:PutMetricData"],
+                resources=["*"],
+                conditions={
+                    "StringEquals": {"cloudwatch:namespace": WEB_METRICS_NAMESPACE}
+                },
+            )
+        )
+
+        # Setup task auto-scaling. The tasks spend most of their time waiting on
+        # API Gateway, so CPU stays low while users queue. Load is tracked by ALB
+        # requests and the in-flight API requests per task, and slow responses
+        # add tasks on top
         scaling = fargate_service.service.auto_scale_task_count(max_capacity=10)
         scaling.scale_on_cpu_utilization(
             "CpuScaling",
@@ -148,6 +504,42 @@ class WebStack(Stack):
             scale_in_cooldown=Duration.seconds(60),
             scale_out_cooldown=Duration.seconds(60),
         )
+        scaling.scale_on_request_count(
+            "RequestCountScaling",
+            requests_per_target=WEB_REQUESTS_PER_TASK,
+            target_group=fargate_service.target_group,
+            scale_in_cooldown=Duration.seconds(120),
+            scale_out_cooldown=Duration.seconds(60),
+        )
+        scaling.scale_to_track_custom_metric(
+            "InFlightScaling",
+            metric=cloudwatch.Metric(
+                namespace=WEB_METRICS_NAMESPACE,
+                metric_name="InFlightRequests",
+                dimensions_map={"ServiceName": WEB_SERVICE_NAME},
+                statistic="Average",
+                period=Duration.minutes(1),
+            ),
+            target_value=WEB_IN_FLIGHT_PER_TASK,
+            scale_in_cooldown=Duration.seconds(120),
+            scale_out_cooldown=Duration.seconds(60),
+        )
+        scaling.scale_on_metric(
+            "ResponseTimeScaling",
+            metric=fargate_service.target_group.metrics.target_response_time(
+                period=Duration.minutes(1)
+            ),
+            # Scale-in is left to the target tracking policies
+            scaling_steps=[
+                appscaling.ScalingInterval(upper=WEB_RESPONSE_TIME_SECONDS, change=0),
+                appscaling.ScalingInterval(lower=WEB_RESPONSE_TIME_SECONDS, change=1),
+                appscaling.ScalingInterval(
+                    lower=WEB_RESPONSE_TIME_SECONDS * 3, change=3
+                ),
+            ],
+            adjustment_type=appscaling.AdjustmentType.CHANGE_IN_CAPACITY,
+            cooldown=Duration.seconds(60),
+        )
 
         ssm.StringParameter(
             self,
@@ -0,0 +1,108 @@
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# the Lambda functions, their layer and the web app are imported as top-level
+# modules, like in their runtime environments
+sys.path[:0] = [
+    ROOT_DIR,
+    os.path.join(ROOT_DIR, "src", "layer_common", "python"),
+    os.path.join(ROOT_DIR, "src", "lambda_txt2img"),
+    os.path.join(ROOT_DIR, "src", "lambda_txt2nlu"),
+    os.path.join(ROOT_DIR, "web-app"),
+]
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+
+class FakeClock:
+    """Stands in for the time module, sleep advances the clock at once."""
+
+    def __init__(self, now: float = 1_000_000.0) -> None:
+        self.now = now
+        self.slept = []
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class ConditionalCheckFailedException(Exception):
+    pass
+
+
+class FakeDynamoDB:
+    """
+    In-memory DynamoDB client for the conditional writes of the admission
+    bucket and the single-flight leases.
+    """
+
+    class exceptions:
+        ConditionalCheckFailedException = ConditionalCheckFailedException
+
+    def __init__(self) -> None:
+        self.items = {}
+        self.fail = False
+
+    def _check(self, item, condition, values):
+        if condition is None:
+            return True
+        if condition == "tat = :tat":
+            return item is not None and item["tat"] == values[":tat"]
+        if condition == "attribute_not_exists(pk)":
+            return item is None
+        if condition == "attribute_not_exists(pk) OR expires_at < :now":
+            return item is None or float(item["expires_at"]["N"]) < float(
+                values[":now"]["N"]
+            )
+        if condition == "#owner = :owner":
+            return item is not None and item["owner"] == values[":owner"]
+        raise NotImplementedError(condition)
+
+    def get_item(self, TableName, Key, ConsistentRead=False):
+        if self.fail:
+            raise RuntimeError("DynamoDB unavailable")
+        item = self.items.get(Key["pk"]["S"])
+        return {"Item": dict(item)} if item is not None else {}
+
+    def put_item(
+        self, TableName, Item, ConditionExpression=None, ExpressionAttributeValues=None
+    ):
+        if self.fail:
+            raise RuntimeError("DynamoDB unavailable")
+        key = Item["pk"]["S"]
+        if not self._check(
+            self.items.get(key), ConditionExpression, ExpressionAttributeValues
+        ):
+            raise ConditionalCheckFailedException()
+        self.items[key] = dict(Item)
+
+    def delete_item(
+        self,
+        TableName,
+        Key,
+        ConditionExpression=None,
+        ExpressionAttributeNames=None,
+        ExpressionAttributeValues=None,
+    ):
+        key = Key["pk"]["S"]
+        if not self._check(
+            self.items.get(key), ConditionExpression, ExpressionAttributeValues
+        ):
+            raise ConditionalCheckFailedException()
+        self.items.pop(key, None)
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def dynamodb():
+    return FakeDynamoDB()
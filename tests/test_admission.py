@@ -0,0 +1,101 @@
+import admission
+import pytest
+from admission import AdmissionController, Overloaded
+
+
+@pytest.fixture
+def controller(monkeypatch, clock, dynamodb):
+    monkeypatch.setattr(admission, "time", clock)
+    controller = AdmissionController("admission", rate=1.0, burst=2.0)
+    controller._client = dynamodb
+    return controller
+
+
+def tat(dynamodb, endpoint_name="e"):
+    return float(dynamodb.items[f"admission#{endpoint_name}"]["tat"]["N"])
+
+
+def reserve(controller, cost=1, max_delay=20.0):
+    # a turn reserved by a concurrent request, which then sleeps on its own
+    return controller._reserve("e", "interactive", cost, max_delay)
+
+
+def test_burst_is_admitted_without_waiting(controller, clock):
+    assert controller.admit("e") == 0
+    assert controller.admit("e") == 0
+    assert clock.slept == []
+
+
+def test_requests_beyond_the_burst_wait_for_their_turn(controller):
+    for _ in range(2):
+        assert reserve(controller) == 0
+
+    assert reserve(controller) == pytest.approx(1.0)
+    assert reserve(controller, cost=2) == pytest.approx(3.0)
+
+
+def test_wait_above_the_limit_is_rejected(controller, dynamodb):
+    reserve(controller, cost=22)
+    reserved = tat(dynamodb)
+
+    with pytest.raises(Overloaded) as error:
+        controller.admit("e")
+    assert error.value.retry_after == 1
+    # a rejected request leaves the queue as it was
+    assert tat(dynamodb) == reserved
+
+
+def test_wait_limit_leaves_time_for_the_endpoint_call(controller):
+    controller.service_seconds = 10
+
+    assert controller.wait_limit("interactive") == pytest.approx(19.0)
+    assert controller.wait_limit("interactive", elapsed=15) == pytest.approx(4.0)
+    assert controller.wait_limit("interactive", elapsed=25) == 0
+    assert controller.wait_limit("batch") == 5
+
+
+def test_request_late_in_its_api_budget_is_rejected(controller):
+    controller.service_seconds = 10
+    reserve(controller, cost=6)
+
+    # 5 s wait, 4 s left of the 29 s after 15 s spent and a 10 s call
+    with pytest.raises(Overloaded):
+        controller.admit("e", elapsed=15)
+    assert controller.admit("e", elapsed=5) == pytest.approx(5.0)
+
+
+def test_batch_waits_for_reserved_turns_without_reserving(controller, clock, dynamodb):
+    start = clock.now
+    reserve(controller, cost=4)
+
+    waited = controller.admit("e", priority="batch")
+
+    # the batch request starts once the interactive turns are over
+    assert waited == pytest.approx(4.0)
+    assert clock.now == pytest.approx(start + 4.0)
+    assert tat(dynamodb) == pytest.approx(start + 5.0)
+
+
+def test_batch_does_not_queue_ahead_of_interactive(controller, dynamodb):
+    reserve(controller, cost=8)
+    reserved = tat(dynamodb)
+
+    with pytest.raises(Overloaded):
+        controller.admit("e", priority="batch")
+    # interactive requests arriving later are not delayed by the batch request
+    assert tat(dynamodb) == reserved
+
+
+def test_bucket_errors_admit_the_request(controller, dynamodb):
+    dynamodb.fail = True
+
+    assert controller.admit("e", cost=100) == 0
+
+
+def test_disabled_without_rate(dynamodb):
+    controller = AdmissionController("admission", rate=0, burst=1)
+    controller._client = dynamodb
+
+    assert not controller.enabled
+    assert controller.admit("e", cost=100) == 0
+    assert dynamodb.items == {}
@@ -0,0 +1,72 @@
+import threading
+
+import api_client
+import pytest
+import requests
+from api_client import ApiBusy, ApiClient
+
+
+class BlockingSession:
+    """Holds every request until released, then answers with the URL."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.urls = []
+
+    def post(self, url, **kwargs):
+        self.urls.append(url)
+        self.release.wait(5)
+        return url
+
+
+@pytest.fixture
+def client():
+    client = ApiClient(pool_size=1, max_queued=1)
+    client.session = BlockingSession()
+    yield client
+    client.session.release.set()
+    client.executor.shutdown(wait=True)
+
+
+def test_requests_beyond_the_queue_are_turned_away(client):
+    running = client.post("https://api/running")
+    queued = client.post("https://api/queued")
+
+    with pytest.raises(ApiBusy):
+        client.post("https://api/rejected")
+
+    client.session.release.set()
+    assert running.result(5) == "https://api/running"
+    assert queued.result(5) == "https://api/queued"
+    assert client.in_flight == 0
+
+
+def test_coalesced_requests_share_the_call(client):
+    first = client.post("https://api/a", coalesce=True, json={"prompt": "p"})
+    second = client.post("https://api/a", coalesce=True, json={"prompt": "p"})
+
+    assert second is first
+    assert client.coalesced == 1
+    client.session.release.set()
+    assert first.result(5) == "https://api/a"
+
+
+def test_send_waits_for_the_request_timeout(client, monkeypatch):
+    monkeypatch.setattr(api_client, "QUEUE_TIMEOUT_SECONDS", 0.05)
+    client.post("https://api/running")
+
+    # queued behind the running request until the timeout passes
+    with pytest.raises(requests.exceptions.Timeout):
+        client.send("https://api/queued", timeout=0.05)
+
+    client.session.release.set()
+    client.executor.shutdown(wait=True)
+    # the queued request was dropped, not sent late
+    assert client.session.urls == ["https://api/running"]
+    assert client.in_flight == 0
+
+
+def test_send_returns_the_response(client):
+    client.session.release.set()
+
+    assert client.send("https://api/a", timeout=5) == "https://api/a"
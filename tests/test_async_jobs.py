@@ -0,0 +1,89 @@
+import io
+import json
+
+import async_jobs
+import pytest
+from botocore.exceptions import ClientError
+
+OUTPUT_LOCATION = "s3://outputs/async/output/job.out"
+FAILURE_LOCATION = "s3://outputs/async/failure/job.out"
+
+
+class NoSuchKey(ClientError):
+    pass
+
+
+class FakeS3:
+    """
+    S3 client of a role that may not list the output buckets, so a missing key
+    is reported as NoSuchKey or as AccessDenied.
+    """
+
+    class exceptions:
+        ClientError = ClientError
+        NoSuchKey = NoSuchKey
+
+    def __init__(self, missing_code="NoSuchKey"):
+        self.objects = {}
+        self.missing_code = missing_code
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[f"s3://{Bucket}/{Key}"] = Body
+
+    def get_object(self, Bucket, Key):
+        uri = f"s3://{Bucket}/{Key}"
+        if uri not in self.objects:
+            error = {"Error": {"Code": self.missing_code, "Message": "missing"}}
+            if self.missing_code == "NoSuchKey":
+                raise NoSuchKey(error, "GetObject")
+            raise ClientError(error, "GetObject")
+        body = self.objects[uri]
+        return {"Body": io.BytesIO(body if isinstance(body, bytes) else body.encode())}
+
+
+@pytest.fixture
+def s3(monkeypatch, clock):
+    s3 = FakeS3()
+    monkeypatch.setattr(async_jobs, "_s3", s3)
+    monkeypatch.setattr(async_jobs, "ASYNC_BUCKET_NAME", "jobs")
+    monkeypatch.setattr(async_jobs, "time", clock)
+    record = {
+        "prompt": "a cat",
+        "image_format": "png",
+        "output_location": OUTPUT_LOCATION,
+        "failure_location": FAILURE_LOCATION,
+        "submitted_at": clock.now,
+    }
+    s3.put_object("jobs", "jobs/job.json", json.dumps(record))
+    return s3
+
+
+@pytest.mark.parametrize("missing_code", ["NoSuchKey", "AccessDenied"])
+def test_job_without_output_is_pending(s3, clock, missing_code):
+    s3.missing_code = missing_code
+
+    record, status, output = async_jobs.get_job("job", wait_seconds=3)
+
+    assert record["prompt"] == "a cat"
+    assert (status, output) == ("pending", None)
+    assert clock.slept == [1, 1, 1]
+
+
+def test_completed_and_failed_jobs(s3):
+    s3.put_object("outputs", "async/output/job.out", b"{}")
+    assert async_jobs.get_job("job")[1:] == ("completed", b"{}")
+
+    del s3.objects[OUTPUT_LOCATION]
+    s3.put_object("outputs", "async/failure/job.out", b"CUDA out of memory")
+    assert async_jobs.get_job("job")[1:] == ("failed", "CUDA out of memory")
+
+
+def test_unknown_job(s3):
+    assert async_jobs.get_job("other") == (None, None, None)
+
+
+def test_other_errors_are_raised(s3):
+    s3.missing_code = "SlowDown"
+
+    with pytest.raises(ClientError):
+        async_jobs.get_job("job")
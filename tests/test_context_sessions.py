@@ -0,0 +1,52 @@
+import context_sessions
+from context_sessions import approx_tokens, context_windows, split_context
+
+
+def test_approx_tokens_rounds_up():
+    assert approx_tokens("") == 0
+    assert approx_tokens("abcd") == 1
+    assert approx_tokens("abcde") == 2
+
+
+def test_short_context_is_one_chunk():
+    assert split_context("Q: hi\nA: hello\n") == ["Q: hi\nA: hello"]
+    assert split_context("") == [""]
+
+
+def test_chunks_end_at_line_breaks():
+    turns = [f"turn {i}: " + "x" * 20 for i in range(6)]
+
+    # 10 tokens, 40 characters, hold one 29 character turn
+    chunks = split_context("\n".join(turns), max_tokens=10)
+
+    assert chunks == turns
+
+
+def test_long_line_is_cut_at_whitespace():
+    line = " ".join(["word"] * 30)
+
+    chunks = split_context(line, max_tokens=5)
+
+    assert all(len(chunk) <= 20 for chunk in chunks)
+    assert " ".join(chunks).split() == line.split()
+
+
+def test_default_window_leaves_room_for_the_question():
+    max_chars = (
+        context_sessions.MODEL_MAX_TOKENS - context_sessions.QUESTION_TOKENS
+    ) * context_sessions.CHARS_PER_TOKEN
+    context = "\n".join(["y" * 100] * 50)
+
+    chunks = split_context(context)
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= max_chars for chunk in chunks)
+    assert "\n".join(chunks) == context
+
+
+def test_windows_per_mode():
+    chunks = ["a", "b", "c"]
+
+    assert context_windows("a\nb\nc", chunks, "full") == ["a\nb\nc"]
+    assert context_windows("a\nb\nc", chunks, "truncate") == ["a"]
+    assert context_windows("a\nb\nc", chunks, "chunks") == chunks
@@ -0,0 +1,64 @@
+import json
+import struct
+import zlib
+
+import pytest
+from image_codec import PNG_SIGNATURE, Pixels, encode_png, read_pixels
+
+IMAGE = [
+    [[0, 1, 2], [253, 254, 255], [10, 20, 30]],
+    [[40, 50, 60], [70, 80, 90], [100, 110, 120]],
+]
+
+
+def response(pixels, key="generated_image", **fields):
+    return json.dumps({"prompt": "a cat", key: pixels, **fields}).encode()
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 64 * 1024])
+def test_pixels_read_in_any_chunk_size(chunk_size):
+    pixels = read_pixels(response(IMAGE), chunk_size=chunk_size)
+
+    assert (pixels.width, pixels.height, pixels.channels) == (3, 2, 3)
+    assert pixels.tolist() == IMAGE
+
+
+def test_key_and_spacing_of_the_response():
+    # an escaped key inside the prompt is not the pixel array
+    body = (
+        b'{"prompt": "\\"generated_image\\": [", '
+        b'"generated_image" : [ [ [1 ,2, 3, 4] ] ] }'
+    )
+
+    pixels = read_pixels(body, chunk_size=5)
+
+    assert pixels.channels == 4
+    assert pixels.tolist() == [[[1, 2, 3, 4]]]
+
+
+def test_other_key():
+    assert read_pixels(response(IMAGE, key="images"), key="images").tolist() == IMAGE
+
+
+def test_truncated_response():
+    with pytest.raises(ValueError, match="Truncated"):
+        read_pixels(response(IMAGE)[:-20])
+
+
+def test_ragged_rows():
+    with pytest.raises(ValueError, match="differ in length"):
+        read_pixels(response([[[1, 2, 3], [4, 5, 6]], [[7, 8, 9]]]))
+
+
+def test_png_holds_the_pixel_rows():
+    png = encode_png(Pixels.from_list(IMAGE))
+
+    assert png.startswith(PNG_SIGNATURE)
+    width, height, depth, color_type = struct.unpack(">IIBB", png[16:26])
+    assert (width, height, depth, color_type) == (3, 2, 8, 2)
+    idat_length = struct.unpack(">I", png[33:37])[0]
+    scanlines = zlib.decompress(png[41 : 41 + idat_length])
+    assert scanlines == b"".join(
+        b"\x00" + bytes(value for pixel in row for value in pixel) for row in IMAGE
+    )
+    assert encode_png(IMAGE) == png
@@ -0,0 +1,186 @@
+import aws_cdk as cdk
+import pytest
+from aws_cdk.assertions import Match, Template
+from construct.sagemaker_endpoint_construct import SageMakerEndpointConstruct
+
+from conftest import ROOT_DIR
+
+ASYNC_INFERENCE = {"output_path": "s3://bucket/async/output"}
+
+
+@pytest.fixture(autouse=True)
+def repository_root(monkeypatch):
+    # Lambda code assets are given relative to the repository, like in cdk.json
+    monkeypatch.chdir(ROOT_DIR)
+
+
+def synth(**kwargs) -> Template:
+    stack = cdk.Stack(cdk.App(), "Test")
+    SageMakerEndpointConstruct(
+        stack,
+        "Endpoint",
+        project_prefix="Test",
+        role_arn="arn:aws:iam::123456789012:role/sagemaker",
+        model_name="Model",
+        model_bucket_name="bucket",
+        model_bucket_key="model.tar.gz",
+        model_docker_image="image",
+        variant_name="AllTraffic",
+        variant_weight=1,
+        instance_count=1,
+        instance_type="ml.g5.xlarge",
+        environment={},
+        deploy_enable=True,
+        **kwargs,
+    )
+    return Template.from_stack(stack)
+
+
+def target_tracking(metric: dict, target_value: float) -> dict:
+    return {
+        "PolicyType": "TargetTrackingScaling",
+        "TargetTrackingScalingPolicyConfiguration": Match.object_like(
+            {**metric, "TargetValue": target_value}
+        ),
+    }
+
+
+def test_no_scaling_without_settings():
+    template = synth()
+
+    template.resource_count_is("AWS::ApplicationAutoScaling::ScalableTarget", 0)
+    template.resource_count_is("AWS::ApplicationAutoScaling::ScalingPolicy", 0)
+
+
+def test_scalable_target_range():
+    template = synth(
+        autoscaling={
+            "min_capacity": 2,
+            "max_capacity": 6,
+            "invocations_per_instance": 50,
+        }
+    )
+
+    template.has_resource_properties(
+        "AWS::ApplicationAutoScaling::ScalableTarget",
+        {
+            "MinCapacity": 2,
+            "MaxCapacity": 6,
+            "ScalableDimension": "sagemaker:variant:DesiredInstanceCount",
+            "ServiceNamespace": "sagemaker",
+        },
+    )
+
+
+def test_target_tracking_policy_per_target():
+    template = synth(
+        autoscaling={
+            "max_capacity": 4,
+            "invocations_per_instance": 50,
+            "gpu_utilization": 70,
+            "model_latency_ms": 800,
+        }
+    )
+
+    template.resource_count_is("AWS::ApplicationAutoScaling::ScalingPolicy", 3)
+    template.has_resource_properties(
+        "AWS::ApplicationAutoScaling::ScalingPolicy",
+        target_tracking(
+            {
+                "PredefinedMetricSpecification": {
+                    "PredefinedMetricType": "SageMakerVariantInvocationsPerInstance"
+                },
+                "ScaleInCooldown": 300,
+                "ScaleOutCooldown": 60,
+            },
+            50,
+        ),
+    )
+    template.has_resource_properties(
+        "AWS::ApplicationAutoScaling::ScalingPolicy",
+        target_tracking(
+            {
+                "CustomizedMetricSpecification": Match.object_like(
+                    {
+                        "MetricName": "GPUUtilization",
+                        "Namespace": "/aws/sagemaker/Endpoints",
+                        "Statistic": "Average",
+                    }
+                )
+            },
+            70,
+        ),
+    )
+    # ModelLatency is reported in microseconds
+    template.has_resource_properties(
+        "AWS::ApplicationAutoScaling::ScalingPolicy",
+        target_tracking(
+            {
+                "CustomizedMetricSpecification": Match.object_like(
+                    {"MetricName": "ModelLatency", "Namespace": "AWS/SageMaker"}
+                )
+            },
+            800_000,
+        ),
+    )
+
+
+def test_scale_from_zero_for_async_endpoints():
+    template = synth(
+        async_inference=ASYNC_INFERENCE,
+        autoscaling={
+            "min_capacity": 0,
+            "max_capacity": 2,
+            "backlog_per_instance": 5,
+        },
+    )
+
+    template.has_resource_properties(
+        "AWS::ApplicationAutoScaling::ScalableTarget", {"MinCapacity": 0}
+    )
+    template.has_resource_properties(
+        "AWS::ApplicationAutoScaling::ScalingPolicy",
+        target_tracking(
+            {
+                "CustomizedMetricSpecification": Match.object_like(
+                    {"MetricName": "ApproximateBacklogSizePerInstance"}
+                )
+            },
+            5,
+        ),
+    )
+    template.has_resource_properties(
+        "AWS::ApplicationAutoScaling::ScalingPolicy",
+        {
+            "PolicyType": "StepScaling",
+            "StepScalingPolicyConfiguration": Match.object_like(
+                {"AdjustmentType": "ChangeInCapacity"}
+            ),
+        },
+    )
+    template.has_resource_properties(
+        "AWS::CloudWatch::Alarm",
+        {"MetricName": "HasBacklogWithoutCapacity", "Namespace": "AWS/SageMaker"},
+    )
+
+
+def test_zero_capacity_requires_async_inference():
+    with pytest.raises(ValueError, match="asynchronous"):
+        synth(autoscaling={"min_capacity": 0, "max_capacity": 2})
+
+
+def test_extra_variants_scale_on_their_own():
+    template = synth(
+        autoscaling={"max_capacity": 4, "invocations_per_instance": 50},
+        extra_variants=[
+            {
+                "variant_name": "Small",
+                "autoscaling": {"max_capacity": 2, "gpu_utilization": 60},
+            }
+        ],
+    )
+
+    template.resource_count_is("AWS::ApplicationAutoScaling::ScalableTarget", 2)
+    template.has_resource_properties(
+        "AWS::ApplicationAutoScaling::ScalableTarget", {"MaxCapacity": 2}
+    )
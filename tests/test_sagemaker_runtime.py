@@ -0,0 +1,99 @@
+import pytest
+import sagemaker_runtime
+from botocore.exceptions import (
+    ClientError,
+    ConnectTimeoutError,
+    EndpointConnectionError,
+    ReadTimeoutError,
+)
+from sagemaker_runtime import MAX_ATTEMPTS, RetryingRuntimeClient
+
+ENDPOINT_URL = "https://runtime.sagemaker.us-east-1.amazonaws.com"
+
+
+def client_error(code, status_code=400):
+    error = {
+        "Error": {"Code": code, "Message": code},
+        "ResponseMetadata": {"HTTPStatusCode": status_code},
+    }
+    return ClientError(error, "InvokeEndpoint")
+
+
+class FakeRuntime:
+    """Raises the given errors in turn, then answers."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def invoke_endpoint(self, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return {"Body": b"ok"}
+
+    def describe_something(self):
+        return "passed through"
+
+
+@pytest.fixture(autouse=True)
+def clock(monkeypatch, clock):
+    monkeypatch.setattr(sagemaker_runtime, "time", clock)
+    return clock
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        client_error("ThrottlingException"),
+        EndpointConnectionError(endpoint_url=ENDPOINT_URL),
+        ConnectTimeoutError(endpoint_url=ENDPOINT_URL),
+    ],
+)
+def test_requests_that_did_not_reach_the_model_are_retried(clock, error):
+    runtime = FakeRuntime(error, error)
+
+    assert RetryingRuntimeClient(runtime).invoke_endpoint() == {"Body": b"ok"}
+    assert runtime.calls == 3
+    assert len(clock.slept) == 2
+    assert all(0 <= seconds <= 1.0 for seconds in clock.slept)
+
+
+def test_retries_stop_after_max_attempts():
+    runtime = FakeRuntime(*[ConnectTimeoutError(endpoint_url=ENDPOINT_URL)] * 5)
+
+    with pytest.raises(ConnectTimeoutError):
+        RetryingRuntimeClient(runtime).invoke_endpoint()
+    assert runtime.calls == MAX_ATTEMPTS
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        ReadTimeoutError(endpoint_url=ENDPOINT_URL),
+        client_error("ModelError", 424),
+        client_error("InternalFailure", 500),
+        client_error("ServiceUnavailable", 503),
+        client_error("ValidationError"),
+    ],
+)
+def test_requests_the_model_may_have_served_are_not_retried(clock, error):
+    runtime = FakeRuntime(error)
+
+    with pytest.raises(type(error)):
+        RetryingRuntimeClient(runtime).invoke_endpoint()
+    assert runtime.calls == 1
+    assert clock.slept == []
+
+
+def test_other_operations_are_passed_through():
+    client = RetryingRuntimeClient(FakeRuntime())
+
+    assert client.describe_something() == "passed through"
+
+
+def test_botocore_does_not_retry_on_its_own():
+    config = sagemaker_runtime.runtime_config(180)
+
+    assert config.retries == {"mode": "standard", "total_max_attempts": 1}
+    assert config.read_timeout < 180
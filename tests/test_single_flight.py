@@ -0,0 +1,95 @@
+import pytest
+import single_flight
+from single_flight import SingleFlight
+
+
+@pytest.fixture
+def flight(monkeypatch, clock, dynamodb):
+    monkeypatch.setattr(single_flight, "time", clock)
+    flight = SingleFlight("coalesce", lease_seconds=200)
+    flight._client = dynamodb
+    return flight
+
+
+class FakeCache:
+    def __init__(self, results=None):
+        self.results = results or {}
+
+    def get(self, key):
+        if key in self.results:
+            return self.results[key], "s3"
+        return None, None
+
+
+def test_second_request_does_not_acquire(flight):
+    owner = flight.acquire("k")
+
+    assert owner is not None
+    assert flight.acquire("k") is None
+    assert flight.acquire("other") is not None
+
+
+def test_release_frees_the_key_for_its_owner_only(flight, dynamodb):
+    owner = flight.acquire("k")
+
+    flight.release("k", "someone else")
+    assert "k" in dynamodb.items
+
+    flight.release("k", owner)
+    assert "k" not in dynamodb.items
+    assert flight.acquire("k") is not None
+
+
+def test_expired_lease_is_taken_over(flight, clock):
+    stale = flight.acquire("k")
+    clock.now += 201
+
+    owner = flight.acquire("k")
+
+    assert owner not in (None, stale)
+    # the stale leader does not remove the new lease
+    flight.release("k", stale)
+    assert flight.acquire("k") is None
+
+
+def test_waiting_request_reads_the_leader_result(flight, clock, dynamodb):
+    owner = flight.acquire("k")
+    cache = FakeCache()
+
+    def leader_finishes(seconds):
+        clock.now += seconds
+        cache.results["k"] = b"image"
+        flight.release("k", owner)
+
+    clock.sleep = leader_finishes
+
+    assert flight.lead_or_wait("k", cache, timeout=10) == (b"image", "s3", None)
+
+
+def test_request_leads_after_a_leader_failed(flight, clock):
+    owner = flight.acquire("k")
+
+    def leader_fails(seconds):
+        clock.now += seconds
+        flight.release("k", owner)
+
+    clock.sleep = leader_fails
+
+    cached, tier, new_owner = flight.lead_or_wait("k", FakeCache(), timeout=10)
+    assert (cached, tier) == (None, None)
+    assert new_owner not in (None, owner)
+
+
+def test_wait_gives_up_at_the_timeout(flight, clock):
+    flight.acquire("k")
+    start = clock.now
+
+    assert flight.lead_or_wait("k", FakeCache(), timeout=1) == (None, None, None)
+    assert clock.now == pytest.approx(start + 1)
+
+
+def test_table_errors_let_every_request_lead(flight, dynamodb):
+    dynamodb.fail = True
+
+    assert flight.acquire("k") is not None
+    assert flight.acquire("k") is not None
@@ -0,0 +1,119 @@
+import json
+
+import admission
+import pytest
+import sm_stream
+from admission import AdmissionController, Overloaded
+from generation_params import MAX_INPUT_TOKENS, ParameterError
+from sm_stream import PromptTooLong, iter_text_chunks, stream_generated_text
+
+
+def parts(*payloads):
+    # events of invoke_endpoint_with_response_stream, one per payload part
+    return [{"PayloadPart": {"Bytes": payload}} for payload in payloads]
+
+
+def sse(token, special=False):
+    event = {"token": {"id": 1, "text": token, "special": special}}
+    return b"data:" + json.dumps(event).encode() + b"\n"
+
+
+def test_lines_split_across_parts_are_joined():
+    line = json.dumps({"generated_text": "Hello world"}).encode() + b"\n"
+
+    chunks = iter_text_chunks(parts(line[:5], line[5:12], line[12:]))
+
+    assert list(chunks) == ["Hello world"]
+
+
+def test_server_sent_events():
+    stream = parts(sse("Hello") + sse(" world"), b"\n", sse("!"))
+
+    assert list(iter_text_chunks(stream)) == ["Hello", " world", "!"]
+
+
+def test_special_tokens_are_skipped():
+    stream = parts(sse("<pad>", special=True), sse("Hi"), sse("</s>", special=True))
+
+    assert list(iter_text_chunks(stream)) == ["Hi"]
+
+
+def test_json_lines_and_plain_text():
+    stream = parts(
+        b'{"outputs": ["a"]}\n',
+        b'{"generated_texts": ["b"]}\n',
+        b'"c"\n',
+        b"plain\n",
+    )
+
+    assert list(iter_text_chunks(stream)) == ["a", "b", "c", "plain"]
+
+
+def test_trailing_line_without_newline_is_yielded():
+    stream = parts(b'{"generated_text": "first"}\n{"generated_text": "la', b'st"}')
+
+    assert list(iter_text_chunks(stream)) == ["first", "last"]
+
+
+def test_model_stream_error_raises_after_the_text_so_far():
+    stream = parts(sse("partial")) + [
+        {"ModelStreamError": {"Message": "CUDA out of memory", "ErrorCode": "500"}}
+    ]
+
+    chunks = iter_text_chunks(stream)
+    assert next(chunks) == "partial"
+    with pytest.raises(RuntimeError, match="ModelStreamError: CUDA out of memory"):
+        next(chunks)
+
+
+class FakeStreamingRuntime:
+    def __init__(self, events):
+        self.events = events
+        self.calls = []
+
+    def invoke_endpoint_with_response_stream(self, **kwargs):
+        self.calls.append(kwargs)
+        return {"Body": self.events}
+
+
+def test_stream_applies_the_preset_and_validates_overrides(monkeypatch):
+    runtime = FakeStreamingRuntime(parts(sse("ok")))
+    monkeypatch.setattr(sm_stream, "runtime", runtime)
+
+    assert list(stream_generated_text("e", "prompt", "fast", {"top_k": 5})) == ["ok"]
+    payload = json.loads(runtime.calls[0]["Body"])
+    assert payload["max_length"] == 64
+    assert payload["top_k"] == 5
+    assert payload["stream"] is True
+
+    with pytest.raises(ParameterError):
+        list(stream_generated_text("e", "prompt", "fast", {"max_length": 10_000}))
+    assert len(runtime.calls) == 1
+
+
+def test_prompt_above_the_input_limit_is_rejected(monkeypatch):
+    runtime = FakeStreamingRuntime(parts(sse("ok")))
+    monkeypatch.setattr(sm_stream, "runtime", runtime)
+
+    with pytest.raises(PromptTooLong):
+        list(stream_generated_text("e", "x" * (MAX_INPUT_TOKENS * 4 + 1)))
+    assert runtime.calls == []
+
+
+def test_stream_waits_in_the_admission_bucket(monkeypatch, clock, dynamodb):
+    runtime = FakeStreamingRuntime(parts(sse("ok")))
+    monkeypatch.setattr(sm_stream, "runtime", runtime)
+    monkeypatch.setattr(admission, "time", clock)
+    controller = AdmissionController("admission", rate=1.0, burst=1.0)
+    controller._client = dynamodb
+    monkeypatch.setattr(sm_stream, "admission", controller)
+    # turns reserved by Lambda requests for the same endpoint
+    controller._reserve("e", "interactive", 30, max_delay=60)
+
+    with pytest.raises(Overloaded):
+        list(stream_generated_text("e", "prompt"))
+    assert runtime.calls == []
+
+    clock.now += 20
+    assert list(stream_generated_text("e", "prompt")) == ["ok"]
+    assert clock.slept
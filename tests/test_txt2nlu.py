@@ -0,0 +1,128 @@
+import io
+import json
+import threading
+
+import context_sessions
+import pytest
+import txt2nlu
+from inference_cache import LruCache, ResultCache
+
+
+class FakeRuntime:
+    """Answers every prompt of a text_inputs batch with its upper-case text."""
+
+    def __init__(self):
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def invoke_endpoint(self, EndpointName, ContentType, Body, **routing):
+        inputs = json.loads(Body)["text_inputs"]
+        batch = inputs if isinstance(inputs, list) else [inputs]
+        with self._lock:
+            self.batches.append(batch)
+        answers = {"generated_texts": [[prompt.upper()] for prompt in batch]}
+        return {"Body": io.BytesIO(json.dumps(answers).encode())}
+
+
+@pytest.fixture
+def runtime(monkeypatch):
+    runtime = FakeRuntime()
+    monkeypatch.setattr(txt2nlu, "runtime", runtime)
+    monkeypatch.setattr(txt2nlu, "result_cache", ResultCache(LruCache(1024 * 1024, 60)))
+    return runtime
+
+
+def handle(**body):
+    response = txt2nlu.lambda_handler(
+        {"body": json.dumps({"endpoint_name": "flan-t5", **body})}, None
+    )
+    return response["statusCode"], json.loads(response["body"])
+
+
+def test_single_prompt(runtime):
+    status, message = handle(prompt="hello")
+
+    assert status == 200
+    assert message == {"prompt": "hello", "generated_text": "HELLO"}
+    assert runtime.batches == [["hello"]]
+
+
+def test_prompts_are_sent_in_batches(runtime):
+    prompts = [f"prompt {i}" for i in range(txt2nlu.MAX_BATCH_SIZE * 2 + 1)]
+
+    status, message = handle(prompts=prompts)
+
+    assert status == 200
+    assert [result["generated_text"] for result in message["results"]] == [
+        prompt.upper() for prompt in prompts
+    ]
+    assert sorted(len(batch) for batch in runtime.batches) == [
+        1,
+        txt2nlu.MAX_BATCH_SIZE,
+        txt2nlu.MAX_BATCH_SIZE,
+    ]
+
+
+def test_questions_share_an_inline_context(runtime):
+    status, message = handle(context="ctx", questions=["a", "b"])
+
+    assert status == 200
+    assert [result["generated_text"] for result in message["results"]] == [
+        "CTX\nA",
+        "CTX\nB",
+    ]
+    assert runtime.batches == [["ctx\na", "ctx\nb"]]
+
+
+def test_too_many_prompts(runtime):
+    status, message = handle(prompts=["p"] * (txt2nlu.MAX_PROMPTS + 1))
+
+    assert status == 400
+    assert str(txt2nlu.MAX_PROMPTS) in message["error"]
+    assert runtime.batches == []
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        {"prompt": ["a"]},
+        {"prompts": "abc"},
+        {"prompts": ["a", 1]},
+        {"context": "ctx", "questions": "abc"},
+        {"context": "ctx", "questions": [None]},
+        {"context": 1, "questions": ["a"]},
+    ],
+)
+def test_prompts_must_be_strings(runtime, body):
+    status, message = handle(**body)
+
+    assert status == 400
+    assert "must be" in message["error"]
+    assert runtime.batches == []
+
+
+def test_no_prompt(runtime):
+    assert handle(prompts=[]) == (400, {"error": "No prompt provided"})
+
+
+def test_questions_against_a_stored_context(runtime, monkeypatch):
+    store = ResultCache(LruCache(1024 * 1024, 60))
+    monkeypatch.setattr(context_sessions, "context_store", store)
+
+    status, stored = handle(store_context=True, context="ctx")
+    assert status == 200
+    status, message = handle(context_id=stored["context_id"], questions=["a"])
+
+    assert status == 200
+    # a stored context is not echoed back
+    assert message == {"results": [{"prompt": "a", "generated_text": "CTX\nA"}]}
+
+
+def test_unknown_context_id(runtime, monkeypatch):
+    store = ResultCache(LruCache(1024 * 1024, 60))
+    monkeypatch.setattr(context_sessions, "context_store", store)
+
+    status, message = handle(context_id="0" * 64, questions=["a"])
+
+    assert status == 404
+    assert runtime.batches == []
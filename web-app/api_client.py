@@ -0,0 +1,189 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from functools import partial
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from requests.utils import DEFAULT_ACCEPT_ENCODING
+
+# concurrent requests to API Gateway per task, shared by all user sessions
+POOL_SIZE = 32
+# requests waiting for a free connection, beyond them a request is turned away
+MAX_QUEUED = 32
+# time a request may wait for a free connection on top of its own timeout
+QUEUE_TIMEOUT_SECONDS = 30
+
+# set by WebStack, the tasks publish their in-flight requests for autoscaling
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "")
+METRICS_SERVICE_NAME = os.environ.get("METRICS_SERVICE_NAME", "")
+METRICS_INTERVAL_SECONDS = 60
+
+
+class ApiBusy(requests.exceptions.RequestException):
+    """All connections of the task are in use and the queue is full."""
+
+    def __init__(self):
+        super().__init__("The app is busy, please retry in a few seconds")
+
+
+class ApiClient:
+    """
+    Process-wide HTTP client for the API Gateway endpoints. A single keep-alive
+    session reuses TCP and TLS connections across requests and users, and the
+    requests run on a bounded thread pool instead of the page script thread.
+    """
+
+    def __init__(self, pool_size=POOL_SIZE, max_queued=MAX_QUEUED):
+        self.pool_size = pool_size
+        self.max_queued = max_queued
+        self.session = requests.Session()
+        # the Lambdas compress large responses, br is offered when brotli is installed
+        self.session.headers["Accept-Encoding"] = DEFAULT_ACCEPT_ENCODING
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.executor = ThreadPoolExecutor(
+            max_workers=pool_size, thread_name_prefix="api-client"
+        )
+        # requests submitted and not finished yet, queued ones included
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        # in-flight calls that identical requests join, by URL and body
+        self.calls = {}
+        self.coalesced = 0
+        self._lock = threading.Lock()
+
+    def _finished(self, key, future):
+        with self._lock:
+            self.in_flight -= 1
+            if self.calls.get(key) is future:
+                del self.calls[key]
+
+    def post(self, url, coalesce=False, **kwargs):
+        """
+        Sends a POST request on the shared session.
+
+        Args:
+            url (str): The API Gateway URL.
+            coalesce (bool): Joins an identical request already in flight, so
+                users sending the same prompt share one Lambda invocation and
+                model run. Only for requests whose results may be reused.
+            **kwargs: Passed on to requests.Session.post.
+
+        Return:
+            concurrent.futures.Future: Resolves to the requests.Response, or raises
+            the requests exception of the call. Coalesced requests share both.
+
+        Raises:
+            ApiBusy: When max_queued requests already wait for a connection.
+        """
+        key = None
+        if coalesce:
+            key = (url, json.dumps(kwargs.get("json"), sort_keys=True))
+
+        with self._lock:
+            if key in self.calls:
+                self.coalesced += 1
+                return self.calls[key]
+            if self.in_flight >= self.pool_size + self.max_queued:
+                raise ApiBusy()
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            future = self.executor.submit(self.session.post, url, **kwargs)
+            if key is not None:
+                self.calls[key] = future
+        future.add_done_callback(partial(self._finished, key))
+        return future
+
+    def send(self, url, coalesce=False, **kwargs):
+        """
+        Sends a POST request with post and waits for its response, at most the
+        timeout of the request plus QUEUE_TIMEOUT_SECONDS for a free connection.
+
+        Return:
+            requests.Response: The response.
+
+        Raises:
+            ApiBusy: When the queue for a connection is full.
+            requests.exceptions.Timeout: When the response did not arrive in time.
+        """
+        future = self.post(url, coalesce=coalesce, **kwargs)
+        timeout = kwargs.get("timeout")
+        if isinstance(timeout, tuple):
+            timeout = sum(timeout)
+        try:
+            return future.result(
+                timeout=None if timeout is None else timeout + QUEUE_TIMEOUT_SECONDS
+            )
+        except FutureTimeoutError:
+            # a request still waiting for a connection is not sent anymore, a
+            # coalesced one may still be awaited by other users
+            if not coalesce:
+                future.cancel()
+            raise requests.exceptions.Timeout(f"No response from {url} in time")
+
+    def take_peak_in_flight(self):
+        """The highest number of in-flight requests since the last call."""
+        with self._lock:
+            peak, self.peak_in_flight = self.peak_in_flight, self.in_flight
+        return peak
+
+    def publish_in_flight(
+        self, namespace, service_name, interval=METRICS_INTERVAL_SECONDS
+    ):
+        """
+        Starts a daemon thread that puts the peak in-flight requests of every
+        interval to CloudWatch, the metric WebStack scales the tasks on. Tasks
+        waiting on API Gateway use little CPU, so CPU alone misses queued users.
+        """
+        import boto3
+
+        cloudwatch = boto3.Session().client("cloudwatch")
+        dimensions = [{"Name": "ServiceName", "Value": service_name}]
+
+        def publish():
+            while True:
+                time.sleep(interval)
+                try:
+                    cloudwatch.put_metric_data(
+                        Namespace=namespace,
+                        MetricData=[
+                            {
+                                "MetricName": "InFlightRequests",
+                                "Dimensions": dimensions,
+                                "Value": self.take_peak_in_flight(),
+                                "Unit": "Count",
+                            }
+                        ],
+                    )
+                except Exception as e:
+                    print(f"ApiClient, publishing metrics failed: {e}")
+
+        threading.Thread(target=publish, daemon=True, name="in-flight-metric").start()
+
+
+def error_message(response):
+    """The message to show for an error response of the Lambdas, None on success."""
+    if response.status_code == 429:
+        # admission control sheds requests when the endpoint is at capacity
+        retry_after = response.headers.get("Retry-After", "a few")
+        return f"The model is busy, please retry in {retry_after} seconds"
+    if response.ok:
+        return None
+    try:
+        return response.json().get("error", response.reason)
+    except ValueError:
+        return response.reason
+
+
+@st.cache_resource
+def get_api_client():
+    client = ApiClient()
+    if METRICS_NAMESPACE:
+        client.publish_in_flight(METRICS_NAMESPACE, METRICS_SERVICE_NAME)
+    return client
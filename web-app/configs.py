@@ -1,3 +1,6 @@
+import threading
+import time
+
 import boto3
 
 region_name = boto3.Session().region_name
@@ -13,12 +16,71 @@ key_txt2nlu_api_endpoint = "proto-foundation-ai-txt2nlu-endpoint"
 # this value is from GenerativeAiTxt2nluSagemakerStack
 key_txt2nlu_sm_endpoint = "proto-foundation-ai-txt2nlu-sm-endpoint"   
 
+# values older than this are refreshed in the background
+CONFIG_TTL_SECONDS = 300
+
+# one client per process, boto3 clients are thread safe
+ssm_client = boto3.Session().client("ssm", region_name=region_name)
+
+
+class ParameterCache:
+    """
+    Process-wide cache of the Parameter Store values used by the pages. All keys
+    are fetched with a single get_parameters call. Once loaded, stale values are
+    served while a background thread refreshes them, so page reruns don't wait
+    on AWS calls.
+    """
+
+    def __init__(self, names, ttl):
+        self.names = list(names)
+        self.ttl = ttl
+        self.values = {}
+        self.invalid = []
+        self.loaded_at = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def _fetch(self):
+        response = ssm_client.get_parameters(Names=self.names)
+        self.values = {p["Name"]: p["Value"] for p in response["Parameters"]}
+        self.invalid = response["InvalidParameters"]
+        self.loaded_at = time.time()
+
+    def _refresh(self):
+        try:
+            self._fetch()
+        except Exception as e:
+            print(f"Config, refresh failed, serving cached values: {e}")
+        finally:
+            self._refreshing = False
+
+    def get(self, name):
+        with self._lock:
+            if self.loaded_at is None:
+                self._fetch()
+            elif time.time() - self.loaded_at > self.ttl and not self._refreshing:
+                self._refreshing = True
+                threading.Thread(target=self._refresh, daemon=True).start()
+
+        if name not in self.values:
+            raise KeyError(f"Parameter {name} not found in Parameter Store")
+        return self.values[name]
+
+
+parameters = ParameterCache(
+    [
+        key_txt2img_api_endpoint,
+        key_txt2img_sm_endpoint,
+        key_txt2nlu_api_endpoint,
+        key_txt2nlu_sm_endpoint,
+    ],
+    CONFIG_TTL_SECONDS,
+)
+
+
 def get_parameter(name):
     """
     This function retrieves a specific value from Systems Manager"s ParameterStore.
-    """     
-    ssm_client = boto3.Session().client("ssm",region_name=region_name)
-    response = ssm_client.get_parameter(Name=name)
-    value = response["Parameter"]["Value"]
-    
-    return value
\ No newline at end of file
+    Values are cached per process, see ParameterCache.
+    """
+    return parameters.get(name)
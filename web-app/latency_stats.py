@@ -0,0 +1,92 @@
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import streamlit as st
+
+# most recent samples kept per model and stage
+MAX_SAMPLES = 500
+# prefix of the stages reported by the Lambda in the Server-Timing header
+SERVER_PREFIX = "lambda_"
+
+
+def parse_server_timing(header):
+    """
+    Reads the durations of a Server-Timing header such as
+    "parse;dur=0.4, invoke;dur=812.0", in milliseconds.
+    """
+    stages = {}
+    for metric in (header or "").split(","):
+        name, *params = [part.strip() for part in metric.split(";")]
+        for param in params:
+            key, _, value = param.partition("=")
+            if name and key == "dur":
+                stages[name] = float(value)
+    return stages
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of the samples."""
+    ordered = sorted(samples)
+    index = max(int(round(fraction * len(ordered))) - 1, 0)
+    return ordered[index]
+
+
+class StageClock:
+    """Wall clock time per stage of one page run, in milliseconds."""
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+
+class LatencyStats:
+    """
+    Process-wide latency samples per model, shared by all user sessions. Client
+    stages (config, request, render) are recorded next to the Lambda stages from
+    the Server-Timing header, which separates model time from our own overhead.
+    """
+
+    def __init__(self, max_samples=MAX_SAMPLES):
+        self.max_samples = max_samples
+        self.samples = defaultdict(lambda: deque(maxlen=self.max_samples))
+        self._lock = threading.Lock()
+
+    def record(self, model, client_stages, server_timing=None):
+        server_stages = parse_server_timing(server_timing)
+        stages = {
+            **client_stages,
+            **{SERVER_PREFIX + name: ms for name, ms in server_stages.items()},
+        }
+        with self._lock:
+            for stage, milliseconds in stages.items():
+                self.samples[(model, stage)].append(milliseconds)
+
+    def summary(self):
+        """One row per model and stage with the sample count, p50 and p95 in ms."""
+        with self._lock:
+            samples = {key: list(values) for key, values in self.samples.items()}
+        return [
+            {
+                "model": model,
+                "stage": stage,
+                "count": len(values),
+                "p50 ms": round(percentile(values, 0.50), 1),
+                "p95 ms": round(percentile(values, 0.95), 1),
+            }
+            for (model, stage), values in sorted(samples.items())
+        ]
+
+
+@st.cache_resource
+def get_latency_stats():
+    return LatencyStats()
@@ -1,9 +1,12 @@
 import streamlit as st
 import requests
 import numpy as np
+import base64
 import time
 
 from configs import *
+from api_client import ApiBusy, error_message, get_api_client
+from latency_stats import StageClock, get_latency_stats
 
 from PIL import Image
 image = Image.open("./img/sagemaker.png")
@@ -11,25 +14,65 @@ st.image(image, width=80)
 st.header("Image Generation")
 st.caption("Using Stable Diffusion model from Hugging Face")
 
-with st.spinner("Retrieving configurations..."):
+clock = StageClock()
 
-    all_configs_loaded = False
+with st.spinner("Retrieving configurations..."):
 
-    while not all_configs_loaded:
-        try:
+    try:
+        with clock.stage("config"):
             api_endpoint = get_parameter(key_txt2img_api_endpoint)
             sm_endpoint = get_parameter(key_txt2img_sm_endpoint)
-            all_configs_loaded = True
-        except Exception as e:
-            st.error(f"Error while getting parameter: {e}")
-            all_configs_loaded = True
-            time.sleep(10)
+    except Exception as e:
+        # the values can still be entered in the sidebar
+        st.error(f"Error while getting parameter: {e}")
+        api_endpoint = sm_endpoint = ""
 
     endpoint_name = st.sidebar.text_input("SageMaker Endpoint Name:",sm_endpoint)
     url = st.sidebar.text_input("API GW Url:",api_endpoint)
+    # empty lets the endpoint split traffic by variant weight
+    target_variant = st.sidebar.text_input("Target Variant (optional):","")
+    # for models hosted as inference components on a shared endpoint
+    inference_component = st.sidebar.text_input("Inference Component (optional):","")
+    cache = st.sidebar.checkbox("Reuse cached results", True)
+    # needs an endpoint deployed with an asynchronous inference config
+    background = st.sidebar.checkbox("Run as background job", False)
+    # fast, balanced and quality trade image quality for latency on the Lambda
+    preset = st.sidebar.selectbox("Preset:", ("fast", "balanced", "quality"), index=1)
+    with st.sidebar.expander("Generation parameters"):
+        # values left at "preset" or 0 keep the value of the preset
+        size = st.selectbox("Image size:", ("preset", 256, 384, 512, 640, 768))
+        steps = st.slider("Inference steps (0 = preset):", 0, 75, 0)
+        guidance = st.slider("Guidance scale (0 = preset):", 0.0, 20.0, 0.0, 0.5)
+        seed = st.number_input("Seed (0 = random):", 0, 2**32 - 1, 0)
+
+parameters = {}
+if size != "preset":
+    parameters["width"] = parameters["height"] = size
+if steps:
+    parameters["num_inference_steps"] = steps
+if guidance:
+    parameters["guidance_scale"] = guidance
+if seed:
+    parameters["seed"] = int(seed)
+
+api = get_api_client()
+
+
+def wait_for_job(job_id, timeout=900):
+    """Long-polls the job until it completes, fails or the timeout passes."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        r = api.send(url,json={"job_id":job_id,"wait_seconds":20},timeout=30)
+        if error_message(r):
+            return {"status": "failed", "error": error_message(r)}
+        data = r.json()
+        if data["status"] != "pending":
+            return data
+    return {"status": "failed", "error": "Timed out waiting for the job"}
 
 
 prompt = st.text_area("Input Image description:", """Cat in a garden at sunset""")
+num_images = st.slider("Number of images:", 1, 4, 1)
 
 if st.button("Generate image"):
     if endpoint_name == "" or prompt == "" or url == "":      
@@ -37,10 +80,38 @@ if st.button("Generate image"):
     else:
         with st.spinner("Wait for it..."):
             try:
-                r = requests.post(url,json={"prompt":prompt,"endpoint_name":endpoint_name},timeout=180)
-                data = r.json()
-                image_array = data["image"]
-                st.image(np.array(image_array))
+                if background:
+                    r = api.send(url,json={"prompt":prompt,"endpoint_name":endpoint_name,"image_format":"png","async":True},timeout=30)
+                    if error_message(r):
+                        data = {"status": "failed", "error": error_message(r)}
+                    else:
+                        data = wait_for_job(r.json()["job_id"])
+                    if data["status"] == "failed":
+                        st.error(f"Image generation failed: {data['error']}")
+                        data = {}
+                else:
+                    # users sending the same prompt share one request while it runs
+                    with clock.stage("request"):
+                        r = api.send(url,json={"prompt":prompt,"endpoint_name":endpoint_name,"image_format":"png","num_images":num_images,"preset":preset,"parameters":parameters,"cache":cache,"target_variant":target_variant or None,"inference_component":inference_component or None},timeout=180,coalesce=cache)
+                        data = r.json()
+                    if error_message(r):
+                        st.error(error_message(r))
+                with clock.stage("render"):
+                    for image in data.get("images", [data["image"]] if "image" in data else []):
+                        if data.get("image_format") == "png":
+                            st.image(base64.b64decode(image))
+                        else:
+                            # legacy response with a nested list of pixels
+                            st.image(np.array(image))
+                for error in data.get("errors", []):
+                    st.warning(f"Image generation failed: {error}")
+                if not background:
+                    st.caption(f"Cache: {r.headers.get('X-Cache', 'n/a')}, variant: {r.headers.get('X-Invoked-Variant', 'n/a')}")
+                    # latency is kept apart per preset
+                    get_latency_stats().record(f"{endpoint_name} ({preset})", clock.stages, r.headers.get("Server-Timing"))
+
+            except ApiBusy as err:
+                st.error(str(err))
 
             except requests.exceptions.ConnectionError as errc:
                 st.error("Error Connecting:",errc)
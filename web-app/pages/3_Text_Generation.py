@@ -1,8 +1,13 @@
 import streamlit as st
 import requests
+import hashlib
 import time
 
 from configs import *
+from api_client import ApiBusy, error_message, get_api_client
+from latency_stats import StageClock, get_latency_stats
+from sm_stream import stream_generated_text
+from admission import Overloaded
 
 from PIL import Image
 image = Image.open("./img/sagemaker.png")
@@ -35,21 +40,139 @@ Agent: No problem, happy to help. Is there anything else I can assist you with?
 Customer: No, that's all for now.
 Agent: Alright, have a great day and good luck with your iPhone!"""
 
-with st.spinner("Retrieving configurations..."):
+clock = StageClock()
 
-    all_configs_loaded = False
+with st.spinner("Retrieving configurations..."):
 
-    while not all_configs_loaded:
-        try:
+    try:
+        with clock.stage("config"):
             api_endpoint = get_parameter(key_txt2nlu_api_endpoint)
             sm_endpoint = get_parameter(key_txt2nlu_sm_endpoint)
-            all_configs_loaded = True
-        except Exception as e:
-            st.error(f"Error while getting parameter: {e}")
-            time.sleep(5)
+    except Exception as e:
+        # the values can still be entered in the sidebar
+        st.error(f"Error while getting parameter: {e}")
+        api_endpoint = sm_endpoint = ""
 
     endpoint_name = st.sidebar.text_input("SageMaker Endpoint Name:",sm_endpoint)
     url = st.sidebar.text_input("API GW Url:",api_endpoint)
+    # empty lets the endpoint split traffic by variant weight
+    target_variant = st.sidebar.text_input("Target Variant (optional):","")
+    # for models hosted as inference components on a shared endpoint
+    inference_component = st.sidebar.text_input("Inference Component (optional):","")
+    cache = st.sidebar.checkbox("Reuse cached results", True)
+    # streaming calls the endpoint directly, the model container must support it
+    stream = st.sidebar.checkbox("Stream response", False)
+    # contexts longer than the model window are cut or asked chunk by chunk
+    context_mode = st.sidebar.selectbox("Long context:", ("full", "truncate", "chunks"))
+    # fast, balanced and quality trade answer quality for latency
+    preset = st.sidebar.selectbox("Preset:", ("fast", "balanced", "quality"), index=1)
+    with st.sidebar.expander("Generation parameters"):
+        # values left at "preset" or 0 keep the value of the preset
+        max_length = st.slider("Max length (0 = preset):", 0, 512, 0)
+        decoding = st.radio("Decoding:", ("preset", "greedy", "sampling"), horizontal=True)
+        seed = st.number_input("Seed (0 = random):", 0, 2**32 - 1, 0)
+
+parameters = {}
+if max_length:
+    parameters["max_length"] = max_length
+if decoding != "preset":
+    parameters["do_sample"] = decoding == "sampling"
+if seed:
+    parameters["seed"] = int(seed)
+
+api = get_api_client()
+
+# handles of the contexts this session has uploaded, keyed by content hash
+if "context_ids" not in st.session_state:
+    st.session_state.context_ids = {}
+# set once a handle was unknown right after its upload, i.e. stored contexts
+# live in a single Lambda container without the shared cache
+if "inline_context" not in st.session_state:
+    st.session_state.inline_context = False
+
+
+def context_id_for(context):
+    key = hashlib.sha256(context.encode("utf-8")).hexdigest()
+    if key not in st.session_state.context_ids:
+        with clock.stage("store_context"):
+            r = api.send(url,json={"store_context":True, "context":context},timeout=60)
+            r.raise_for_status()
+        st.session_state.context_ids[key] = r.json()["context_id"]
+    return st.session_state.context_ids[key]
+
+
+def ask(context, questions):
+    options = {"context_mode":context_mode, "preset":preset, "parameters":parameters, "endpoint_name":endpoint_name, "cache":cache, "target_variant":target_variant or None, "inference_component":inference_component or None}
+    if not st.session_state.inline_context:
+        # the context is uploaded once, questions only send its handle
+        payload = {**options, "questions":questions, "context_id":context_id_for(context)}
+        # users asking the same questions share one request while it runs
+        r = api.send(url,json=payload,timeout=180,coalesce=cache)
+        if r.status_code == 404:
+            # the stored context expired, upload it again
+            st.session_state.context_ids.pop(hashlib.sha256(context.encode("utf-8")).hexdigest(), None)
+            payload["context_id"] = context_id_for(context)
+            r = api.send(url,json=payload,timeout=180,coalesce=cache)
+        if r.status_code != 404:
+            return r
+        # the upload reached another container, the context goes with every request
+        st.session_state.inline_context = True
+    payload = {**options, "questions":questions, "context":context}
+    return api.send(url,json=payload,timeout=180,coalesce=cache)
+
+
+def generate_response(context, question):
+    if stream:
+        prompt = f"{context}\n{question}"
+        placeholder = st.empty()
+        generated_text = ""
+        start = time.perf_counter()
+        try:
+            for chunk in stream_generated_text(endpoint_name, prompt, preset, parameters):
+                if not generated_text:
+                    clock.stages["first_chunk"] = (time.perf_counter() - start) * 1000
+                generated_text += chunk
+                placeholder.markdown(generated_text + "▌")
+            placeholder.markdown(generated_text)
+            clock.stages["stream"] = (time.perf_counter() - start) * 1000
+            get_latency_stats().record(f"{endpoint_name} ({preset})", clock.stages)
+        except Overloaded as e:
+            # the same bucket as the API requests, which get a 429
+            st.error(f"The model is busy, please retry in {e.retry_after} seconds")
+        except Exception as e:
+            st.error(f"Streaming Error: {e}")
+        return
+
+    try:
+        with clock.stage("request"):
+            r = ask(context, [question])
+        if error_message(r):
+            st.error(error_message(r))
+            return
+        with clock.stage("render"):
+            result = r.json()["results"][0]
+            st.write(result.get("generated_text") or result.get("error"))
+        st.caption(f"Cache: {r.headers.get('X-Cache', 'n/a')}, variant: {r.headers.get('X-Invoked-Variant', 'n/a')}")
+        # latency is kept apart per preset
+        get_latency_stats().record(f"{endpoint_name} ({preset})", clock.stages, r.headers.get("Server-Timing"))
+
+    except ApiBusy as err:
+        st.error(str(err))
+
+    except requests.exceptions.ConnectionError as errc:
+        st.error("Error Connecting:",errc)
+
+    except requests.exceptions.HTTPError as errh:
+        st.error("Http Error:",errh)
+
+    except requests.exceptions.Timeout as errt:
+        st.error("Timeout Error:",errt)
+
+    except requests.exceptions.RequestException as err:
+        st.error("OOps: Something Else",err)
+
+
+with st.container():
 
     context = st.text_area("Input Context:", conversation, height=300)
 
@@ -64,27 +187,38 @@ with st.spinner("Retrieving configurations..."):
     if st.button("Generate Response", key=selection):
         if endpoint_name == "" or selection == "" or url == "":        
             st.error("Please enter a valid endpoint name, API gateway url and prompt!")
+        else:
+            with st.spinner("Wait for it..."):
+                generate_response(context, selection)
+                                        
+            st.success("Done!")
+
+    if st.button("Ask all queries"):
+        if endpoint_name == "" or url == "":
+            st.error("Please enter a valid endpoint name and API gateway url!")
         else:
             with st.spinner("Wait for it..."):
                 try:
-                    prompt = f"{context}\n{selection}"
-                    r = requests.post(url,json={"prompt":prompt, "endpoint_name":endpoint_name},timeout=180)
-                    data = r.json()
-                    generated_text = data["generated_text"]
-                    st.write(generated_text)
-                    
-                except requests.exceptions.ConnectionError as errc:
-                    st.error("Error Connecting:",errc)
-                    
-                except requests.exceptions.HTTPError as errh:
-                    st.error("Http Error:",errh)
-                    
-                except requests.exceptions.Timeout as errt:
-                    st.error("Timeout Error:",errt)    
-                    
+                    # one request, the Lambda batches the questions for the endpoint
+                    with clock.stage("request"):
+                        r = ask(context, list(queries))
+                        data = r.json()
+                    with clock.stage("render"):
+                        if error_message(r):
+                            st.error(error_message(r))
+                        for result in data.get("results", []):
+                            st.markdown(f"**{result['prompt'].splitlines()[-1]}**")
+                            st.write(result.get("generated_text") or result.get("error"))
+                    st.caption(f"Cache: {r.headers.get('X-Cache', 'n/a')}, variant: {r.headers.get('X-Invoked-Variant', 'n/a')}")
+                    # batched requests are kept apart from single prompts
+                    get_latency_stats().record(f"{endpoint_name} (batch, {preset})", clock.stages, r.headers.get("Server-Timing"))
+
+                except ApiBusy as err:
+                    st.error(str(err))
+
                 except requests.exceptions.RequestException as err:
-                    st.error("OOps: Something Else",err)                
-                                        
+                    st.error("OOps: Something Else",err)
+
             st.success("Done!")
 
     query = st.text_area("Input Query:", "what do you suggest as next step for the customer?")
@@ -94,24 +228,7 @@ with st.spinner("Retrieving configurations..."):
             st.error("Please enter a valid endpoint name, API gateway url and query!")
         else:
             with st.spinner("Wait for it..."):
-                try:
-                    prompt = f"{context}\n{query}"
-                    r = requests.post(url,json={"prompt":prompt, "endpoint_name":endpoint_name},timeout=180)
-                    data = r.json()
-                    generated_text = data["generated_text"]
-                    st.write(generated_text)
-                    
-                except requests.exceptions.ConnectionError as errc:
-                    st.error("Error Connecting:",errc)
-                    
-                except requests.exceptions.HTTPError as errh:
-                    st.error("Http Error:",errh)
-                    
-                except requests.exceptions.Timeout as errt:
-                    st.error("Timeout Error:",errt)    
-                    
-                except requests.exceptions.RequestException as err:
-                    st.error("OOps: Something Else",err)                
+                generate_response(context, query)
                                 
             st.success("Done!")
         
\ No newline at end of file
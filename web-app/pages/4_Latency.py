@@ -0,0 +1,23 @@
+import streamlit as st
+
+from latency_stats import get_latency_stats
+
+from PIL import Image
+image = Image.open("./img/sagemaker.png")
+st.image(image, width=80)
+st.header("Latency")
+st.caption("Per-stage latency of the requests served by this web app task")
+
+rows = get_latency_stats().summary()
+
+if not rows:
+    st.info("No requests recorded yet, generate an image or a text first.")
+else:
+    # client stages: config, request (HTTP round trip), render
+    # lambda_* stages come from the Server-Timing header of the API response
+    for model in sorted({row["model"] for row in rows}):
+        st.subheader(model)
+        st.dataframe([row for row in rows if row["model"] == model], hide_index=True)
+
+if st.button("Refresh"):
+    st.rerun()
@@ -0,0 +1,106 @@
+import json
+
+import boto3
+
+from configs import region_name
+
+# streaming bypasses the Lambda, so the same presets, limits and admission
+# control are applied here. The modules of the Lambda layer are on the
+# PYTHONPATH of the image
+from admission import admission
+from generation_params import (
+    MAX_INPUT_TOKENS,
+    TEXT_FIXED,
+    TEXT_PARAMETERS,
+    TEXT_PRESETS,
+    approx_tokens,
+    resolve_parameters,
+)
+
+runtime = boto3.Session().client("sagemaker-runtime", region_name=region_name)
+
+
+class PromptTooLong(ValueError):
+    """A prompt above MAX_INPUT_TOKENS, the Lambda answers those with 413."""
+
+
+def _parse_line(line):
+    """
+    Extracts the generated text from one line of a streamed response. Handles
+    TGI style server-sent events ("data:{...}"), JSON lines and plain text.
+    """
+    line = line.strip()
+    if line.startswith(b"data:"):
+        line = line[len(b"data:"):].strip()
+    if not line:
+        return ""
+
+    try:
+        chunk = json.loads(line)
+    except ValueError:
+        return line.decode("utf-8", errors="replace")
+
+    if isinstance(chunk, str):
+        return chunk
+    if "token" in chunk:
+        return "" if chunk["token"].get("special") else chunk["token"]["text"]
+    for key in ("outputs", "generated_texts"):
+        if key in chunk:
+            return chunk[key][0]
+    return chunk.get("generated_text", "")
+
+
+def iter_text_chunks(event_stream):
+    """
+    Yields text chunks from the event stream of invoke_endpoint_with_response_stream.
+    Payload parts may split a line, so bytes are buffered until a newline arrives.
+    """
+    buffer = b""
+    for event in event_stream:
+        for error in ("ModelStreamError", "InternalStreamFailure"):
+            if error in event:
+                raise RuntimeError(f"{error}: {event[error].get('Message')}")
+
+        buffer += event.get("PayloadPart", {}).get("Bytes", b"")
+        while b"\n" in buffer:
+            line, buffer = buffer.split(b"\n", 1)
+            text = _parse_line(line)
+            if text:
+                yield text
+
+    text = _parse_line(buffer)
+    if text:
+        yield text
+
+
+def stream_generated_text(endpoint_name, prompt, preset="balanced", parameters=None):
+    """
+    Invokes the text generation endpoint with response streaming and yields
+    the generated text as it arrives. The request is checked like the Lambda
+    does before the endpoint is called: the parameters override the preset and
+    are validated (ParameterError), the prompt has to fit MAX_INPUT_TOKENS
+    (PromptTooLong), and the request waits for an interactive turn of the
+    endpoint when admission control is enabled (Overloaded).
+    """
+    params = resolve_parameters(preset, parameters or {}, TEXT_PARAMETERS, TEXT_PRESETS)
+    tokens = approx_tokens(prompt)
+    if tokens > MAX_INPUT_TOKENS:
+        raise PromptTooLong(
+            f"Prompt of about {tokens} tokens exceeds the limit of {MAX_INPUT_TOKENS}"
+        )
+    # shares the bucket of the endpoint with the Lambda requests
+    admission.admit(endpoint_name)
+    payload = {
+        "text_inputs": prompt,
+        **params,
+        **TEXT_FIXED,
+        "stream": True,
+    }
+
+    response = runtime.invoke_endpoint_with_response_stream(
+        EndpointName=endpoint_name,
+        ContentType="application/json",
+        Body=json.dumps(payload).encode("utf-8"),
+    )
+
+    yield from iter_text_chunks(response["Body"])